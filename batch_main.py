@@ -0,0 +1,131 @@
+"""
+批量查询入口：无界面地为多个账号获取活动数据。
+
+用法:
+    python batch_main.py --accounts accounts.csv --output activities.jsonl --parse-processes 4
+
+可续跑的分片任务（多个进程或多台机器可对同一共享目录运行同一命令）:
+    python batch_main.py --job jobs/2024 --accounts accounts.csv --output activities.jsonl
+"""
+
+import argparse
+import os
+
+from colorama import Fore, Style, init
+
+import src.config as config
+from src.batch_jobs import BatchJobWorker, JOB_FILE, collect_job, create_job, job_status
+from src.batch_runner import iter_accounts, run_batch
+from src.exporter import export_format
+from src.http_cassette import make_adapter
+from src.profiling import Profiler
+
+
+def print_summaries(summaries):
+    """
+    打印每个学生的积分学时汇总。
+
+    Args:
+        summaries: 学号到汇总的映射
+    """
+    print(f"\n{Fore.CYAN}{Style.BRIGHT}{'学号':<14}{'活动':>6}{'已完成':>8}{'积分':>8}{'学时':>8}")
+    for student_id, summary in sorted(summaries.items()):
+        print(f"{student_id:<14}{summary.activities:>6}{summary.completed:>8}{summary.points:>8}{summary.hours:>8}")
+
+
+def run_job(args):
+    """
+    创建（如不存在）并运行分片任务，全部分片完成后合并结果。
+
+    Args:
+        args: 命令行参数
+    """
+    if not os.path.exists(os.path.join(args.job, JOB_FILE)):
+        if not args.accounts:
+            raise SystemExit("新建任务需要指定 --accounts")
+        shards = create_job(args.job, args.accounts, args.shard_size, args.detail_limit)
+        print(f"{Fore.CYAN}{Style.BRIGHT}已创建任务 {args.job}，共 {shards} 个分片")
+
+    if not args.status:
+        worker = BatchJobWorker(args.job, args.workers, args.parse_processes, args.transport, args.accounts)
+        completed, failed = worker.run()
+        print(f"{Fore.CYAN}{Style.BRIGHT}本次完成 {completed} 个分片，{failed} 个账号失败（重新运行将只重试失败的账号）")
+
+    status = job_status(args.job)
+    print(f"{Fore.CYAN}{Style.BRIGHT}分片 {status['done_shards']}/{status['shards']} 已完成，{status['locked_shards']} 个处理中；"
+          f"账号 {status['done_accounts']} 个完成，{status['failed_accounts']} 个失败")
+
+    if status['done_shards'] == status['shards']:
+        print_summaries(collect_job(args.job, args.output))
+        print(f"{Fore.GREEN}{Style.BRIGHT}任务已全部完成，结果已写入 {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量获取多个账号的第二课堂活动')
+    parser.add_argument('--accounts', help='账号列表CSV文件，每行为"学号,密码"')
+    parser.add_argument('--output', default='activities.jsonl', help='输出文件（JSON Lines）')
+    parser.add_argument('--workers', type=int, default=config.BATCH_WORKERS, help='同时处理的账号数')
+    parser.add_argument('--parse-processes', type=int, default=config.PARSE_PROCESSES,
+                        help='解析进程数，0表示不使用进程池')
+    parser.add_argument('--detail-limit', type=int, default=config.DETAIL_FETCH_LIMIT, help='每个账号预加载详情的活动数量')
+    parser.add_argument('--job', help='分片任务目录：中断后重新运行会跳过已完成的账号，只重试失败的账号')
+    parser.add_argument('--shard-size', type=int, default=config.BATCH_SHARD_SIZE, help='新建任务时每个分片的账号数')
+    parser.add_argument('--status', action='store_true', help='只查看分片任务进度，不处理分片')
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument('--record', metavar='CASSETTE', help='把网络交互（去除账号密码和Cookie）录制到文件')
+    cassette.add_argument('--replay', metavar='CASSETTE', help='从录制文件回放网络交互，不访问服务器')
+    parser.add_argument('--replay-latency', action='store_true', help='回放时按录制时的延迟返回响应')
+    parser.add_argument('--profile', nargs='?', const='profile', metavar='PREFIX',
+                        help='开启性能分析，结束后写出报告和火焰图数据（默认前缀profile）')
+    args = parser.parse_args()
+    # 在开始处理账号之前检查输出格式，避免运行结束时才发现扩展名无效
+    try:
+        export_format(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+
+    init(autoreset=True)
+    args.transport = None
+    if args.record:
+        # 录制适配器由所有会话共享：连接池需要容纳详情并发加上登录、列表阶段的线程
+        args.transport = make_adapter(args.record, 'record', pool_maxsize=config.DETAIL_CONCURRENCY_MAX + args.workers * 2)
+    elif args.replay:
+        args.transport = make_adapter(args.replay, 'replay', args.replay_latency)
+    profiler = Profiler(args.profile) if args.profile else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        run(parser, args)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        if args.transport is not None:
+            args.transport.close()
+
+
+def run(parser, args):
+    """
+    按命令行参数运行分片任务或一次性批量查询。
+
+    Args:
+        parser: 命令行解析器
+        args: 命令行参数
+    """
+    if args.job:
+        run_job(args)
+        return
+    if not args.accounts:
+        parser.error("需要指定 --accounts 或 --job")
+
+    print(f"{Fore.CYAN}{Style.BRIGHT}每个网络阶段 {args.workers} 个线程，{args.parse_processes} 个解析进程")
+
+    # 账号按需逐行读取，不预先载入整个列表
+    summaries, failures = run_batch(iter_accounts(args.accounts), args.output, args.workers, args.parse_processes,
+                                    args.detail_limit, args.transport)
+
+    print_summaries(summaries)
+    print(f"{Fore.GREEN}{Style.BRIGHT}成功 {len(summaries)} 个，失败 {len(failures)} 个，结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+登录令牌提取的微基准测试
+
+对比在一个接近真实的统一认证（CAS）登录页面上提取'execution'令牌的耗时：
+- 完整解析：构建BeautifulSoup解析树后查找输入框（原有做法，现在作为回退路径）
+- 快速提取：html_parser.extract_execution，只扫描到令牌所在的标签为止
+
+用法：python bench_execution.py [--repeat 200]
+"""
+
+import argparse
+import base64
+import os
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+from colorama import Fore, Style, init
+
+import src.html_parser as html_parser
+
+
+def build_login_page(token: str) -> str:
+    """
+    生成与统一认证登录页面结构相近的HTML：较长的head（样式、脚本）、
+    带多个输入框的登录表单、位于表单末尾的execution隐藏域，以及页脚和内联脚本。
+
+    Args:
+        token: execution令牌值
+
+    Returns:
+        str: 登录页面HTML
+    """
+    head = ''.join(
+        f'<link rel="stylesheet" href="/cas/themes/cup/css/part{i}.css?v=6.3.7"/>\n'
+        f'<script type="text/javascript" src="/cas/js/lib{i}.min.js"></script>\n'
+        for i in range(20)
+    )
+    style = '<style>' + ''.join(f'.login-box .item{i}{{margin:{i}px;padding:0 {i}px;color:#3a{i % 10}f8c}}\n' for i in range(300)) + '</style>'
+    notice = ''.join(
+        f'<li class="notice-item"><a href="/cas/notice/{i}" title="通知{i}">关于统一身份认证系统使用的第{i}条说明</a>'
+        f'<span class="date">2024-0{i % 9 + 1}-1{i % 9}</span></li>\n'
+        for i in range(40)
+    )
+    form = (
+        '<form id="fm1" class="login-form" action="/login?service=https%3A%2F%2Fsct.cup.edu.cn%2Fucenter%2Findex%2Fsaveticket" method="post">\n'
+        '<div class="form-group"><label for="username">学号/工号</label>'
+        '<input id="username" name="username" class="form-control" type="text" value="" autocomplete="off"/></div>\n'
+        '<div class="form-group"><label for="password">密码</label>'
+        '<input id="password" name="password" class="form-control" type="password" value="" autocomplete="off"/></div>\n'
+        '<div class="form-group captcha" style="display:none"><input id="captcha" name="captcha" type="text"/></div>\n'
+        '<input type="hidden" name="type" value="username_password"/>\n'
+        '<input type="hidden" name="submit" value="LOGIN"/>\n'
+        f'<input type="hidden" name="execution" value="{token}"/>\n'
+        '<input type="hidden" name="_eventId" value="submit"/>\n'
+        '<button class="btn btn-primary" type="submit">登录</button>\n'
+        '</form>\n'
+    )
+    script = '<script>' + ''.join(
+        f'function handler{i}(e){{var el=document.getElementById("el{i}");if(el){{el.value=e.target.value;}}}}\n'
+        for i in range(150)
+    ) + 'document.querySelector("input[name=execution]");</script>'
+    return (
+        '<!DOCTYPE html>\n<html lang="zh-CN">\n<head>\n<meta charset="UTF-8"/>\n'
+        '<title>中国石油大学（北京）统一身份认证</title>\n'
+        f'{head}{style}\n</head>\n<body>\n<div class="header"><img src="/cas/images/logo.png" alt="logo"/></div>\n'
+        f'<div class="container"><div class="notice"><ul>{notice}</ul></div>\n<div class="login-box">{form}</div></div>\n'
+        f'<div class="footer">版权所有 © 中国石油大学（北京）</div>\n{script}\n</body>\n</html>\n'
+    )
+
+
+def bs4_execution(html_content: str) -> str | None:
+    """
+    完整解析路径：构建解析树后查找execution输入框。
+    """
+    execution_input = BeautifulSoup(html_content, 'html.parser').find('input', {'name': 'execution'})
+    if execution_input and 'value' in execution_input.attrs:
+        return execution_input['value']
+    return None
+
+
+def main():
+    init(autoreset=True)
+    parser = argparse.ArgumentParser(description="登录令牌提取的微基准测试")
+    parser.add_argument('--repeat', type=int, default=200, help="每种方法的执行次数（默认200）")
+    args = parser.parse_args()
+
+    # CAS的execution令牌通常是数千字符的base64字符串
+    token = base64.b64encode(os.urandom(4500)).decode('ascii')
+    page = build_login_page(token)
+    page_bytes = page.encode('utf-8')
+
+    cases = [
+        ('完整解析（BeautifulSoup）', lambda: bs4_execution(page)),
+        ('快速提取（文本）', lambda: html_parser.extract_execution(page)),
+        ('快速提取（原始字节）', lambda: html_parser.extract_execution(page_bytes, 'utf-8')),
+        ('parse_execution（字节）', lambda: html_parser.parse_execution(page_bytes, 'utf-8')),
+    ]
+    for name, func in cases:
+        if func() != token:
+            print(f"{Fore.RED}{Style.BRIGHT}✗ {name} 提取的令牌不正确")
+            sys.exit(1)
+
+    print(f"{Fore.CYAN}{Style.BRIGHT}登录页面 {len(page_bytes) / 1024:.1f} KB，令牌 {len(token)} 字符，每种方法执行 {args.repeat} 次")
+    baseline = None
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.repeat, repeat=3)) / args.repeat
+        baseline = baseline or seconds
+        print(f"{name:<24}{seconds * 1e6:>12.1f} µs/次{baseline / seconds:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
 # main_app.py
 
+import argparse
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog
 import threading
+from datetime import datetime
 from colorama import init
 
 import src.config as config
 from src.network_client import ApiClient
 from src.activity_fetcher import ActivityFetcher, ActivityFetcherThread
-from src.ui_manager import UIManager
+from src.activity_store import ActivityStateStore
+from src.concurrency import AdaptiveLimiter
+from src.exporter import PARQUET_AVAILABLE, export_records
+from src.history_db import ActivityHistoryDB
+from src.profiling import MainLoopWatchdog, Profiler
+from src.ui_manager import UIManager, UIUpdateQueue, prepare_tree_render
+from src.watch_mode import ActivityWatcher
 
 init(autoreset=True)
 
@@ -29,13 +37,21 @@ class ActivityViewer(tk.Tk):
         self.configure(bg='white')
 
         self.client = ApiClient()
-        # 存储所有活动数据的列表，用于排序和按需加载
-        self.activity_data_cache = []
+        # 活动数据状态存储：工作线程提交变更，界面只读取不可变快照
+        self.activity_store = ActivityStateStore()
         # 存储学生姓名
         self.student_name = None
+        # 当前显示数据所属的学号，用于判断能否增量刷新
+        self.snapshot_owner = None
 
-        # 初始化活动获取器
-        self.fetcher = ActivityFetcher(self.client, config.DETAIL_FETCH_LIMIT)
+        # 本地活动历史数据库
+        self.history = ActivityHistoryDB() if config.ENABLE_HISTORY_DB else None
+        # 是否仍在分页显示本地保存的旧数据，开始获取在线数据后置为False
+        self.loading_cached_history = self.history is not None
+
+        # 初始化活动获取器，详情请求的并发数由自适应限制器控制
+        self.detail_limiter = AdaptiveLimiter()
+        self.fetcher = ActivityFetcher(self.client, config.DETAIL_FETCH_LIMIT, self.history, self.detail_limiter)
         self.fetcher_thread = None
 
         # 设置专业主题
@@ -60,12 +76,42 @@ class ActivityViewer(tk.Tk):
         self.fetch_button = ttk.Button(login_frame, text="获取活动列表", command=self.start_data_fetch, state="disabled")
         self.fetch_button.pack(side='left', padx=5)
 
+        self.cancel_button = ttk.Button(login_frame, text="取消", command=self.cancel_current_operation, state="disabled")
+        self.cancel_button.pack(side='left', padx=5)
+
+        # 登录后自动获取活动列表
+        self.auto_fetch_var = tk.BooleanVar(value=config.AUTO_FETCH_AFTER_LOGIN)
+        ttk.Checkbutton(login_frame, text="登录后自动获取", variable=self.auto_fetch_var).pack(side='left', padx=5)
+
+        # 监视模式：活动当天轮询签到签退状态
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(login_frame, text="监视签到状态", variable=self.watch_var, command=self.toggle_watch_mode).pack(side='left', padx=5)
+
+        # 离线数据提示（显示本地保存的旧数据时）
+        self.stale_var = tk.StringVar()
+        ttk.Label(login_frame, textvariable=self.stale_var, foreground='#d35400').pack(side='right', padx=5)
+
         # 状态标签
         self.status_var = tk.StringVar()
         self.status_var.set("请先登录")
         status_bar = ttk.Label(self, textvariable=self.status_var, relief='sunken', anchor='w', padding="5")
         status_bar.pack(side='bottom', fill='x')
 
+        # 筛选栏
+        filter_frame = ttk.Frame(self, padding=(10, 0))
+        filter_frame.pack(fill='x')
+        ttk.Label(filter_frame, text="筛选:").pack(side='left', padx=(0, 5))
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add('write', lambda *args: self.ui_manager.set_filter(self.filter_var.get()))
+        ttk.Entry(filter_frame, textvariable=self.filter_var, width=40).pack(side='left', padx=5)
+        ttk.Label(filter_frame, text="匹配活动名称、标签和签到签退状态", foreground='gray').pack(side='left', padx=5)
+        ttk.Button(filter_frame, text="导出当前视图", command=self.export_current_view).pack(side='right', padx=5)
+
+        # 积分学时汇总面板
+        self.summary_var = tk.StringVar()
+        summary_label = ttk.Label(self, textvariable=self.summary_var, anchor='w', justify='left', padding=(10, 5))
+        summary_label.pack(side='bottom', fill='x')
+
         # 活动列表树视图
         tree_frame = ttk.Frame(self, padding="10")
         tree_frame.pack(expand=True, fill='both')
@@ -100,10 +146,239 @@ class ActivityViewer(tk.Tk):
 
         # 初始化UI管理器
         self.ui_manager = UIManager(self, self.tree)
+        # 工作线程的所有界面更新都经由该队列合并后在Tk线程中应用
+        self.ui_updates = UIUpdateQueue(self, self.ui_manager, config.UI_UPDATE_INTERVAL_MS)
+        self.ui_updates.start()
+        self.activity_store.subscribe(self._on_snapshot_published)
+
+        # 监视器读取最新快照，状态变化时提交到状态存储
+        self.watcher = ActivityWatcher(
+            self.fetcher,
+            lambda: self.activity_store.snapshot.records,
+            on_change=self._on_watch_change,
+            on_update=self.ui_updates.post_status
+        )
 
         # 绑定双击事件，用于按需加载详情
         self.tree.bind('<Double-1>', self.fetch_detail_on_double_click)
 
+        # 关闭窗口时取消仍在进行的获取操作
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # 常开的主线程阻塞检测：记录阻塞主循环过久的事件处理函数
+        self.main_loop_watchdog = None
+        if config.UI_WATCHDOG:
+            self.main_loop_watchdog = MainLoopWatchdog(self)
+            self.main_loop_watchdog.start()
+
+        # 冷启动：先显示上次保存的数据，登录后再在后台刷新
+        if self.history is not None:
+            threading.Thread(target=self._load_cached_snapshot_thread, daemon=True).start()
+
+    def _load_cached_snapshot_thread(self):
+        """
+        从本地历史数据库分页读取上次使用账号的活动数据的工作线程。
+        每次只读取一页（键集分页），第一页显示后其余各页追加到表格；开始获取在线数据后停止读取。
+        """
+        try:
+            last_student = self.history.get_last_student()
+            if last_student is None:
+                return
+            student_id = last_student['student_id']
+            cursor = None
+            loaded = 0
+            while True:
+                records, cursor = self.history.page_enrollments(student_id, cursor, config.HISTORY_PAGE_SIZE)
+                loaded += len(records)
+                self.ui_updates.post_call(self._apply_cached_page, last_student, records, loaded == len(records),
+                                          loaded, cursor is None)
+                if cursor is None or not self.loading_cached_history:
+                    return
+        except Exception as e:
+            print(f"读取本地活动历史失败: {e}")
+
+    def _apply_cached_page(self, last_student, records, first, loaded, done):
+        """
+        显示本地保存的一页旧数据，并标记为可能已过期
+
+        Args:
+            last_student: 上次使用的学生信息
+            records: 这一页的活动记录
+            first: 是否为第一页（替换表格内容，其余页追加）
+            loaded: 已读取的记录总数
+            done: 是否已读取全部记录
+        """
+        student_id = last_student['student_id']
+        # 已经开始获取在线数据时不再显示旧数据
+        if not self.loading_cached_history:
+            return
+        if done:
+            self.loading_cached_history = False
+        if first:
+            if self.snapshot_owner is not None:
+                return
+            self.snapshot_owner = student_id
+            self.student_name = last_student['name']
+            if not self.user_entry.get():
+                self.user_entry.insert(0, student_id)
+                self.pass_entry.focus_set()
+            updated_at = datetime.fromtimestamp(last_student['last_seen_at']).strftime('%Y-%m-%d %H:%M')
+            self.ui_manager.set_stale(f"离线数据，更新于 {updated_at}")
+        elif self.snapshot_owner != student_id:
+            return
+
+        name_prefix = f"{self.student_name}同学，" if self.student_name else ""
+        if done:
+            message = f"{name_prefix}已显示上次保存的 {loaded} 条记录，登录后将自动刷新。"
+        else:
+            message = f"{name_prefix}正在读取上次保存的记录（已读取 {loaded} 条）..."
+        if first:
+            self.activity_store.replace_all(records, message=message)
+        else:
+            self.activity_store.extend(records, message=message)
+
+    def _prepare_refresh(self, username, status):
+        """
+        准备刷新数据：同一账号保留当前显示的数据作为增量获取的基础，
+        不同账号则清空表格
+
+        Args:
+            username: 即将获取数据的学号
+            status: 清空表格后显示的状态消息
+
+        Returns:
+            Mapping: 可复用的上次结果（活动URL到活动记录），没有时返回None
+        """
+        self.loading_cached_history = False
+        if username and username == self.snapshot_owner:
+            return self.activity_store.snapshot.by_key
+
+        self.snapshot_owner = None
+        self.ui_manager.set_stale(None)
+        self.ui_manager.clear_tree()
+        self.activity_store.clear(message=status)
+        return None
+
+    def _new_fetcher_thread(self):
+        """
+        取消当前的获取线程并创建新的获取线程
+        旧线程的结果将被丢弃，进行中的请求在下一个检查点中止
+
+        Returns:
+            ActivityFetcherThread: 新的获取线程实例
+        """
+        if self.fetcher_thread is not None:
+            self.fetcher_thread.cancel()
+        self.fetcher_thread = ActivityFetcherThread(self.fetcher)
+        return self.fetcher_thread
+
+    def _bind_to_thread(self, thread, handler):
+        """
+        将工作线程的回调转发到Tk线程，并丢弃已取消或已过期线程的回调
+
+        Args:
+            thread: 产生回调的获取线程
+            handler: 在Tk线程中执行的处理函数
+
+        Returns:
+            Callable: 可在工作线程中调用的回调函数
+        """
+        def dispatch(*args):
+            if thread is self.fetcher_thread and not thread.cancelled:
+                handler(*args)
+
+        return lambda *args: self.ui_updates.post_call(dispatch, *args)
+
+    def _on_snapshot_published(self, snapshot):
+        """
+        状态存储发布新快照时的回调（在存储的所有者线程中执行）
+        在该线程中预先计算表格行数据、筛选索引和排序键，再交给界面更新队列渲染
+
+        Args:
+            snapshot: 新发布的活动数据快照
+        """
+        prepared = prepare_tree_render(snapshot.records)
+        self.ui_updates.post_tree(snapshot.records, prepared, snapshot.version)
+        self.ui_updates.post_call(self.ui_manager.update_summary, snapshot.summary)
+        if snapshot.message:
+            self.ui_updates.post_status(snapshot.message)
+
+    def cancel_current_operation(self):
+        """
+        处理"取消"按钮点击事件
+        取消进行中的获取操作并恢复按钮状态
+        """
+        if self.fetcher_thread is None or not self.fetcher_thread.is_alive():
+            return
+
+        self.fetcher_thread.cancel()
+        self.ui_manager.set_cursor("")
+        self.ui_manager.update_status("已取消当前操作。")
+        if self.client.logged_in:
+            self.ui_manager.update_login_state(True)
+            self.ui_manager.enable_buttons()
+        else:
+            self.ui_manager.enable_buttons(enable_fetch=False, enable_login=True)
+
+    def on_close(self):
+        """
+        处理窗口关闭事件
+        取消后台获取操作后再销毁窗口
+        """
+        if self.fetcher_thread is not None:
+            self.fetcher_thread.cancel()
+        self.watcher.stop()
+        self.ui_updates.stop()
+        if self.main_loop_watchdog is not None:
+            self.main_loop_watchdog.stop()
+        self.activity_store.close()
+        self.destroy()
+
+
+    def toggle_watch_mode(self):
+        """
+        处理"监视签到状态"复选框
+        开启后在后台轮询临近活动的签到签退状态，状态变化时高亮对应行并提示
+        """
+        if not self.watch_var.get():
+            self.watcher.stop()
+            self.ui_manager.update_status("已停止监视签到状态。")
+            return
+
+        if not self.client.logged_in:
+            self.watch_var.set(False)
+            self.ui_manager.show_warning("Watch Mode", "请先登录后再开启监视")
+            return
+
+        self.watcher.start()
+        self.ui_manager.update_status(
+            f"已开启监视：活动时间前后 {config.WATCH_WINDOW_HOURS} 小时内未完成签到签退的活动将被定期检查。"
+        )
+
+    def _on_watch_change(self, url, record, detail):
+        """
+        监视器检测到签到签退状态变化时的回调（在监视线程中执行）
+
+        Args:
+            url: 活动URL
+            record: 变化前的活动记录
+            detail: 最新的活动详情
+        """
+        message = f"{record.get('name', '')}：{detail['signin']} / {detail['signout']}"
+        self.activity_store.update(url, detail, message=f"签到状态变化 - {message}")
+        self.ui_updates.post_call(self._notify_watch_change, url, message)
+
+    def _notify_watch_change(self, url, message):
+        """
+        在Tk线程中提示签到状态变化：高亮对应行、响铃并显示提示消息
+
+        Args:
+            url: 活动URL
+            message: 提示消息
+        """
+        self.ui_manager.highlight_row(url, config.WATCH_HIGHLIGHT_MS)
+        self.bell()
+        self.show_toast(f"签到状态变化：{message}", duration=4000)
 
     def perform_login(self):
         """
@@ -120,31 +395,46 @@ class ActivityViewer(tk.Tk):
         self.ui_manager.update_status("正在登录...")
         self.ui_manager.disable_buttons()
 
-        # Run login in a thread to avoid freezing the UI
-        threading.Thread(target=self._login_thread, args=(username, password), daemon=True).start()
+        if self.auto_fetch_var.get():
+            # 登录成功后在同一工作线程中直接获取活动列表
+            known = self._prepare_refresh(username, "正在登录...")
+            thread = self._new_fetcher_thread()
+            thread.start_login_and_fetch(
+                username,
+                password,
+                on_login=self._bind_to_thread(thread, lambda success, message: self._handle_login_result(success, message, True)),
+                on_complete=self._bind_to_thread(thread, self._handle_fetch_all_complete),
+                on_update=self._bind_to_thread(thread, self._handle_fetch_update),
+                known=known
+            )
+            return
 
-    def _login_thread(self, username, password):
-        """
-        登录操作的工作线程
-        在线程中执行实际的登录请求，避免UI界面冻结
-        """
-        try:
-            success, message = self.client.login(username, password)
-            self.after(0, self._handle_login_result, success, message)
-        except Exception as e:
-            self.after(0, lambda: self.ui_manager.show_error("Login Error", str(e)))
-            self.after(0, lambda: self.ui_manager.update_status(f"登录时发生错误: {e}"))
-            self.after(0, lambda: self.ui_manager.enable_buttons(enable_login=True))
+        # 在获取线程中登录，"取消"按钮可以中止进行中的登录请求
+        thread = self._new_fetcher_thread()
+        thread.start_login(
+            username,
+            password,
+            on_login=self._bind_to_thread(thread, self._handle_login_result)
+        )
 
-    def _handle_login_result(self, success, message):
+    def _handle_login_result(self, success, message, fetching=False):
         """
         处理登录结果
         根据登录是否成功更新UI状态和显示相应消息
+
+        Args:
+            success: 登录是否成功
+            message: 登录结果消息
+            fetching: 登录后是否已在工作线程中继续获取活动列表
         """
         if success:
-            welcome_msg = "登录成功！请点击获取活动列表。"
-            self.ui_manager.update_status(welcome_msg)
             self.ui_manager.update_login_state(True)
+            if fetching:
+                self.ui_manager.update_status("登录成功！正在获取活动列表...")
+                self.ui_manager.disable_buttons()
+            else:
+                self.ui_manager.update_status("登录成功！请点击获取活动列表。")
+                self.ui_manager.enable_buttons()
         else:
             self.ui_manager.update_status(f"登录失败: {message}")
             self.ui_manager.show_error("Login Failed", message)
@@ -153,18 +443,18 @@ class ActivityViewer(tk.Tk):
     def start_data_fetch(self):
         """
         处理"获取活动列表"按钮点击事件
-        清空现有数据并启动异步获取活动列表的操作
+        在保留当前显示数据的同时启动异步获取活动列表的操作，完成后只更新变化的行
         """
         self.ui_manager.update_status("正在获取活动列表...")
         self.ui_manager.disable_buttons()
-        self.ui_manager.clear_tree()
-        self.activity_data_cache = []  # 清空缓存
+        known = self._prepare_refresh(self.client.get_username(), "正在获取活动列表...")
 
         # 使用活动获取器线程
-        self.fetcher_thread = ActivityFetcherThread(self.fetcher)
-        self.fetcher_thread.start(
-            on_complete=self._handle_fetch_all_complete,
-            on_update=self._handle_fetch_update
+        thread = self._new_fetcher_thread()
+        thread.start(
+            on_complete=self._bind_to_thread(thread, self._handle_fetch_all_complete),
+            on_update=self._bind_to_thread(thread, self._handle_fetch_update),
+            known=known
         )
 
     def _handle_fetch_update(self, message):
@@ -172,7 +462,7 @@ class ActivityViewer(tk.Tk):
         处理数据获取过程中的更新消息
         更新UI状态以显示当前获取进度
         """
-        self.after(0, lambda: self.ui_manager.update_status(message))
+        self.ui_updates.post_status(message)
 
     def _handle_fetch_all_complete(self, success, result, error):
         """
@@ -180,41 +470,38 @@ class ActivityViewer(tk.Tk):
         根据获取结果更新UI和缓存
         """
         if success:
-            self.activity_data_cache = result
+            self.snapshot_owner = self.client.get_username()
+            self.ui_manager.set_stale(None)
             if not result:
                 name_prefix = f"{self.student_name}同学，" if self.student_name else ""
-                self.after(0, lambda: self.ui_manager.update_status(f"{name_prefix}未找到任何已报名的活动。"))
+                self.activity_store.replace_all([], message=f"{name_prefix}未找到任何已报名的活动。")
             else:
                 # 更新学生姓名（因为活动列表页面可能包含更准确的姓名）
                 new_name = self.client.get_student_name()
                 if new_name and new_name != self.student_name:
                     self.student_name = new_name
-                self.after(0, lambda: self.ui_manager.update_tree(self.activity_data_cache))
+                self.activity_store.replace_all(result)
         else:
-            self.after(0, lambda: self.ui_manager.show_error("Data Fetch Error", str(error)))
-            self.after(0, lambda: self.ui_manager.update_status(f"获取数据失败: {error}"))
+            self.ui_updates.post_status(f"获取数据失败: {error}")
+            self.ui_manager.show_error("Data Fetch Error", str(error))
 
-        self.after(0, lambda: self.ui_manager.enable_buttons())
+        self.ui_manager.enable_buttons()
 
     def fetch_detail_on_double_click(self, event):
         """
         处理双击表格事件，用于按需获取单个活动详情
         当用户双击活动条目时，如果详情已加载则复制URL到剪贴板并显示提示，否则获取详情
         """
-        # 1. 获取选中的行
+        # 1. 获取选中的行（行ID即活动唯一键）
         item_id = self.tree.focus()
         if not item_id:
             return
 
-        # 2. 获取选中行的索引 (用于查找缓存数据)
-        selected_index = self.tree.index(item_id)
-
-        # 3. 检查缓存数据是否已加载
-        if selected_index < 0 or selected_index >= len(self.activity_data_cache):
+        # 2. 从当前快照中查找活动数据
+        activity_info = self.activity_store.snapshot.get(item_id)
+        if activity_info is None:
             return
 
-        activity_info = self.activity_data_cache[selected_index]
-
         if activity_info.get('is_loaded'):
             # 详情已加载，复制URL到剪贴板
             if 'url' in activity_info:
@@ -224,49 +511,80 @@ class ActivityViewer(tk.Tk):
                 self.show_toast(f"活动URL已复制到剪贴板")
             return
 
-        # 4. 未加载，开始按需获取
+        # 3. 未加载，开始按需获取
         self.ui_manager.update_status(f"正在获取 {activity_info['name']} 的详情...")
         self.ui_manager.disable_buttons()
         self.ui_manager.set_cursor("wait")
 
         # 使用活动获取器线程
-        self.fetcher_thread = ActivityFetcherThread(self.fetcher)
-        self.fetcher_thread.start(
+        thread = self._new_fetcher_thread()
+        thread.start(
             detail_url=activity_info['url'],
-            index=selected_index,
-            on_complete=self._handle_fetch_single_complete
+            index=item_id,
+            on_complete=self._bind_to_thread(thread, self._handle_fetch_single_complete)
         )
 
     def _handle_fetch_single_complete(self, success, result, error):
         """
         处理单个活动详情获取完成事件
-        根据获取结果更新缓存数据和表格显示
+        将详情作为变更记录提交给状态存储，由存储重新排序并发布新快照
         """
         if success:
             detail_data = result['detail']
-            index = result['index']
-
-            # 更新缓存
-            self.activity_data_cache[index].update(detail_data)
+            key = result['index']
 
-            # 重新排序
-            self.activity_data_cache.sort(
-                key=lambda x: x.get('acttime_timestamp', 0),
-                reverse=True
-            )
-
-            # 更新表格
-            self.after(0, lambda: self.ui_manager.update_tree(self.activity_data_cache))
             name_prefix = f"{self.student_name}同学，" if self.student_name else ""
-            self.after(0, lambda: self.ui_manager.update_status(
-                f"{name_prefix}详情获取成功。"
-            ))
+            self.activity_store.update(key, detail_data, message=f"{name_prefix}详情获取成功。")
         else:
-            self.after(0, lambda: self.ui_manager.show_error("Detail Fetch Error", str(error)))
-            self.after(0, lambda: self.ui_manager.update_status(f"获取详情失败: {error}"))
+            self.ui_updates.post_status(f"获取详情失败: {error}")
+            self.ui_manager.show_error("Detail Fetch Error", str(error))
+
+        self.ui_manager.set_cursor("")
+        self.ui_manager.enable_buttons()
 
-        self.after(0, lambda: self.ui_manager.set_cursor(""))
-        self.after(0, lambda: self.ui_manager.enable_buttons())
+    def export_current_view(self):
+        """
+        处理"导出当前视图"按钮点击事件
+        按当前排序和筛选导出表格中显示的活动，导出在后台线程中进行
+        """
+        keys = self.ui_manager.visible_keys()
+        if not keys:
+            self.ui_manager.show_warning("导出", "当前没有可导出的活动。")
+            return
+
+        filetypes = [("CSV 文件", "*.csv"), ("JSON Lines 文件", "*.jsonl")]
+        if PARQUET_AVAILABLE:
+            filetypes.append(("Parquet 文件", "*.parquet"))
+        path = filedialog.asksaveasfilename(parent=self, title="导出当前视图", defaultextension=".csv", filetypes=filetypes)
+        if not path:
+            return
+
+        snapshot = self.activity_store.snapshot
+        self.ui_manager.update_status(f"正在导出 {len(keys)} 条记录...")
+        threading.Thread(
+            target=self._export_thread,
+            args=(snapshot, keys, path, self.snapshot_owner, self.student_name),
+            daemon=True
+        ).start()
+
+    def _export_thread(self, snapshot, keys, path, student_id, student_name):
+        """
+        导出线程：从快照中逐条取出记录写入文件
+
+        Args:
+            snapshot: 导出时的活动数据快照
+            keys: 要导出的活动唯一键（按显示顺序）
+            path: 输出文件路径
+            student_id: 学号
+            student_name: 学生姓名
+        """
+        try:
+            records = (snapshot.get(key) for key in keys if snapshot.get(key) is not None)
+            count = export_records(records, path, student_id=student_id, student_name=student_name)
+            self.ui_updates.post_status(f"已导出 {count} 条记录到 {path}")
+        except Exception as e:
+            self.ui_updates.post_status(f"导出失败: {e}")
+            self.ui_updates.post_call(self.ui_manager.show_error, "导出失败", str(e))
 
     def show_toast(self, message, duration=2000):
         """
@@ -302,5 +620,17 @@ class ActivityViewer(tk.Tk):
         toast.after(duration, toast.destroy)
 
 if __name__ == "__main__":
-    app = ActivityViewer()
-    app.mainloop()
+    arg_parser = argparse.ArgumentParser(description="第二课堂活动查看器")
+    arg_parser.add_argument('--profile', nargs='?', const='profile', metavar='PREFIX',
+                            help="开启性能分析，窗口关闭后写出报告和火焰图数据（默认前缀profile）")
+    cli_args = arg_parser.parse_args()
+
+    profiler = Profiler(cli_args.profile) if cli_args.profile else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        app = ActivityViewer()
+        app.mainloop()
+    finally:
+        if profiler is not None:
+            profiler.stop()
@@ -0,0 +1,46 @@
+"""
+本地JSON API服务入口：常驻运行，为看板、机器人等工具提供活动数据查询。
+
+用法:
+    python service_main.py --accounts accounts.csv --port 8765
+
+接口:
+    GET /accounts                                 已配置的账号及缓存状态
+    GET /accounts/<学号>/activities               账号的活动列表
+    GET /accounts/<学号>/activities/<actid>       账号在某个活动中的详情（含签到签退状态）
+    GET /activities/<actid>                       活动信息（时间、积分、标签等）
+    GET /stats                                    服务运行指标
+    以上接口均可加 ?refresh=1 忽略缓存重新获取
+"""
+
+import argparse
+import asyncio
+
+from colorama import Fore, Style, init
+
+import src.config as config
+from src.api_service import ActivityService, serve
+from src.batch_runner import iter_accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='第二课堂活动数据本地JSON API服务')
+    parser.add_argument('--accounts', required=True, help='账号列表CSV文件，每行为"学号,密码"')
+    parser.add_argument('--host', default=config.SERVICE_HOST, help='监听地址（默认只监听本机）')
+    parser.add_argument('--port', type=int, default=config.SERVICE_PORT, help='监听端口')
+    parser.add_argument('--workers', type=int, default=config.SERVICE_WORKERS, help='执行上游请求的线程数')
+    args = parser.parse_args()
+
+    init(autoreset=True)
+    service = ActivityService(dict(iter_accounts(args.accounts)), args.workers)
+    print(f"{Fore.CYAN}{Style.BRIGHT}已加载 {len(service.accounts())} 个账号")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"{Fore.YELLOW}{Style.BRIGHT}服务已停止。")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
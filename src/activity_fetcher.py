@@ -1,7 +1,12 @@
 # activity_fetcher.py
 
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import src.config as config
 import src.html_parser as html_parser
+from src.activity_metadata import ActivityMetadataTable
+from src.cancellation import CancellationToken, OperationCancelled, check_cancelled
+from src.prefetch_policy import PrefetchCandidate, make_policy
 from typing import List, Dict, Any, Tuple
 from colorama import Fore, Style
 
@@ -10,120 +15,333 @@ class ActivityFetcher:
     活动数据获取器类，负责获取活动列表和活动详情。
     """
     
-    def __init__(self, client, detail_fetch_limit=5):
+    def __init__(self, client, detail_fetch_limit=5, history=None, limiter=None, metadata=None, prefetch_policy=None):
         """
         初始化活动获取器。
         
         Args:
             client: API客户端实例
             detail_fetch_limit: 预加载详情的活动数量限制
+            history: 可选的ActivityHistoryDB实例，获取结果会写入本地历史
+            limiter: 可选的AdaptiveLimiter实例，设置后详情请求按自适应并发上限并发进行
+            metadata: 可选的ActivityMetadataTable实例（多账号共享），设置后同一活动的信息只解析和保存一份
+            prefetch_policy: 可选的预加载策略（见prefetch_policy模块），默认按配置中的PREFETCH_POLICY创建
         """
         self.client = client
         self.detail_fetch_limit = detail_fetch_limit
+        self.history = history
+        self.limiter = limiter
+        self.metadata = metadata
+        self.prefetch_policy = prefetch_policy or make_policy()
 
-    def fetch_all_activities(self, callback=None) -> List[Dict[str, Any]]:
+    def _save_history(self, records: List[Dict[str, Any]]):
         """
-        获取所有活动数据，并预先加载前N个活动的详情。
+        将获取结果写入本地历史数据库。写入失败只打印错误，不影响获取流程。
+
+        Args:
+            records: 活动记录列表
+        """
+        if self.history is None or not records:
+            return
+        student_id = self.client.get_username()
+        if not student_id:
+            return
+        try:
+            self.history.save_activities(student_id, self.client.get_student_name(), records)
+        except Exception as e:
+            print(f"{Fore.RED}✗ 保存活动历史失败: {e}")
+
+    @staticmethod
+    def is_settled(record: Dict[str, Any]) -> bool:
+        """
+        判断已缓存的活动记录是否已经完成签到签退，无需再次请求详情。
+
+        Args:
+            record: 活动记录
+
+        Returns:
+            bool: 已加载详情且签到签退都已完成返回True
+        """
+        if not record.get('is_loaded') or 'error' in record:
+            return False
+        signin_ok = record.get('signin_ok', record.get('signin') == '已签到')
+        signout_ok = record.get('signout_ok', record.get('signout') == '已签退')
+        return bool(signin_ok and signout_ok)
+
+    def fetch_all_activities(self, callback=None, cancel_token: CancellationToken | None = None, known=None,
+                             reuse_loaded: bool = False, on_record=None) -> List[Dict[str, Any]]:
+        """
+        获取所有活动数据，并预先加载N个活动的详情。
+        传入上次的结果时进行增量获取：已完成签到签退的活动直接复用缓存，
+        预加载名额由预加载策略分配给其余活动，未选中的活动保留缓存中的详情。
+        配置了自适应并发限制器时，详情请求并发进行，并发数由限制器控制，
+        并且（STREAM_ACTIVITY_LIST开启时）边下载活动列表边开始请求详情。
         
         Args:
             callback: 可选的进度回调函数
+            cancel_token: 可选的取消令牌，每个请求前后都会检查
+            known: 可选的上次结果，活动URL到活动记录的映射
+            reuse_loaded: 为True时，known中所有已成功加载详情的记录都直接复用（用于断点续跑）
+            on_record: 可选的回调函数，每成功获取一条活动详情后以合并后的记录调用（用于检查点）
             
         Returns:
             List[Dict[str, Any]]: 包含活动数据的列表
+
+        Raises:
+            OperationCancelled: 获取过程被取消时抛出
         """
-        activity_data_cache = []
+        known = known or {}
 
         try:
-            # 获取活动列表（包含名称和URL）
-            list_html = self.client.get_activity_list()
-            activities = html_parser.parse_activity_list(list_html)
+            # 1. 获取活动列表并由预加载策略分配名额；并发获取详情时边下载列表边开始请求
+            activity_data_cache: List[Dict[str, Any] | None] = []
+            streaming = config.STREAM_ACTIVITY_LIST and self.limiter is not None
+            to_fetch = self._plan_details(activity_data_cache, streaming, known, reuse_loaded, cancel_token)
 
-            print(f"\n{Fore.CYAN}{Style.BRIGHT}{'='*80}")
-            print(f"{Fore.CYAN}{Style.BRIGHT}{'活动列表检索结果':^80}")
-            print(f"{Fore.CYAN}{Style.BRIGHT}{'='*80}")
+            # 2. 按策略选出的顺序获取详情
+            for position, record in self._fetch_details(to_fetch, callback, cancel_token):
+                activity_data_cache[position] = record
+                if on_record and record['is_loaded']:
+                    on_record(record)
 
-            if not activities:
-                print(f"{Fore.YELLOW}{Style.BRIGHT}未找到任何已报名的活动。")
+            if not activity_data_cache:
                 return []
 
-            print(f"{Fore.GREEN}{Style.BRIGHT}✓ 找到了 {len(activities)} 个活动，正在获取前 {self.detail_fetch_limit} 条详情...")
-
-            # 2. 获取详情（限制前N个项目）
-            for i, activity in enumerate(activities):
-                if i < self.detail_fetch_limit:
-                    # 预先获取详情
-                    if callback:
-                        callback(f"正在获取详情: {i+1}/{self.detail_fetch_limit} - {activity['name'][:30]}...")
-
-                    try:
-                        detail_data = self.client.get_activity_detail(activity['url'])
-                        details = html_parser.parse_activity_detail(detail_data)
-
-                        # 组合活动名称和详情，并标记为已加载
-                        activity_data_cache.append({
-                            **activity,
-                            **details,
-                            'is_loaded': True
-                        })
-                        print(f"{Fore.GREEN}✓ 详情获取成功: {activity['name']}")
-                    except Exception as e:
-                        error_msg = f"Error fetching detail for {activity['name']}: {e}"
-                        print(f"{Fore.RED}✗ {error_msg}")
-                        # 获取失败的也只显示基础信息
-                        activity_data_cache.append({
-                            **activity,
-                            **html_parser.parse_basic_activity_info(activity),
-                            'is_loaded': False
-                        })
-                else:
-                    # 仅显示基础信息（超过限制的）
-                    activity_data_cache.append({
-                        **activity,
-                        **html_parser.parse_basic_activity_info(activity),
-                        'is_loaded': False
-                    })
-
             # 3. 排序所有数据（按活动时间戳排序，降序排列最新的在前）
             activity_data_cache.sort(
                 key=lambda x: x.get('acttime_timestamp', 0),
                 reverse=True
             )
 
+            self._save_history(activity_data_cache)
             return activity_data_cache
 
+        except OperationCancelled:
+            print(f"{Fore.YELLOW}{Style.BRIGHT}活动获取已取消。")
+            raise
         except Exception as e:
             error_msg = f"获取数据失败: {e}"
             print(f"{Fore.RED}{Style.BRIGHT}✗ {error_msg}")
             raise
 
-    def fetch_single_activity_detail(self, detail_url: str) -> Dict[str, Any]:
+    def _plan_details(self, records: List[Dict[str, Any] | None], streaming: bool, known,
+                      reuse_loaded: bool, cancel_token: CancellationToken | None = None):
+        """
+        获取活动列表并逐个决定复用缓存、获取详情还是只显示基础信息。
+        已完成的活动状态不会再变化（续跑时已加载的也一样），直接复用缓存；
+        其余活动交给预加载策略，能确定会被选中的活动在列表获取过程中就产出，
+        列表结束后再产出策略补选的活动，未选中的活动保留缓存详情或只显示基础信息。
+
+        Args:
+            records: 输出参数，按列表顺序填入复用或未选中的活动记录，需要获取详情的位置暂为None
+            streaming: 是否流式获取活动列表
+            known: 上次结果，活动URL到活动记录的映射
+            reuse_loaded: 是否复用所有已成功加载详情的记录
+            cancel_token: 可选的取消令牌
+
+        Yields:
+            Tuple[int, Dict[str, Any]]: 需要获取详情的 (位置, 活动)
+        """
+        if streaming:
+            activities = self.client.iter_activities(cancel_token=cancel_token)
+        else:
+            activities = self.client.get_activities(cancel_token=cancel_token)
+        selection = self.prefetch_policy.stream(self.detail_fetch_limit)
+        for activity in activities:
+            position = len(records)
+            cached = known.get(activity['url'])
+            if cached is not None and (self.is_settled(cached) or (reuse_loaded and cached.get('is_loaded') and 'error' not in cached)):
+                records.append({**cached, **activity})
+                continue
+            records.append(None)
+            if selection.offer(PrefetchCandidate(position, activity, cached)):
+                yield position, activity
+
+        print(f"\n{Fore.CYAN}{Style.BRIGHT}{'='*80}")
+        print(f"{Fore.CYAN}{Style.BRIGHT}{'活动列表检索结果':^80}")
+        print(f"{Fore.CYAN}{Style.BRIGHT}{'='*80}")
+        if not records:
+            print(f"{Fore.YELLOW}{Style.BRIGHT}未找到任何已报名的活动。")
+            return
+        print(f"{Fore.GREEN}{Style.BRIGHT}✓ 找到了 {len(records)} 个活动，正在获取 {self.detail_fetch_limit} 条详情...")
+
+        for candidate in selection.finish():
+            yield candidate.position, candidate.activity
+        for position, activity, cached in selection.unselected():
+            if cached is not None and cached.get('is_loaded'):
+                records[position] = {**cached, **activity}
+            else:
+                records[position] = self._basic_record(activity)
+
+    @staticmethod
+    def _basic_record(activity: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        生成只包含基础信息的活动记录（未获取详情或获取失败时使用）。
+
+        Args:
+            activity: 活动列表中的活动（name和url）
+
+        Returns:
+            Dict[str, Any]: 活动记录
+        """
+        return {
+            **activity,
+            **html_parser.parse_basic_activity_info(activity),
+            'is_loaded': False
+        }
+
+    def _request_detail(self, detail_url: str, cancel_token: CancellationToken | None = None,
+                        activity_info: bool = True) -> Dict[str, Any]:
+        """
+        请求并解析活动详情。配置了限制器时，请求在并发名额内进行，耗时和结果反馈给限制器。
+
+        Args:
+            detail_url: 活动详情页面的URL
+            cancel_token: 可选的取消令牌
+            activity_info: 为False时只解析签到签退状态
+
+        Returns:
+            Dict[str, Any]: 解析后的活动详情
+        """
+        if self.limiter is None and activity_info:
+            return self.client.get_parsed_activity_detail(detail_url, cancel_token=cancel_token)
+        if self.limiter is None:
+            content, encoding = self.client.get_activity_detail_content(detail_url, cancel_token=cancel_token)
+        else:
+            # 只对网络请求计时：限速排队在并发名额之外，解析不占用并发名额
+            self.client.wait_for_detail_budget(cancel_token)
+            with self.limiter.slot(cancel_token):
+                content, encoding = self.client.get_activity_detail_content(detail_url, cancel_token=cancel_token, budget=False)
+        return self.client.parse_detail_content(content, encoding, activity_info)
+
+    def _shared_detail_record(self, activity: Dict[str, Any], cancel_token: CancellationToken | None = None):
+        """
+        获取活动详情并生成引用共享活动信息的报名记录。
+        活动信息已在共享表中时只解析签到签退状态。
+
+        Args:
+            activity: 活动列表中的活动（name和url）
+            cancel_token: 可选的取消令牌
+
+        Returns:
+            EnrollmentRecord: 报名记录
+        """
+        _, actid = html_parser.parse_activity_ids(activity['url'])
+        meta = self.metadata.get(actid)
+        details = self._request_detail(activity['url'], cancel_token, activity_info=meta is None)
+        if meta is None:
+            meta = self.metadata.add(actid, details)
+        return ActivityMetadataTable.enrollment(activity, details, meta)
+
+    def _fetch_detail_record(self, activity: Dict[str, Any], cancel_token: CancellationToken | None = None) -> Dict[str, Any]:
+        """
+        获取单个活动的详情并与基础信息合并，失败时返回基础信息记录。
+
+        Args:
+            activity: 活动列表中的活动（name和url）
+            cancel_token: 可选的取消令牌
+
+        Returns:
+            Dict[str, Any]: 活动记录
+
+        Raises:
+            OperationCancelled: 获取过程被取消时抛出
+        """
+        try:
+            if self.metadata is not None:
+                record = self._shared_detail_record(activity, cancel_token)
+            else:
+                details = self._request_detail(activity['url'], cancel_token)
+                # 组合活动名称和详情，并标记为已加载
+                record = {
+                    **activity,
+                    **details,
+                    'is_loaded': True
+                }
+            print(f"{Fore.GREEN}✓ 详情获取成功: {activity['name']}")
+            return record
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            error_msg = f"Error fetching detail for {activity['name']}: {e}"
+            print(f"{Fore.RED}✗ {error_msg}")
+            # 获取失败的也只显示基础信息
+            return self._basic_record(activity)
+
+    def _fetch_details(self, to_fetch, callback=None, cancel_token: CancellationToken | None = None):
+        """
+        获取一组活动的详情，按完成顺序产出结果。
+        未配置限制器时依次请求；配置了限制器时并发请求，并发数由限制器动态控制，
+        每从to_fetch取得一个活动就立即提交请求（to_fetch可以是边获取列表边产出的生成器）。
+
+        Args:
+            to_fetch: (位置, 活动) 可迭代对象
+            callback: 可选的进度回调函数
+            cancel_token: 可选的取消令牌
+
+        Yields:
+            Tuple[int, Dict[str, Any]]: (位置, 活动记录)
+        """
+        if self.limiter is None:
+            to_fetch = list(to_fetch)
+            total = len(to_fetch)
+            for fetched, (position, activity) in enumerate(to_fetch, 1):
+                check_cancelled(cancel_token)
+                if callback:
+                    callback(f"正在获取详情: {fetched}/{total} - {activity['name'][:30]}...")
+                yield position, self._fetch_detail_record(activity, cancel_token)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.limiter.max_limit)
+        try:
+            futures = {
+                executor.submit(self._fetch_detail_record, activity, cancel_token): position
+                for position, activity in to_fetch
+            }
+            total = len(futures)
+            for fetched, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                check_cancelled(cancel_token)
+                if callback:
+                    callback(f"已获取详情: {fetched}/{total}（并发上限 {self.limiter.limit}）- {record['name'][:30]}")
+                yield futures[future], record
+        finally:
+            # 取消或出错时放弃尚未开始的请求
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def fetch_single_activity_detail(self, detail_url: str, cancel_token: CancellationToken | None = None) -> Dict[str, Any]:
         """
         获取单个活动的详细信息。
         
         Args:
             detail_url: 活动详情页面的URL
+            cancel_token: 可选的取消令牌
             
         Returns:
             Dict[str, Any]: 活动详情数据
+
+        Raises:
+            OperationCancelled: 获取过程被取消时抛出
         """
         try:
-            # 获取活动详情数据
-            detail_data = self.client.get_activity_detail(detail_url)
-            
-            # 解析详情数据
-            details = html_parser.parse_activity_detail(detail_data)
+            # 获取并解析活动详情数据
+            details = self._request_detail(detail_url, cancel_token)
             
             # 返回带有加载标记的详情
-            return {
+            result = {
                 **details,
                 'is_loaded': True
             }
+            self._save_history([{'url': detail_url, **result}])
+            return result
+        except OperationCancelled:
+            raise
         except Exception as e:
             print(f"{Fore.RED}获取活动详情失败: {str(e)}")
-            # 返回基本信息和错误标记
-            basic_info = html_parser.parse_basic_activity_info({'detail_url': detail_url})
+            # 返回基本信息和错误标记（只有详情URL，不包含活动名称，合并时保留原有的名称）
+            placeholder = html_parser.parse_basic_activity_info({'name': None})
             return {
-                **basic_info,
+                **{key: value for key, value in placeholder.items() if key != 'name'},
                 'is_loaded': True,
                 'error': str(e)
             }
@@ -144,16 +362,36 @@ class ActivityFetcherThread:
         self.thread = None
         self.result = None
         self.error = None
+        # 每个获取线程拥有独立的取消令牌
+        self.cancel_token = CancellationToken()
+
+    def cancel(self):
+        """
+        请求取消该线程中的获取操作。
+        尚未开始的请求会被放弃，进行中的请求在下一个检查点中止。
+        """
+        self.cancel_token.cancel()
 
-    def start(self, detail_url=None, index=None, on_complete=None, on_update=None):
+    @property
+    def cancelled(self) -> bool:
+        """
+        是否已请求取消。
+
+        Returns:
+            bool: 已取消返回True
+        """
+        return self.cancel_token.cancelled
+
+    def start(self, detail_url=None, index=None, on_complete=None, on_update=None, known=None):
         """
         启动获取线程。
         
         Args:
             detail_url: 单个活动详情获取的可选URL
-            index: 行索引（用于单个活动获取）
+            index: 行标识（用于单个活动获取，原样随结果返回）
             on_complete: 获取完成时的可选回调函数
             on_update: 获取进度更新的可选回调函数
+            known: 可选的上次结果（活动URL到活动记录的映射），用于增量获取
         """
         if detail_url is not None and index is not None:
             # 获取单个活动详情
@@ -166,21 +404,93 @@ class ActivityFetcherThread:
             # 获取所有活动
             self.thread = threading.Thread(
                 target=self._fetch_all_thread,
-                args=(on_complete, on_update),
+                args=(on_complete, on_update, known),
                 daemon=True
             )
         self.thread.start()
 
-    def _fetch_all_thread(self, on_complete=None, on_update=None):
+    def start_login_and_fetch(self, username, password, on_login=None, on_complete=None, on_update=None, known=None):
+        """
+        启动"登录→获取活动列表→预加载详情"的流水线线程。
+        登录成功后在同一工作线程中直接继续获取，无需用户再次点击。
+
+        Args:
+            username: 用户名（学号）
+            password: 密码
+            on_login: 登录结束时的回调函数，参数为(是否成功, 消息)
+            on_complete: 获取完成时的可选回调函数
+            on_update: 获取进度更新的可选回调函数
+            known: 可选的上次结果，用于增量获取
+        """
+        self.thread = threading.Thread(
+            target=self._login_and_fetch_thread,
+            args=(username, password, on_login, on_complete, on_update, known),
+            daemon=True
+        )
+        self.thread.start()
+
+    def start_login(self, username, password, on_login=None):
+        """
+        启动只登录、不获取活动列表的线程，登录请求可以通过cancel()中止。
+
+        Args:
+            username: 用户名（学号）
+            password: 密码
+            on_login: 登录结束时的回调函数，参数为(是否成功, 消息)，取消时不调用
+        """
+        self.thread = threading.Thread(
+            target=self._login_and_fetch_thread,
+            args=(username, password, on_login),
+            kwargs={'fetch': False},
+            daemon=True
+        )
+        self.thread.start()
+
+    def _login_and_fetch_thread(self, username, password, on_login=None, on_complete=None, on_update=None, known=None,
+                                fetch=True):
+        """
+        登录并获取所有活动的线程函数。
+
+        Args:
+            username: 用户名（学号）
+            password: 密码
+            on_login: 登录结束时的回调函数
+            on_complete: 获取完成时的回调函数
+            on_update: 获取进度更新的回调函数
+            known: 上次结果，用于增量获取
+            fetch: 为False时登录成功后不获取活动列表
+        """
+        try:
+            success, message = self.fetcher.client.login(username, password, cancel_token=self.cancel_token)
+        except OperationCancelled as e:
+            self.error = e
+            if on_complete:
+                on_complete(False, None, e)
+            return
+        except Exception as e:
+            self.error = e
+            if on_login:
+                on_login(False, str(e))
+            return
+
+        if on_login:
+            on_login(success, message)
+        if not success or not fetch:
+            return
+
+        self._fetch_all_thread(on_complete, on_update, known)
+
+    def _fetch_all_thread(self, on_complete=None, on_update=None, known=None):
         """
         获取所有活动的线程函数。
         
         Args:
             on_complete: 获取完成时的回调函数
             on_update: 获取进度更新的回调函数
+            known: 上次结果，用于增量获取
         """
         try:
-            self.result = self.fetcher.fetch_all_activities(callback=on_update)
+            self.result = self.fetcher.fetch_all_activities(callback=on_update, cancel_token=self.cancel_token, known=known)
             if on_complete:
                 on_complete(True, self.result, None)
         except Exception as e:
@@ -194,12 +504,12 @@ class ActivityFetcherThread:
         
         Args:
             detail_url: 活动详情URL
-            index: 活动索引
+            index: 行标识
             on_complete: 获取完成时的回调函数
             on_update: 获取进度更新的回调函数
         """
         try:
-            self.result = self.fetcher.fetch_single_activity_detail(detail_url)
+            self.result = self.fetcher.fetch_single_activity_detail(detail_url, cancel_token=self.cancel_token)
             if on_complete:
                 on_complete(True, {'detail': self.result, 'index': index}, None)
         except Exception as e:
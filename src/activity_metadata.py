@@ -0,0 +1,140 @@
+# activity_metadata.py
+
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Dict, Iterator
+
+# 详情中每个学生各不相同的签到签退字段
+STATUS_FIELDS = ('signin', 'signout', 'signin_ok', 'signout_ok')
+# 报名记录自身保存的字段，其余字段来自共享的活动信息
+ENROLLMENT_FIELDS = ('name', 'url', 'is_loaded', 'error') + STATUS_FIELDS
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class EnrollmentRecord(Mapping):
+    """
+    学生的一条报名记录：自身只保存活动名称、URL和签到签退状态，
+    活动时间、积分、标签等字段引用按actid共享的活动信息。
+    以只读映射的方式提供与普通活动记录相同的字段，现有代码可以直接使用。
+    """
+    __slots__ = ('_own', '_meta')
+
+    def __init__(self, own: Dict[str, Any], meta: Mapping):
+        """
+        初始化报名记录。
+
+        Args:
+            own: 学生自己的字段
+            meta: 共享的活动信息
+        """
+        self._own = own
+        self._meta = meta
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._own:
+            return self._own[key]
+        return self._meta[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._own
+        for key in self._meta:
+            if key not in self._own:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._own) + sum(1 for key in self._meta if key not in self._own)
+
+    def __repr__(self) -> str:
+        return f"EnrollmentRecord({dict(self)!r})"
+
+
+class ActivityMetadataTable:
+    """
+    多账号共享的活动信息表，以actid为键。
+    详情响应中的'Activity'部分对报名同一活动的所有学生都相同，
+    只在第一次遇到某个actid时解析并保存一份（字符串经过驻留），
+    之后同一活动只解析各学生自己的签到签退状态。
+    """
+
+    def __init__(self):
+        """
+        初始化空的活动信息表。
+        """
+        self._table: Dict[str, Mapping] = {}
+        # actid -> 保存活动信息的时间（即获取该详情的时间）
+        self._added_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def get(self, actid: str) -> Mapping | None:
+        """
+        查找活动信息，找到时复用次数加一（每条报名记录只应查找一次）。
+
+        Args:
+            actid: 活动ID
+
+        Returns:
+            Mapping: 共享的活动信息，不存在时返回None
+        """
+        with self._lock:
+            meta = self._table.get(actid)
+            if meta is not None:
+                self.hits += 1
+        return meta
+
+    def add(self, actid: str, fields: Mapping[str, Any]) -> Mapping:
+        """
+        保存活动信息，已存在时返回已有的那一份。
+
+        Args:
+            actid: 活动ID
+            fields: 详情解析结果（只保留活动信息部分）
+
+        Returns:
+            Mapping: 共享的只读活动信息
+        """
+        meta = MappingProxyType({
+            _intern(key): _intern(value) for key, value in fields.items() if key not in ENROLLMENT_FIELDS
+        })
+        with self._lock:
+            if actid not in self._table:
+                self._added_at[actid] = time.time()
+            return self._table.setdefault(actid, meta)
+
+    def added_at(self, actid: str) -> float | None:
+        """
+        查询活动信息的保存时间。
+
+        Args:
+            actid: 活动ID
+
+        Returns:
+            float: 保存时间的时间戳，不存在时返回None
+        """
+        return self._added_at.get(actid)
+
+    @staticmethod
+    def enrollment(activity: Mapping[str, Any], details: Mapping[str, Any], meta: Mapping) -> EnrollmentRecord:
+        """
+        生成引用共享活动信息的报名记录。
+
+        Args:
+            activity: 活动列表中的活动（name和url）
+            details: 详情解析结果，只取其中的签到签退字段
+            meta: 共享的活动信息
+
+        Returns:
+            EnrollmentRecord: 报名记录
+        """
+        own = {'name': _intern(activity['name']), 'url': activity['url'], 'is_loaded': True}
+        own.update((key, details[key]) for key in STATUS_FIELDS)
+        return EnrollmentRecord(own, meta)
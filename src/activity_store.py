@@ -0,0 +1,271 @@
+# activity_store.py
+
+import queue
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Tuple
+
+from src.aggregates import ActivityAggregator, ActivitySummary, EMPTY_SUMMARY
+
+
+class ActivityChange(NamedTuple):
+    """
+    提交给状态存储的不可变变更记录。
+
+    kind取值：
+    - 'replace': 用records替换全部活动数据
+    - 'extend': 添加records中的活动（已存在的同一活动被替换）
+    - 'update': 将fields合并到key对应的活动（fields是成功加载的详情时，清除之前的错误标记）
+    - 'clear': 清空全部活动数据
+    """
+    kind: str
+    records: Tuple[Mapping[str, Any], ...] = ()
+    key: str | None = None
+    fields: Mapping[str, Any] | None = None
+    message: str | None = None
+
+
+class ActivitySnapshot(NamedTuple):
+    """
+    状态存储发布的不可变快照。
+    records按活动时间降序排列，by_key以活动URL为键索引同一批记录，
+    summary为随数据增量维护的积分学时汇总。
+    """
+    version: int
+    records: Tuple[Mapping[str, Any], ...]
+    by_key: Mapping[str, Mapping[str, Any]]
+    message: str | None = None
+    summary: ActivitySummary = EMPTY_SUMMARY
+
+    def get(self, key: str) -> Mapping[str, Any] | None:
+        """
+        按活动URL查找记录。
+
+        Args:
+            key: 活动URL
+
+        Returns:
+            Mapping[str, Any]: 活动记录，不存在时返回None
+        """
+        return self.by_key.get(key)
+
+
+EMPTY_SNAPSHOT = ActivitySnapshot(0, (), MappingProxyType({}))
+
+
+def activity_key(record: Mapping[str, Any]) -> str:
+    """
+    获取活动记录的唯一键（详情URL，包含id和actid）。
+
+    Args:
+        record: 活动记录
+
+    Returns:
+        str: 活动记录的唯一键
+    """
+    return record.get('url') or record['name']
+
+
+class ActivityStateStore:
+    """
+    线程封闭的活动数据状态存储。
+    工作线程通过submit()提交不可变的变更记录，由唯一的所有者线程依次应用，
+    并发布带版本号的不可变快照。读取方直接读取snapshot属性，无需加锁。
+    """
+
+    def __init__(self):
+        """
+        初始化状态存储并启动所有者线程。
+        """
+        self._changes = queue.Queue()
+        self._listeners: List[Callable[[ActivitySnapshot], None]] = []
+        # 以下状态只在所有者线程中访问
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._aggregator = ActivityAggregator()
+        self._snapshot = EMPTY_SNAPSHOT
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def snapshot(self) -> ActivitySnapshot:
+        """
+        当前发布的快照（引用赋值是原子的，读取无需加锁）。
+
+        Returns:
+            ActivitySnapshot: 最新快照
+        """
+        return self._snapshot
+
+    def subscribe(self, listener: Callable[[ActivitySnapshot], None]):
+        """
+        注册快照发布监听器。监听器在所有者线程中调用，不得直接访问Tk对象。
+
+        Args:
+            listener: 接收新快照的回调函数
+        """
+        self._listeners.append(listener)
+
+    def submit(self, change: ActivityChange):
+        """
+        提交变更记录，可在任意线程中调用。
+
+        Args:
+            change: 变更记录
+        """
+        self._changes.put(change)
+
+    def replace_all(self, records: List[Dict[str, Any]], message: str | None = None):
+        """
+        提交替换全部活动数据的变更。
+
+        Args:
+            records: 活动数据列表
+            message: 可选的随快照发布的状态消息
+        """
+        frozen = tuple(MappingProxyType(dict(record)) for record in records)
+        self.submit(ActivityChange('replace', records=frozen, message=message))
+
+    def extend(self, records: List[Dict[str, Any]], message: str | None = None):
+        """
+        提交添加一批活动数据的变更（例如分页读取的下一页）。
+
+        Args:
+            records: 活动数据列表
+            message: 可选的随快照发布的状态消息
+        """
+        frozen = tuple(MappingProxyType(dict(record)) for record in records)
+        self.submit(ActivityChange('extend', records=frozen, message=message))
+
+    def update(self, key: str, fields: Dict[str, Any], message: str | None = None):
+        """
+        提交更新单个活动的变更。
+
+        Args:
+            key: 活动唯一键
+            fields: 要合并的字段
+            message: 可选的随快照发布的状态消息
+        """
+        self.submit(ActivityChange('update', key=key, fields=MappingProxyType(dict(fields)), message=message))
+
+    def clear(self, message: str | None = None):
+        """
+        提交清空全部活动数据的变更。
+
+        Args:
+            message: 可选的随快照发布的状态消息
+        """
+        self.submit(ActivityChange('clear', message=message))
+
+    def close(self):
+        """
+        停止所有者线程。
+        """
+        self._changes.put(None)
+
+    def _run(self):
+        """
+        所有者线程：应用变更记录并发布快照。
+        同一时刻排队的多条变更合并为一次发布。
+        """
+        while True:
+            change = self._changes.get()
+            if change is None:
+                return
+
+            batch = [change]
+            while True:
+                try:
+                    pending = self._changes.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is None:
+                    self._changes.put(None)
+                    break
+                batch.append(pending)
+
+            message = None
+            changed = False
+            for item in batch:
+                changed = self._apply(item) or changed
+                if item.message is not None:
+                    message = item.message
+
+            if changed or message is not None:
+                self._publish(message, changed)
+
+    def _apply(self, change: ActivityChange) -> bool:
+        """
+        应用单条变更记录。
+
+        Args:
+            change: 变更记录
+
+        Returns:
+            bool: 数据是否发生变化
+        """
+        if change.kind == 'replace':
+            old_records = self._records
+            self._records = {activity_key(record): dict(record) for record in change.records}
+            # 汇总只按变化的记录做差量更新
+            for key, old in old_records.items():
+                if key not in self._records:
+                    self._aggregator.remove(old)
+            for key, new in self._records.items():
+                old = old_records.get(key)
+                if old != new:
+                    self._aggregator.replace(old, new)
+            return True
+        if change.kind == 'extend':
+            for record in change.records:
+                key = activity_key(record)
+                new = dict(record)
+                self._aggregator.replace(self._records.get(key), new)
+                self._records[key] = new
+            return bool(change.records)
+        if change.kind == 'clear':
+            had_records = bool(self._records)
+            self._records = {}
+            self._aggregator.reset()
+            return had_records
+        if change.kind == 'update':
+            record = self._records.get(change.key)
+            if record is None:
+                return False
+            self._aggregator.remove(record)
+            record.update(change.fields)
+            if change.fields.get('is_loaded') and 'error' not in change.fields:
+                # 重新获取成功后，之前失败留下的错误标记不再有效
+                record.pop('error', None)
+            self._aggregator.add(record)
+            return True
+        raise ValueError(f"未知的变更类型: {change.kind}")
+
+    def _publish(self, message: str | None, changed: bool):
+        """
+        根据当前数据发布新快照并通知监听器。
+
+        Args:
+            message: 随快照发布的状态消息
+            changed: 数据是否发生变化，未变化时沿用原版本号
+        """
+        if changed:
+            # 按活动时间戳排序，降序排列最新的在前
+            ordered = sorted(
+                self._records.values(),
+                key=lambda x: x.get('acttime_timestamp', 0),
+                reverse=True
+            )
+            records = tuple(MappingProxyType(dict(record)) for record in ordered)
+            by_key = MappingProxyType({activity_key(record): record for record in records})
+            version = self._snapshot.version + 1
+            summary = self._aggregator.summary()
+        else:
+            records, by_key, version = self._snapshot.records, self._snapshot.by_key, self._snapshot.version
+            summary = self._snapshot.summary
+
+        self._snapshot = ActivitySnapshot(version, records, by_key, message, summary)
+        for listener in list(self._listeners):
+            try:
+                listener(self._snapshot)
+            except Exception as e:
+                print(f"快照监听器执行失败: {e}")
@@ -0,0 +1,210 @@
+# aggregates.py
+
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Tuple
+
+
+class GroupTotals(NamedTuple):
+    """
+    某一分类（或类别）的汇总结果。
+    """
+    activities: int
+    completed: int
+    points: float
+    hours: float
+
+
+class ActivitySummary(NamedTuple):
+    """
+    活动数据的不可变汇总结果。
+
+    - activities: 活动总数
+    - unloaded: 尚未加载详情的活动数
+    - completed: 已完成签到签退的活动数
+    - points / hours: 已完成活动的积分和学时合计
+    - missing_signin / missing_signout: 已加载详情但未签到 / 未签退的活动数
+    - by_classification / by_category: 按classificationtitle / categorytitle分组的汇总
+    """
+    activities: int
+    unloaded: int
+    completed: int
+    points: float
+    hours: float
+    missing_signin: int
+    missing_signout: int
+    by_classification: Mapping[str, GroupTotals]
+    by_category: Mapping[str, GroupTotals]
+
+
+EMPTY_SUMMARY = ActivitySummary(0, 0, 0, 0.0, 0.0, 0, 0, MappingProxyType({}), MappingProxyType({}))
+
+
+def _contribution(record: Mapping[str, Any]) -> Tuple[bool, bool, bool, bool, float, float]:
+    """
+    计算单条活动记录对汇总的贡献。
+
+    Args:
+        record: 活动记录
+
+    Returns:
+        Tuple: (已加载, 已签到, 已签退, 已完成, 积分, 学时)
+    """
+    loaded = bool(record.get('is_loaded')) and 'error' not in record
+    if not loaded:
+        return False, False, False, False, 0.0, 0.0
+    signin_ok = bool(record.get('signin_ok', record.get('signin') == '已签到'))
+    signout_ok = bool(record.get('signout_ok', record.get('signout') == '已签退'))
+    completed = signin_ok and signout_ok
+    points = (record.get('points_value') or 0.0) if completed else 0.0
+    hours = (record.get('hours_value') or 0.0) if completed else 0.0
+    return True, signin_ok, signout_ok, completed, points, hours
+
+
+class ActivityAggregator:
+    """
+    增量维护的活动汇总（积分、学时、完成情况）。
+    每条记录的新增、删除或变化只按差量更新计数，不需要重新遍历全部数据；
+    可用于界面的汇总面板，也可在无界面的批量运行中为每个学生计算合计。
+    """
+
+    def __init__(self):
+        """
+        初始化空的汇总。
+        """
+        self.reset()
+
+    def reset(self):
+        """
+        清空全部汇总。
+        """
+        self._activities = 0
+        self._unloaded = 0
+        self._completed = 0
+        self._points = 0.0
+        self._hours = 0.0
+        self._missing_signin = 0
+        self._missing_signout = 0
+        # 分组 -> [活动数, 已完成数, 积分, 学时]
+        self._by_classification: Dict[str, list] = {}
+        self._by_category: Dict[str, list] = {}
+
+    def add(self, record: Mapping[str, Any]):
+        """
+        将一条活动记录计入汇总。
+
+        Args:
+            record: 活动记录
+        """
+        self._apply(record, 1)
+
+    def remove(self, record: Mapping[str, Any]):
+        """
+        从汇总中扣除一条活动记录。
+
+        Args:
+            record: 之前计入汇总的活动记录
+        """
+        self._apply(record, -1)
+
+    def replace(self, old: Mapping[str, Any] | None, new: Mapping[str, Any] | None):
+        """
+        用新记录替换旧记录（任一方为None表示新增或删除）。
+
+        Args:
+            old: 原记录
+            new: 新记录
+        """
+        if old is not None:
+            self.remove(old)
+        if new is not None:
+            self.add(new)
+
+    def _apply(self, record: Mapping[str, Any], sign: int):
+        """
+        按符号将记录的贡献加入或扣除。
+
+        Args:
+            record: 活动记录
+            sign: 1表示加入，-1表示扣除
+        """
+        loaded, signin_ok, signout_ok, completed, points, hours = _contribution(record)
+        self._activities += sign
+        if not loaded:
+            self._unloaded += sign
+            return
+
+        self._missing_signin += sign * (not signin_ok)
+        self._missing_signout += sign * (not signout_ok)
+        self._completed += sign * completed
+        self._points += sign * points
+        self._hours += sign * hours
+
+        for groups, name in ((self._by_classification, record.get('classification') or '未分类'),
+                             (self._by_category, record.get('category') or '未分类')):
+            totals = groups.setdefault(name, [0, 0, 0.0, 0.0])
+            totals[0] += sign
+            totals[1] += sign * completed
+            totals[2] += sign * points
+            totals[3] += sign * hours
+            if totals[0] == 0:
+                del groups[name]
+
+    def summary(self) -> ActivitySummary:
+        """
+        生成当前汇总的不可变结果。
+
+        Returns:
+            ActivitySummary: 汇总结果
+        """
+        def freeze(groups):
+            return MappingProxyType({
+                name: GroupTotals(count, completed, round(points, 2), round(hours, 2))
+                for name, (count, completed, points, hours) in sorted(groups.items())
+            })
+
+        return ActivitySummary(
+            self._activities,
+            self._unloaded,
+            self._completed,
+            round(self._points, 2),
+            round(self._hours, 2),
+            self._missing_signin,
+            self._missing_signout,
+            freeze(self._by_classification),
+            freeze(self._by_category)
+        )
+
+
+def summarize_records(records: Iterable[Mapping[str, Any]]) -> ActivitySummary:
+    """
+    计算一组活动记录的汇总。
+
+    Args:
+        records: 活动记录
+
+    Returns:
+        ActivitySummary: 汇总结果
+    """
+    aggregator = ActivityAggregator()
+    for record in records:
+        aggregator.add(record)
+    return aggregator.summary()
+
+
+def summarize_students(records: Iterable[Tuple[str, Mapping[str, Any]]]) -> Dict[str, ActivitySummary]:
+    """
+    批量计算每个学生的汇总，记录以流的方式逐条处理。
+
+    Args:
+        records: (学号, 活动记录) 序列
+
+    Returns:
+        Dict[str, ActivitySummary]: 学号到汇总结果的映射
+    """
+    aggregators: Dict[str, ActivityAggregator] = {}
+    for student_id, record in records:
+        aggregator = aggregators.get(student_id)
+        if aggregator is None:
+            aggregator = aggregators[student_id] = ActivityAggregator()
+        aggregator.add(record)
+    return {student_id: aggregator.summary() for student_id, aggregator in aggregators.items()}
@@ -0,0 +1,558 @@
+# api_service.py
+
+import asyncio
+import ipaddress
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from typing import Any, Callable, Dict, List, Mapping, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from colorama import Fore, Style
+
+import src.config as config
+import src.html_parser as html_parser
+from src.activity_fetcher import ActivityFetcher
+from src.activity_metadata import STATUS_FIELDS, ActivityMetadataTable
+from src.cancellation import CancellationToken, OperationCancelled
+from src.concurrency import AdaptiveLimiter
+from src.network_client import ApiClient
+
+
+class ServiceError(Exception):
+    """
+    返回给客户端的错误，携带HTTP状态码。
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class CacheEntry:
+    """
+    缓存的查询结果及获取时间。
+    """
+    __slots__ = ('value', 'fetched_at')
+
+    def __init__(self, value: Any, fetched_at: float | None = None):
+        """
+        Args:
+            value: 查询结果
+            fetched_at: 获取时间的时间戳，默认为当前时间
+        """
+        self.value = value
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    def age(self) -> float:
+        """
+        距离获取时间的秒数。
+        """
+        return time.time() - self.fetched_at
+
+
+class AccountSession:
+    """
+    服务中单个账号的已登录会话。
+    会话在第一次查询时登录，之后的查询复用同一会话；超过SERVICE_SESSION_MAX_AGE或请求失败时重新登录。
+    同一账号的上游请求依次进行。
+    """
+
+    def __init__(self, username: str, password: str, limiter: AdaptiveLimiter, metadata: ActivityMetadataTable):
+        """
+        初始化账号会话（不立即登录）。
+
+        Args:
+            username: 学号
+            password: 密码
+            limiter: 所有账号共享的详情并发限制器
+            metadata: 所有账号共享的活动信息表
+        """
+        self.username = username
+        self._password = password
+        self._limiter = limiter
+        self._metadata = metadata
+        self._lock = threading.Lock()
+        self.client = None
+        self.fetcher = None
+        self.logged_in_at = None
+
+    def _login(self, cancel_token: CancellationToken):
+        """
+        创建新会话并登录。
+
+        Raises:
+            Exception: 登录失败时抛出（密码错误和网络错误都可能导致失败）
+        """
+        client = ApiClient()
+        success, message = client.login(self.username, self._password, cancel_token=cancel_token)
+        if not success:
+            client.session.close()
+            raise Exception(f"登录失败: {message}")
+        if self.client is not None:
+            self.client.session.close()
+        self.client = client
+        self.fetcher = ActivityFetcher(client, config.DETAIL_FETCH_LIMIT, limiter=self._limiter, metadata=self._metadata)
+        self.logged_in_at = time.monotonic()
+
+    def call(self, func: Callable[[ActivityFetcher], Any], cancel_token: CancellationToken) -> Any:
+        """
+        在已登录的会话中执行一次上游查询（阻塞，在工作线程中调用）。
+        查询失败时重新登录并重试一次，以应对服务器端会话过期。
+
+        Args:
+            func: 接收ActivityFetcher的查询函数
+            cancel_token: 服务的取消令牌
+
+        Returns:
+            Any: 查询函数的返回值
+        """
+        with self._lock:
+            if self.client is None or time.monotonic() - self.logged_in_at > config.SERVICE_SESSION_MAX_AGE:
+                self._login(cancel_token)
+            try:
+                return func(self.fetcher)
+            except (OperationCancelled, ServiceError):
+                raise
+            except Exception as e:
+                print(f"{Fore.YELLOW}{Style.BRIGHT}{self.username} 查询失败（{e}），重新登录后重试")
+            self._login(cancel_token)
+            return func(self.fetcher)
+
+    def close(self):
+        """
+        关闭会话。
+        """
+        if self.client is not None:
+            self.client.session.close()
+
+
+class ActivityService:
+    """
+    常驻的活动数据查询服务，供看板、机器人等其他工具通过本地JSON API使用。
+    - 每个账号保持一个已登录会话，多次查询复用
+    - 查询结果带获取时间缓存，在有效期内直接返回；上游失败时返回过期结果并标明
+    - 同一查询同时有多个请求时只向上游请求一次，其余请求等待同一结果
+    - 上游请求在线程池中执行，事件循环可以同时服务大量客户端连接
+    """
+
+    def __init__(self, accounts: Mapping[str, str], workers: int = config.SERVICE_WORKERS):
+        """
+        初始化服务。
+
+        Args:
+            accounts: 学号到密码的映射
+            workers: 执行上游请求的线程数
+        """
+        self._accounts = dict(accounts)
+        self._sessions: Dict[str, AccountSession] = {}
+        self.limiter = AdaptiveLimiter()
+        self.metadata = ActivityMetadataTable()
+        self.cancel_token = CancellationToken()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upstream')
+        # 学号 -> 活动列表；(学号, actid) -> 报名详情；actid -> 活动信息
+        self._activities: Dict[str, CacheEntry] = {}
+        self._enrollments: Dict[Tuple[str, str], CacheEntry] = {}
+        self._activity_info: Dict[str, CacheEntry] = {}
+        # actid -> 报名了该活动的 (学号, 详情URL)，用于按actid查询活动信息
+        self._actid_index: Dict[str, Tuple[str, str]] = {}
+        # 正在进行的上游查询：缓存键 -> 任务
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self.stats = {'requests': 0, 'cache_hits': 0, 'upstream': 0, 'coalesced': 0, 'stale': 0, 'errors': 0}
+
+    def _session(self, student_id: str) -> AccountSession:
+        """
+        获取账号会话，账号未配置时抛出ServiceError（404）。
+        """
+        session = self._sessions.get(student_id)
+        if session is None:
+            if student_id not in self._accounts:
+                raise ServiceError(HTTPStatus.NOT_FOUND, f"账号未配置: {student_id}")
+            session = self._sessions[student_id] = AccountSession(
+                student_id, self._accounts[student_id], self.limiter, self.metadata
+            )
+        return session
+
+    async def _refresh(self, cache: Dict, key, func: Callable[[], Any]) -> CacheEntry:
+        """
+        执行上游查询并写入缓存。同一键同时只有一个查询，后来的请求等待同一结果。
+        查询在独立的任务中进行，发起请求的客户端断开后结果仍会写入缓存。
+
+        Args:
+            cache: 结果缓存
+            key: 缓存键
+            func: 阻塞的上游查询函数，在线程池中执行
+
+        Returns:
+            CacheEntry: 新的缓存条目
+        """
+        flight_key = (id(cache), key)
+        task = self._inflight.get(flight_key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(task)
+
+        async def run() -> CacheEntry:
+            try:
+                value = await asyncio.get_running_loop().run_in_executor(self._executor, func)
+                entry = cache[key] = CacheEntry(value)
+                return entry
+            finally:
+                del self._inflight[flight_key]
+
+        self.stats['upstream'] += 1
+        task = self._inflight[flight_key] = asyncio.ensure_future(run())
+        return await asyncio.shield(task)
+
+    async def _cached(self, cache: Dict, key, ttl: float, func: Callable[[], Any], refresh: bool = False) -> Dict[str, Any]:
+        """
+        按缓存有效期返回查询结果，过期或要求刷新时向上游查询。
+
+        Args:
+            cache: 结果缓存
+            key: 缓存键
+            ttl: 有效期（秒）
+            func: 阻塞的上游查询函数
+            refresh: 是否忽略缓存强制刷新
+
+        Returns:
+            Dict[str, Any]: 包含结果和新鲜度信息的响应内容
+        """
+        entry = cache.get(key)
+        if entry is not None and not refresh and entry.age() < ttl:
+            self.stats['cache_hits'] += 1
+            return self._envelope(entry, ttl, cached=True)
+        try:
+            entry = await self._refresh(cache, key, func)
+        except ServiceError:
+            raise
+        except OperationCancelled:
+            raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE, "服务正在关闭")
+        except Exception as e:
+            if entry is None:
+                raise ServiceError(HTTPStatus.BAD_GATEWAY, f"上游查询失败: {e}")
+            # 上游暂时不可用时返回过期结果
+            self.stats['stale'] += 1
+            return {**self._envelope(entry, ttl, cached=True), 'error': str(e)}
+        return self._envelope(entry, ttl, cached=False)
+
+    @staticmethod
+    def _envelope(entry: CacheEntry, ttl: float, cached: bool) -> Dict[str, Any]:
+        """
+        生成带新鲜度信息的响应内容。
+        """
+        age = entry.age()
+        return {
+            'data': entry.value,
+            'fetched_at': datetime.fromtimestamp(entry.fetched_at).isoformat(timespec='seconds'),
+            'age_seconds': round(age, 1),
+            'ttl_seconds': ttl,
+            'fresh': age < ttl,
+            'cached': cached,
+        }
+
+    def _fetch_activities(self, student_id: str) -> Dict[str, Any]:
+        """
+        获取账号的活动列表（在工作线程中执行）。上次的结果作为增量获取的基础。
+        """
+        session = self._session(student_id)
+        previous = self._activities.get(student_id)
+        known = {record['url']: record for record in previous.value['activities']} if previous else None
+        records = session.call(lambda fetcher: fetcher.fetch_all_activities(cancel_token=self.cancel_token, known=known),
+                               self.cancel_token)
+        activities = [dict(record) for record in records]
+        for record in activities:
+            _, actid = html_parser.parse_activity_ids(record['url'])
+            if actid:
+                self._actid_index.setdefault(actid, (student_id, record['url']))
+        return {'student_id': student_id, 'student_name': session.client.get_student_name(), 'activities': activities}
+
+    async def activities(self, student_id: str, refresh: bool = False) -> Dict[str, Any]:
+        """
+        查询账号的活动列表。
+        """
+        self._session(student_id)
+        return await self._cached(self._activities, student_id, config.SERVICE_ACTIVITIES_TTL,
+                                  lambda: self._fetch_activities(student_id), refresh)
+
+    async def _enrollment_url(self, student_id: str, actid: str) -> str:
+        """
+        从账号的活动列表中查找活动的详情URL，列表未缓存时先获取列表。
+        """
+        listing = await self.activities(student_id)
+        for record in listing['data']['activities']:
+            if html_parser.parse_activity_ids(record['url'])[1] == actid:
+                return record['url']
+        raise ServiceError(HTTPStatus.NOT_FOUND, f"账号 {student_id} 没有报名活动 {actid}")
+
+    async def enrollment(self, student_id: str, actid: str, refresh: bool = False) -> Dict[str, Any]:
+        """
+        查询账号在某个活动中的详情（包含签到签退状态）。
+        """
+        url = await self._enrollment_url(student_id, actid)
+        session = self._session(student_id)
+
+        def fetch():
+            details = session.call(lambda fetcher: fetcher.client.get_parsed_activity_detail(url, self.cancel_token),
+                                   self.cancel_token)
+            return {'student_id': student_id, 'actid': actid, 'url': url, **details}
+
+        return await self._cached(self._enrollments, (student_id, actid), config.SERVICE_ACTIVITIES_TTL, fetch, refresh)
+
+    async def activity_info(self, actid: str, refresh: bool = False) -> Dict[str, Any]:
+        """
+        查询活动信息（时间、积分、标签等，所有报名者相同）。
+        需要通过报名了该活动的账号请求，活动出现在已查询过的活动列表中才能查询。
+        """
+        meta = self.metadata.get(actid)
+        if meta is not None and not refresh and actid not in self._activity_info:
+            # 查询活动列表时已解析过的活动信息直接使用，获取时间沿用解析该详情的时间
+            self._activity_info[actid] = CacheEntry({'actid': actid, **meta}, self.metadata.added_at(actid))
+        if actid not in self._actid_index and actid not in self._activity_info:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"未知活动 {actid}（请先查询报名了该活动的账号）")
+
+        def fetch():
+            student_id, url = self._actid_index[actid]
+            details = self._session(student_id).call(
+                lambda fetcher: fetcher.client.get_parsed_activity_detail(url, self.cancel_token), self.cancel_token
+            )
+            return {'actid': actid, **{key: value for key, value in details.items() if key not in STATUS_FIELDS}}
+
+        return await self._cached(self._activity_info, actid, config.SERVICE_DETAIL_TTL, fetch, refresh)
+
+    def accounts(self) -> List[Dict[str, Any]]:
+        """
+        列出已配置的账号及其缓存状态。
+        """
+        result = []
+        for student_id in self._accounts:
+            entry = self._activities.get(student_id)
+            result.append({
+                'student_id': student_id,
+                'cached': entry is not None,
+                'fetched_at': datetime.fromtimestamp(entry.fetched_at).isoformat(timespec='seconds') if entry else None,
+            })
+        return result
+
+    def service_stats(self) -> Dict[str, Any]:
+        """
+        服务运行指标。
+        """
+        return {
+            **self.stats,
+            'sessions': sum(1 for session in self._sessions.values() if session.client is not None),
+            'inflight': len(self._inflight),
+            'cached_accounts': len(self._activities),
+            'cached_enrollments': len(self._enrollments),
+            'shared_activities': len(self.metadata),
+            'limiter': self.limiter.metrics(),
+        }
+
+    def close(self):
+        """
+        取消进行中的上游查询并关闭所有会话。
+        """
+        self.cancel_token.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for session in self._sessions.values():
+            session.close()
+
+
+# 路由：(正则, 处理函数名)
+_ROUTES = [
+    (re.compile(r'^/health$'), 'health'),
+    (re.compile(r'^/stats$'), 'stats'),
+    (re.compile(r'^/accounts$'), 'list_accounts'),
+    (re.compile(r'^/accounts/(?P<student_id>[^/]+)/activities$'), 'get_activities'),
+    (re.compile(r'^/accounts/(?P<student_id>[^/]+)/activities/(?P<actid>[^/]+)$'), 'get_enrollment'),
+    (re.compile(r'^/activities/(?P<actid>[^/]+)$'), 'get_activity_info'),
+]
+
+
+class ServiceHandler:
+    """
+    基于asyncio的轻量HTTP/1.1服务器，只提供GET接口并返回JSON，支持长连接。
+    每个连接是一个协程，等待上游查询时不占用线程，可以同时服务大量客户端。
+    Host请求头必须是服务的监听地址，拒绝通过其他域名到达的请求（防止DNS重绑定后被网页读取数据）。
+    """
+
+    def __init__(self, service: ActivityService, host: str = config.SERVICE_HOST, port: int = config.SERVICE_PORT):
+        """
+        初始化服务器。
+
+        Args:
+            service: 活动查询服务
+            host: 监听地址
+            port: 监听端口
+        """
+        self.service = service
+        self.port = port
+        self.allowed_hosts = {host.lower().strip('[]')}
+        try:
+            address = ipaddress.ip_address(host.strip('[]'))
+        except ValueError:
+            address = None
+        if address is not None and address.is_loopback:
+            self.allowed_hosts.add('localhost')
+        # 监听所有地址时无法预知客户端使用的地址，只接受IP地址形式的Host
+        self.any_address = host in ('', '0.0.0.0', '::')
+
+    def host_allowed(self, value: str | None) -> bool:
+        """
+        检查Host请求头是否指向本服务。
+
+        Args:
+            value: Host请求头，没有时为None
+
+        Returns:
+            bool: 主机名是监听地址（或监听所有地址时为IP地址）且端口一致时返回True
+        """
+        if not value:
+            return False
+        match = re.fullmatch(r'\[?(?P<name>[^\[\]]+?)\]?(?::(?P<port>\d+))?', value.strip().lower())
+        if match is None:
+            return False
+        name, port = match.group('name'), match.group('port')
+        if port is not None and int(port) != self.port:
+            return False
+        if name in self.allowed_hosts:
+            return True
+        if self.any_address:
+            try:
+                ipaddress.ip_address(name)
+                return True
+            except ValueError:
+                return False
+        return False
+
+    async def health(self, query):
+        return {'status': 'ok'}
+
+    async def stats(self, query):
+        return self.service.service_stats()
+
+    async def list_accounts(self, query):
+        return {'accounts': self.service.accounts()}
+
+    async def get_activities(self, query, student_id):
+        return await self.service.activities(student_id, self._refresh(query))
+
+    async def get_enrollment(self, query, student_id, actid):
+        return await self.service.enrollment(student_id, actid, self._refresh(query))
+
+    async def get_activity_info(self, query, actid):
+        return await self.service.activity_info(actid, self._refresh(query))
+
+    @staticmethod
+    def _refresh(query: Dict[str, List[str]]) -> bool:
+        return query.get('refresh', ['0'])[0].lower() in ('1', 'true', 'yes')
+
+    async def dispatch(self, method: str, target: str) -> Tuple[int, Any]:
+        """
+        按路由调用处理函数。
+
+        Args:
+            method: HTTP方法
+            target: 请求目标（路径和查询字符串）
+
+        Returns:
+            Tuple[int, Any]: (状态码, 响应内容)
+        """
+        if method != 'GET':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "只支持GET请求"}
+        parts = urlsplit(target)
+        path, query = unquote(parts.path).rstrip('/') or '/', parse_qs(parts.query)
+        for pattern, name in _ROUTES:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            return HTTPStatus.NOT_FOUND, {'error': f"未知接口: {path}"}
+
+        self.service.stats['requests'] += 1
+        try:
+            return HTTPStatus.OK, await getattr(self, name)(query, **match.groupdict())
+        except ServiceError as e:
+            self.service.stats['errors'] += 1
+            return e.status, {'error': e.message}
+        except Exception as e:
+            self.service.stats['errors'] += 1
+            print(f"{Fore.RED}✗ 处理请求 {path} 时出错: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        处理一个客户端连接，连接上的请求依次处理。
+
+        Args:
+            reader: 连接读取端
+            writer: 连接写入端
+        """
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), config.SERVICE_KEEPALIVE_TIMEOUT)
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get('content-length'):
+                    await reader.readexactly(int(headers['content-length']))
+
+                if self.host_allowed(headers.get('host')):
+                    status, payload = await self.dispatch(method, target)
+                else:
+                    status, payload = HTTPStatus.MISDIRECTED_REQUEST, {'error': "Host请求头不是服务的监听地址"}
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError:
+            # 请求行格式错误或请求头过长
+            self._write_response(writer, HTTPStatus.BAD_REQUEST, {'error': "无效的请求"}, False)
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool):
+        """
+        写出JSON响应。
+        """
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        status = HTTPStatus(status)
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+
+
+async def serve(service: ActivityService, host: str = config.SERVICE_HOST, port: int = config.SERVICE_PORT):
+    """
+    启动服务并一直运行，直到任务被取消。
+
+    Args:
+        service: 活动查询服务
+        host: 监听地址（默认只监听本机）
+        port: 监听端口
+    """
+    handler = ServiceHandler(service, host, port)
+    server = await asyncio.start_server(handler.handle_connection, host, port, backlog=config.SERVICE_BACKLOG)
+    print(f"{Fore.GREEN}{Style.BRIGHT}✓ 活动查询服务已启动: http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,615 @@
+# batch_jobs.py
+
+import csv
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, BinaryIO, Dict, Iterator, List, Tuple
+
+from colorama import Fore, Style
+
+import src.config as config
+from src.activity_fetcher import ActivityFetcher
+from src.activity_metadata import ActivityMetadataTable
+from src.aggregates import ActivitySummary, summarize_students
+from src.batch_runner import parse_account_row
+from src.concurrency import AdaptiveLimiter
+from src.exporter import ExportWriter
+from src.network_client import ApiClient
+from src.parse_pool import ParsePool
+
+# 任务目录结构:
+#   job.json                 任务元数据（分片数、详情数量限制、原账号文件路径及各分片在其中的字节范围）
+#   shards/shard-00000.csv   分片学号列表（不保存密码，密码在处理时从原账号文件读取）
+#   shards/shard-00000.lock  分片锁（持有者标识，持有期间由心跳线程定期刷新修改时间）
+#   shards/shard-00000.done  分片完成标记
+#   journal/shard-00000.jsonl  分片检查点日志（只由锁持有者追加）
+JOB_FILE = 'job.json'
+
+
+def _shard_name(index: int) -> str:
+    return f"shard-{index:05d}"
+
+
+def _iter_account_lines(f: BinaryIO, start: int = 0, end: int | None = None) -> Iterator[Tuple[int, str, str]]:
+    """
+    从账号文件的指定字节范围逐行读取账号，规则与iter_accounts相同（每行为"学号,密码"）。
+
+    Args:
+        f: 以二进制方式打开的账号文件
+        start: 起始字节偏移
+        end: 结束字节偏移（不含），None表示读到文件末尾
+
+    Yields:
+        Tuple[int, str, str]: (该行的起始字节偏移, 学号, 密码)
+    """
+    f.seek(start)
+    offset = start
+    for raw in f:
+        line_start, offset = offset, offset + len(raw)
+        if end is not None and line_start >= end:
+            break
+        account = parse_account_row(next(csv.reader([raw.decode('utf-8')]), None))
+        if account is not None:
+            yield line_start, account[0], account[1]
+
+
+def create_job(job_dir: str, accounts_path: str,
+               shard_size: int = config.BATCH_SHARD_SIZE,
+               detail_limit: int = config.DETAIL_FETCH_LIMIT) -> int:
+    """
+    创建分片批量任务：把账号列表切分为分片写入任务目录。
+    任务目录可能是多台机器共享的目录，因此分片中只保存学号，
+    任务元数据记录原账号文件的路径和每个分片在其中的字节范围，处理分片时再从原文件读取密码。
+
+    Args:
+        job_dir: 任务目录（可以是多台机器共享的目录）
+        accounts_path: 账号列表CSV文件，每行为"学号,密码"
+        shard_size: 每个分片的账号数
+        detail_limit: 每个账号预加载详情的活动数量限制
+
+    Returns:
+        int: 分片数量
+
+    Raises:
+        FileExistsError: 任务目录中已存在任务时抛出
+    """
+    if os.path.exists(os.path.join(job_dir, JOB_FILE)):
+        raise FileExistsError(f"任务已存在: {job_dir}")
+    os.makedirs(os.path.join(job_dir, 'shards'), exist_ok=True)
+    os.makedirs(os.path.join(job_dir, 'journal'), exist_ok=True)
+
+    accounts_path = os.path.abspath(accounts_path)
+    offsets: List[List[int]] = []
+    writer, f = None, None
+    with open(accounts_path, 'rb') as source:
+        for index, (line_start, username, _) in enumerate(_iter_account_lines(source)):
+            if index % shard_size == 0:
+                if f is not None:
+                    f.close()
+                    offsets[-1][1] = line_start
+                f = open(os.path.join(job_dir, 'shards', _shard_name(len(offsets)) + '.csv'), 'w', newline='', encoding='utf-8')
+                writer = csv.writer(f)
+                offsets.append([line_start, None])
+            writer.writerow((username,))
+    if f is not None:
+        f.close()
+
+    # 元数据最后写入，存在job.json即表示分片已完整生成
+    with open(os.path.join(job_dir, JOB_FILE), 'w', encoding='utf-8') as meta:
+        json.dump({
+            'shards': len(offsets),
+            'detail_limit': detail_limit,
+            'created': time.time(),
+            'accounts': accounts_path,
+            'accounts_size': os.path.getsize(accounts_path),
+            'offsets': offsets,
+        }, meta)
+    return len(offsets)
+
+
+def load_job(job_dir: str) -> Dict[str, Any]:
+    """
+    读取任务元数据。
+
+    Args:
+        job_dir: 任务目录
+
+    Returns:
+        Dict[str, Any]: 任务元数据
+    """
+    with open(os.path.join(job_dir, JOB_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ShardLock:
+    """
+    基于锁文件的分片锁，适用于本机多进程或多台机器共享的目录。
+    以O_EXCL方式创建锁文件保证只有一个进程获得锁，锁文件内容为持有者标识；持有者定期刷新锁文件修改时间，
+    超过BATCH_LOCK_TIMEOUT未刷新的锁视为持有者已崩溃，可以被接管。
+    接管、刷新和释放前都会核对锁文件的持有者，避免误删或误刷新其他进程刚创建的锁。
+    """
+
+    def __init__(self, path: str, timeout: float = config.BATCH_LOCK_TIMEOUT):
+        """
+        初始化分片锁。
+
+        Args:
+            path: 锁文件路径
+            timeout: 锁过期时间（秒）
+        """
+        self.path = path
+        self.timeout = timeout
+        # 随机部分保证标识唯一，即使进程号或线程号被复用
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex}"
+        # 心跳发现锁已被其他进程接管时置位
+        self.lost = threading.Event()
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat = None
+
+    def acquire(self) -> bool:
+        """
+        尝试获取锁，不阻塞。
+
+        Returns:
+            bool: 获取成功返回True
+        """
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not self._break_stale():
+                return False
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.owner)
+        self._heartbeat = threading.Thread(target=self._beat, name=f"heartbeat-{os.path.basename(self.path)}", daemon=True)
+        self._heartbeat.start()
+        return True
+
+    def _beat(self):
+        """
+        持有锁期间在后台定期刷新锁文件，处理单个账号耗时再长也不会让锁看起来已过期。
+        """
+        while not self._heartbeat_stop.wait(self.timeout / 4):
+            if not self.refresh():
+                self.lost.set()
+                print(f"{Fore.RED}{Style.BRIGHT}分片锁已被其他进程接管: {os.path.basename(self.path)}")
+                return
+
+    @staticmethod
+    def _read_owner(path: str) -> str | None:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _take_aside(self) -> str | None:
+        """
+        把锁文件原子地改名到当前进程专用的路径，之后其他进程再无法改动它。
+
+        Returns:
+            str: 改名后的路径，锁文件不存在时返回None
+        """
+        aside_path = f"{self.path}.{uuid.uuid4().hex}"
+        try:
+            os.rename(self.path, aside_path)
+        except OSError:
+            return None
+        return aside_path
+
+    def _put_back(self, aside_path: str):
+        """
+        把改名移开的锁文件放回原处；原处已有新锁时丢弃移开的文件（其持有者会在下次核对时发现锁已丢失）。
+        """
+        try:
+            os.link(aside_path, self.path)
+        except OSError:
+            pass
+        try:
+            os.remove(aside_path)
+        except OSError:
+            pass
+
+    def _break_stale(self) -> bool:
+        """
+        接管过期的锁：记下过期锁的持有者和修改时间后把锁文件改名，
+        再核对改名得到的确实是这把过期锁（而不是其他进程刚刚接管后重新创建的锁），核对失败时放回原处。
+
+        Returns:
+            bool: 过期锁已被当前进程移除时返回True
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if time.time() - mtime < self.timeout:
+            return False
+        stale_owner = self._read_owner(self.path)
+        aside_path = self._take_aside()
+        if aside_path is None:
+            return False
+        try:
+            still_stale = os.path.getmtime(aside_path) == mtime and self._read_owner(aside_path) == stale_owner
+        except OSError:
+            still_stale = False
+        if not still_stale:
+            self._put_back(aside_path)
+            return False
+        os.remove(aside_path)
+        print(f"{Fore.YELLOW}{Style.BRIGHT}接管过期的分片锁: {os.path.basename(self.path)}")
+        return True
+
+    def is_held(self) -> bool:
+        """
+        检查锁文件是否仍属于当前持有者。
+
+        Returns:
+            bool: 仍持有锁返回True
+        """
+        return self._read_owner(self.path) == self.owner
+
+    def refresh(self) -> bool:
+        """
+        刷新锁文件修改时间，表明持有者仍在运行。
+
+        Returns:
+            bool: 仍持有锁返回True；锁已被其他进程接管时返回False，不会刷新他人的锁
+        """
+        if not self.is_held():
+            return False
+        try:
+            os.utime(self.path)
+        except OSError:
+            pass
+        return True
+
+    def release(self):
+        """
+        释放锁。只删除当前持有者自己的锁文件。
+        """
+        self._heartbeat_stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        if not self.is_held():
+            return
+        aside_path = self._take_aside()
+        if aside_path is None:
+            return
+        if self._read_owner(aside_path) == self.owner:
+            os.remove(aside_path)
+        else:
+            self._put_back(aside_path)
+
+
+class ShardJournal:
+    """
+    分片检查点日志（JSON Lines，只追加）。
+    每成功获取一条活动详情记录一行activity，每个账号结束记录一行account；
+    续跑时根据日志跳过已完成的账号，并复用失败账号已获取的活动详情。
+    """
+
+    def __init__(self, path: str):
+        """
+        初始化检查点日志。
+
+        Args:
+            path: 日志文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Dict[str, Any]]]]:
+        """
+        读取日志。
+
+        Returns:
+            Tuple: (学号到最后一条账号记录的映射, 学号到{活动URL: 活动记录}的映射)
+        """
+        accounts: Dict[str, Dict[str, Any]] = {}
+        activities: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        if not os.path.exists(self.path):
+            return accounts, activities
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃时写了一半的最后一行
+                if entry.get('type') == 'activity':
+                    record = entry['record']
+                    known = activities.setdefault(entry['student_id'], {})
+                    # 未加载详情的记录不覆盖之前已加载的同一活动
+                    if record.get('is_loaded') or record['url'] not in known:
+                        known[record['url']] = record
+                elif entry.get('type') == 'account':
+                    accounts[entry['student_id']] = entry
+        return accounts, activities
+
+    def _append(self, entry: Dict[str, Any], sync: bool = False):
+        """
+        追加一行日志。
+
+        Args:
+            entry: 日志内容
+            sync: 是否同步到磁盘
+        """
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def record_activity(self, student_id: str, record: Dict[str, Any]):
+        """
+        记录一条已获取详情的活动。
+
+        Args:
+            student_id: 学号
+            record: 活动记录
+        """
+        self._append({'type': 'activity', 'student_id': student_id, 'record': dict(record)})
+
+    def record_account(self, student_id: str, status: str, student_name: str | None = None,
+                       urls: List[str] | None = None, error: str | None = None):
+        """
+        记录账号的处理结果，并同步到磁盘。活动记录本身已逐条记录为activity行，这里只保存顺序。
+
+        Args:
+            student_id: 学号
+            status: 'done' 或 'failed'
+            student_name: 学生姓名
+            urls: 账号全部活动的URL，按结果顺序排列（status为'done'时）
+            error: 失败原因（status为'failed'时）
+        """
+        entry = {'type': 'account', 'student_id': student_id, 'status': status, 'time': time.time()}
+        if status == 'done':
+            entry.update(student_name=student_name, urls=list(urls or ()))
+        else:
+            entry['error'] = error
+        self._append(entry, sync=True)
+
+    def close(self):
+        """
+        关闭日志文件。
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class BatchJobWorker:
+    """
+    分片批量任务的工作进程。
+    依次尝试认领尚未完成的分片，对分片内未完成的账号复用ApiClient/ActivityFetcher获取活动，
+    每个活动和账号的结果都写入检查点日志。多个工作进程（可以在不同机器上）共享同一任务目录即可横向扩展。
+    """
+
+    def __init__(self, job_dir: str,
+                 workers: int = config.BATCH_WORKERS,
+                 parse_processes: int = config.PARSE_PROCESSES,
+                 transport=None,
+                 accounts_path: str | None = None):
+        """
+        初始化工作进程。
+
+        Args:
+            job_dir: 任务目录
+            workers: 分片内同时处理的账号数
+            parse_processes: 解析进程数，0表示不使用进程池
+            transport: 可选的传输适配器（录制/回放）
+            accounts_path: 可选的账号文件路径（其他机器上的路径不同时指定），默认使用创建任务时的路径
+
+        Raises:
+            ValueError: 账号文件与创建任务时不一致时抛出
+        """
+        self.job_dir = job_dir
+        self.job = load_job(job_dir)
+        self.accounts_path = accounts_path or self.job['accounts']
+        if os.path.getsize(self.accounts_path) != self.job['accounts_size']:
+            raise ValueError(f"账号文件与创建任务时不一致: {self.accounts_path}")
+        self.workers = workers
+        self.parse_processes = parse_processes
+        self.transport = transport
+        self.parse_pool = None
+        # 分片内所有账号的详情请求共享一个自适应并发限制器
+        self.limiter = AdaptiveLimiter()
+        # 同一活动的信息在所有账号之间只解析和保存一份
+        self.metadata = ActivityMetadataTable()
+
+    def _path(self, folder: str, index: int, suffix: str) -> str:
+        return os.path.join(self.job_dir, folder, _shard_name(index) + suffix)
+
+    def run(self) -> Tuple[int, int]:
+        """
+        处理所有能认领到的分片，每个分片在本次运行中最多处理一次。
+
+        Returns:
+            Tuple[int, int]: (本次完成的分片数, 本次失败的账号数)
+        """
+        completed_shards = 0
+        failed_accounts = 0
+        pool_context = ParsePool(self.parse_processes, config.PARSE_MAX_PENDING) if self.parse_processes > 0 else nullcontext()
+        with pool_context as parse_pool:
+            self.parse_pool = parse_pool
+            for index in range(self.job['shards']):
+                if os.path.exists(self._path('shards', index, '.done')):
+                    continue
+                lock = ShardLock(self._path('shards', index, '.lock'))
+                if not lock.acquire():
+                    continue
+                try:
+                    # 获得锁后再检查一次，避免处理刚被其他进程完成的分片
+                    if os.path.exists(self._path('shards', index, '.done')):
+                        continue
+                    failures = self._run_shard(index, lock)
+                    failed_accounts += failures
+                    # 锁在处理期间被接管时由新的持有者负责完成分片
+                    if failures == 0 and not lock.lost.is_set():
+                        open(self._path('shards', index, '.done'), 'w').close()
+                        completed_shards += 1
+                finally:
+                    lock.release()
+            self.parse_pool = None
+        return completed_shards, failed_accounts
+
+    def _run_shard(self, index: int, lock: ShardLock) -> int:
+        """
+        处理单个分片中尚未完成的账号。
+
+        Args:
+            index: 分片序号
+            lock: 已持有的分片锁
+
+        Returns:
+            int: 本次失败的账号数
+        """
+        journal = ShardJournal(self._path('journal', index, '.jsonl'))
+        accounts_state, activities = journal.load()
+        pending = [(username, password) for username, password in self._shard_accounts(index)
+                   if accounts_state.get(username, {}).get('status') != 'done']
+        if not pending:
+            return 0
+
+        print(f"{Fore.CYAN}{Style.BRIGHT}分片 {_shard_name(index)}: {len(pending)} 个账号待处理")
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = executor.map(
+                    lambda account: self._run_account(journal, lock, account[0], account[1], activities.get(account[0], {})),
+                    pending
+                )
+                return sum(1 for ok in results if not ok)
+        finally:
+            journal.close()
+
+    def _shard_accounts(self, index: int) -> List[Tuple[str, str]]:
+        """
+        从原账号文件读取分片的账号，并核对学号与分片中记录的一致。
+
+        Args:
+            index: 分片序号
+
+        Returns:
+            List[Tuple[str, str]]: (学号, 密码) 列表
+
+        Raises:
+            ValueError: 账号文件内容与创建任务时不一致时抛出
+        """
+        with open(self._path('shards', index, '.csv'), newline='', encoding='utf-8') as f:
+            usernames = [row[0] for row in csv.reader(f) if row]
+        start, end = self.job['offsets'][index]
+        with open(self.accounts_path, 'rb') as f:
+            accounts = [(username, password) for _, username, password in _iter_account_lines(f, start, end)]
+        if [username for username, _ in accounts] != usernames:
+            raise ValueError(f"账号文件与分片 {_shard_name(index)} 不一致: {self.accounts_path}")
+        return accounts
+
+    def _run_account(self, journal: ShardJournal, lock: ShardLock, username: str, password: str,
+                     known: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        获取单个账号的活动并写入检查点。已记录在日志中的活动详情直接复用。
+
+        Returns:
+            bool: 成功返回True
+        """
+        if lock.lost.is_set():
+            return False
+        try:
+            client = ApiClient(parse_pool=self.parse_pool, transport=self.transport)
+            success, message = client.login(username, password)
+            if not success:
+                raise Exception(message)
+            fetcher = ActivityFetcher(client, self.job['detail_limit'], limiter=self.limiter, metadata=self.metadata)
+            records = fetcher.fetch_all_activities(
+                known=known,
+                reuse_loaded=True,
+                on_record=lambda record: journal.record_activity(username, record)
+            )
+            # 未加载详情的活动没有经过on_record，补记到日志中，账号记录只保存活动顺序
+            for record in records:
+                if not record['is_loaded']:
+                    journal.record_activity(username, record)
+            journal.record_account(username, 'done', client.get_student_name(), [record['url'] for record in records])
+            print(f"{Fore.GREEN}{Style.BRIGHT}✓ {username}: {len(records)} 个活动")
+            return True
+        except Exception as e:
+            journal.record_account(username, 'failed', error=str(e))
+            print(f"{Fore.RED}{Style.BRIGHT}✗ {username} 获取失败: {e}")
+            return False
+
+
+def iter_job_results(job_dir: str) -> Iterator[Tuple[str, str | None, Dict[str, Any]]]:
+    """
+    按分片逐个读取任务中已完成账号的最终活动记录。
+
+    Args:
+        job_dir: 任务目录
+
+    Yields:
+        Tuple[str, str | None, Dict[str, Any]]: (学号, 学生姓名, 活动记录)
+    """
+    job = load_job(job_dir)
+    for index in range(job['shards']):
+        accounts_state, activities = ShardJournal(os.path.join(job_dir, 'journal', _shard_name(index) + '.jsonl')).load()
+        for student_id, entry in accounts_state.items():
+            if entry.get('status') != 'done':
+                continue
+            records = activities.get(student_id, {})
+            for url in entry['urls']:
+                yield student_id, entry.get('student_name'), records[url]
+
+
+def job_status(job_dir: str) -> Dict[str, int]:
+    """
+    统计任务进度。
+
+    Args:
+        job_dir: 任务目录
+
+    Returns:
+        Dict[str, int]: 分片总数、已完成分片、被锁定分片、已完成账号、失败账号的数量
+    """
+    job = load_job(job_dir)
+    status = {'shards': job['shards'], 'done_shards': 0, 'locked_shards': 0, 'done_accounts': 0, 'failed_accounts': 0}
+    for index in range(job['shards']):
+        base = os.path.join(job_dir, 'shards', _shard_name(index))
+        status['done_shards'] += os.path.exists(base + '.done')
+        status['locked_shards'] += os.path.exists(base + '.lock')
+        accounts_state, _ = ShardJournal(os.path.join(job_dir, 'journal', _shard_name(index) + '.jsonl')).load()
+        for entry in accounts_state.values():
+            status['done_accounts' if entry['status'] == 'done' else 'failed_accounts'] += 1
+    return status
+
+
+def collect_job(job_dir: str, output_path: str) -> Dict[str, ActivitySummary]:
+    """
+    把任务中已完成账号的结果流式导出，并计算每个学生的汇总。
+
+    Args:
+        job_dir: 任务目录
+        output_path: 输出文件路径，按扩展名选择CSV、JSON Lines或Parquet格式
+
+    Returns:
+        Dict[str, ActivitySummary]: 学号到汇总的映射
+    """
+    def stream(out):
+        for student_id, student_name, record in iter_job_results(job_dir):
+            out.write_record(record, student_id, student_name)
+            yield student_id, record
+
+    with ExportWriter(output_path) as out:
+        return summarize_students(stream(out))
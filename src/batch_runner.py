@@ -0,0 +1,443 @@
+# batch_runner.py
+
+import csv
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+from colorama import Fore, Style
+
+import src.config as config
+import src.html_parser as html_parser
+from src.activity_metadata import ActivityMetadataTable
+from src.aggregates import ActivityAggregator, ActivitySummary
+from src.cancellation import CancellationToken, OperationCancelled
+from src.concurrency import AdaptiveLimiter
+from src.exporter import ExportWriter
+from src.network_client import ApiClient
+from src.parse_pool import ParsePool
+from src.prefetch_policy import PrefetchCandidate, make_policy
+
+
+def iter_accounts(path: str) -> Iterator[Tuple[str, str]]:
+    """
+    逐行读取账号列表CSV文件，每行为"学号,密码"，空行和以#开头的行会被忽略。
+
+    Args:
+        path: CSV文件路径
+
+    Yields:
+        Tuple[str, str]: (学号, 密码)
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            account = parse_account_row(row)
+            if account is not None:
+                yield account
+
+
+def parse_account_row(row: List[str] | None) -> Tuple[str, str] | None:
+    """
+    解析账号列表CSV中的一行。
+
+    Args:
+        row: CSV行
+
+    Returns:
+        Tuple[str, str]: (学号, 密码)，空行和以#开头的行返回None
+    """
+    if not row or not row[0].strip() or row[0].startswith('#'):
+        return None
+    return row[0].strip(), row[1].strip() if len(row) > 1 else ''
+
+
+# 通知阶段工作线程退出的哨兵
+_DONE = object()
+
+
+class _Stage:
+    """
+    流水线的一个阶段：若干工作线程从输入队列取出任务并交给处理函数。
+    处理函数把结果放入下游的有界队列，下游满时自然阻塞，形成背压。
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], None], workers: int, inbox: queue.Queue,
+                 on_error: Callable[[Any, str], None] | None = None):
+        """
+        初始化并启动阶段工作线程。
+
+        Args:
+            name: 阶段名称（用于日志）
+            handler: 处理单个任务的函数
+            workers: 工作线程数
+            inbox: 输入队列
+            on_error: 可选的错误处理函数，处理函数抛出异常时以(任务, 错误信息)调用，
+                      保证任务不会丢失（记录账号失败或以基本信息继续进入下游）
+        """
+        self.name = name
+        self.handler = handler
+        self.inbox = inbox
+        self.on_error = on_error
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(max(1, workers))]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        """
+        工作线程函数：处理任务直到收到退出哨兵。
+        """
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                return
+            try:
+                self.handler(item)
+            except Exception as e:
+                print(f"{Fore.RED}✗ 批量流水线[{self.name}]处理失败: {e}")
+                if self.on_error is not None:
+                    try:
+                        self.on_error(item, f"{self.name}阶段处理失败: {e}")
+                    except Exception as error:
+                        print(f"{Fore.RED}✗ 批量流水线[{self.name}]错误处理失败: {error}")
+
+    def finish(self):
+        """
+        等待输入队列中的任务全部处理完毕后退出所有工作线程。
+        """
+        for _ in self.threads:
+            self.inbox.put(_DONE)
+        for thread in self.threads:
+            thread.join()
+
+
+class _AccountJob:
+    """
+    单个账号在流水线中的状态。
+    活动列表边下载边进入下游，queued是列表阶段已送入下游的活动数，
+    total在列表结束后由写出阶段根据列表阶段的结束标记设置；
+    written只由写出阶段（单线程）递增，两者相等时账号处理完毕。
+    列表下载完成之前到达写出阶段的记录暂存在pending中，列表获取失败时不会写出。
+    """
+    __slots__ = ('username', 'password', 'client', 'student_name', 'queued', 'listed', 'pending',
+                 'total', 'written', 'aggregator')
+
+    def __init__(self, username: str, password: str):
+        self.username = username
+        self.password = password
+        self.client = None
+        self.student_name = None
+        self.queued = 0
+        self.listed = False
+        self.pending = []
+        self.total = None
+        self.written = 0
+        self.aggregator = ActivityAggregator()
+
+
+# 列表阶段发给写出阶段的标记：活动列表已完整下载
+_LIST_READY = object()
+
+
+class _ListDone:
+    """
+    列表阶段发给写出阶段的结束标记，携带该账号的活动总数。
+    """
+    __slots__ = ('total',)
+
+    def __init__(self, total: int):
+        self.total = total
+
+
+class BatchPipeline:
+    """
+    内存占用有界的多账号批量流水线：
+    登录 → 获取活动列表 → 请求详情 → 解析 → 写出。
+    各阶段之间是有界队列，写出变慢时上游依次阻塞，不会无限堆积响应内容；
+    响应字节在解析后立即释放，记录逐条写入输出文件，不在内存中累积，
+    每个账号只保留增量汇总。峰值内存与账号总数无关。
+    """
+
+    def __init__(self, output_path: str,
+                 workers: int = config.BATCH_WORKERS,
+                 parse_processes: int = config.PARSE_PROCESSES,
+                 detail_limit: int = config.DETAIL_FETCH_LIMIT,
+                 queue_size: int = config.BATCH_QUEUE_SIZE,
+                 transport=None):
+        """
+        初始化批量流水线。
+
+        Args:
+            output_path: 输出文件路径，按扩展名导出为CSV、JSON Lines或Parquet
+            workers: 登录、列表阶段各自的网络线程数（详情阶段的并发数由自适应限制器控制）
+            parse_processes: 解析进程数，0表示在解析线程中直接解析
+            detail_limit: 每个账号预加载详情的活动数量限制
+            queue_size: 阶段之间的队列容量
+            transport: 可选的传输适配器，挂载到每个账号的会话上（录制/回放）
+        """
+        self.output_path = output_path
+        self.workers = workers
+        self.parse_processes = parse_processes
+        self.detail_limit = detail_limit
+        self.queue_size = queue_size
+        self.transport = transport
+        self.cancel_token = CancellationToken()
+        self.parse_pool = None
+        # 所有账号的详情请求共享一个自适应并发限制器
+        self.limiter = AdaptiveLimiter()
+        # 同一活动的信息在所有账号之间只解析和保存一份
+        self.metadata = ActivityMetadataTable()
+        self.prefetch_policy = make_policy()
+        self.summaries: Dict[str, ActivitySummary] = {}
+        self.failures: Dict[str, str] = {}
+        self._failures_lock = threading.Lock()
+        self._out = None
+
+    def cancel(self):
+        """
+        取消批量运行，进行中的请求在下一个检查点中止。
+        """
+        self.cancel_token.cancel()
+
+    def run(self, accounts: Iterable[Tuple[str, str]]) -> Tuple[Dict[str, ActivitySummary], Dict[str, str]]:
+        """
+        运行流水线直到所有账号处理完毕。账号按需从可迭代对象中读取。
+
+        Args:
+            accounts: (学号, 密码) 可迭代对象
+
+        Returns:
+            Tuple[Dict[str, ActivitySummary], Dict[str, str]]: (学号到汇总的映射, 学号到失败原因的映射)
+        """
+        login_q, list_q, detail_q, parse_q, sink_q = (queue.Queue(self.queue_size) for _ in range(5))
+        # 使用进程池时详情阶段直接提交解析任务，解析阶段的线程只取回结果，与进程数相同即可
+        parse_threads = max(1, self.parse_processes)
+
+        pool_context = ParsePool(self.parse_processes, config.PARSE_MAX_PENDING) if self.parse_processes > 0 else nullcontext()
+        with pool_context as parse_pool, ExportWriter(self.output_path) as out:
+            self.parse_pool, self._out = parse_pool, out
+            self._list_q, self._detail_q, self._parse_q, self._sink_q = list_q, detail_q, parse_q, sink_q
+
+            # 按数据流向依次关闭：上游全部结束后，下游才会收到退出哨兵
+            stages = [
+                _Stage('登录', self._login, self.workers, login_q, self._login_failed),
+                _Stage('列表', self._list, self.workers, list_q, self._list_failed),
+                _Stage('详情', self._detail, self.limiter.max_limit, detail_q, self._activity_failed),
+                _Stage('解析', self._parse, parse_threads, parse_q, self._activity_failed),
+                _Stage('写出', self._sink, 1, sink_q),
+            ]
+            for username, password in accounts:
+                if self.cancel_token.cancelled:
+                    break
+                login_q.put(_AccountJob(username, password))
+            for stage in stages:
+                stage.finish()
+
+            self.parse_pool, self._out = None, None
+        metrics = self.limiter.metrics()
+        print(f"{Fore.CYAN}{Style.BRIGHT}详情并发上限 {metrics['limit']}，平滑延迟 {metrics['latency_ms']} ms，"
+              f"过载 {metrics['overloads']} 次，降低上限 {metrics['decreases']} 次")
+        print(f"{Fore.CYAN}{Style.BRIGHT}共享活动信息 {len(self.metadata)} 条，复用 {self.metadata.hits} 次")
+        return self.summaries, self.failures
+
+    def _fail(self, job: _AccountJob, message: str):
+        """
+        记录账号失败。
+
+        Args:
+            job: 账号状态
+            message: 失败原因
+        """
+        with self._failures_lock:
+            self.failures[job.username] = message
+        print(f"{Fore.RED}{Style.BRIGHT}✗ {job.username} 获取失败: {message}")
+
+    def _login_failed(self, job: _AccountJob, message: str):
+        """
+        登录阶段出错：记录账号失败并关闭会话。
+        """
+        if job.client is not None:
+            job.client.session.close()
+            job.client = None
+        self._fail(job, message)
+
+    def _list_failed(self, job: _AccountJob, message: str):
+        """
+        列表阶段出错：记录账号失败，已进入下游的活动仍会到达写出阶段，
+        写出阶段收到结束标记后关闭会话。
+        """
+        self._fail(job, message)
+        self._sink_q.put((job, _ListDone(job.queued)))
+
+    def _activity_failed(self, item: Tuple, message: str):
+        """
+        详情或解析阶段出错：以基本信息继续写出该活动，保证账号的活动数能够达到总数。
+        """
+        job, activity = item[0], item[1]
+        self._sink_q.put((job, self._basic_record(activity)))
+
+    def _login(self, job: _AccountJob):
+        """
+        登录阶段：为账号创建独立会话并登录。
+        """
+        job.client = ApiClient(parse_pool=self.parse_pool, transport=self.transport)
+        try:
+            success, message = job.client.login(job.username, job.password, cancel_token=self.cancel_token)
+        except OperationCancelled as e:
+            success, message = False, str(e)
+        job.password = None  # 登录后不再保留密码
+        if not success:
+            job.client.session.close()
+            self._fail(job, message)
+            return
+        self._list_q.put(job)
+
+    def _list(self, job: _AccountJob):
+        """
+        列表阶段：获取活动列表，由预加载策略选出detail_limit个活动进入详情阶段，其余直接写出基本信息。
+        流式获取列表时，能确定会被选中的活动在页面下载过程中就进入详情阶段。
+        """
+        selection = self.prefetch_policy.stream(self.detail_limit)
+        total = 0
+        try:
+            if config.STREAM_ACTIVITY_LIST:
+                activities = job.client.iter_activities(cancel_token=self.cancel_token)
+            else:
+                activities = job.client.get_activities(cancel_token=self.cancel_token)
+            for activity in activities:
+                job.student_name = job.student_name or job.client.get_student_name()
+                if selection.offer(PrefetchCandidate(total, activity, None)):
+                    self._detail_q.put((job, activity))
+                    job.queued += 1
+                total += 1
+
+            job.student_name = job.client.get_student_name()
+            self._sink_q.put((job, _LIST_READY))
+            for candidate in selection.finish():
+                self._detail_q.put((job, candidate.activity))
+                job.queued += 1
+            for candidate in selection.unselected():
+                self._sink_q.put((job, self._basic_record(candidate.activity)))
+                job.queued += 1
+        except Exception as e:
+            self._list_failed(job, str(e))
+            return
+        self._sink_q.put((job, _ListDone(total)))
+
+    def _detail(self, item: Tuple[_AccountJob, Dict[str, Any]]):
+        """
+        详情阶段：只负责请求详情API，原始响应交给解析阶段。
+        使用解析进程池时把响应字节提交到进程池后立即处理下一个请求，解析阶段只取回结果，
+        网络线程不等待解析；在途的解析任务达到上限时提交阻塞，形成背压。
+        同时在途的请求数由自适应限制器控制，超出当前上限的线程等待名额。
+        """
+        job, activity = item
+        parsed = None
+        try:
+            # 限速排队在并发名额之外，不计入自适应限制器测量的延迟
+            job.client.wait_for_detail_budget(self.cancel_token)
+            with self.limiter.slot(self.cancel_token):
+                content, encoding = job.client.get_activity_detail_content(
+                    activity['url'], cancel_token=self.cancel_token, budget=False)
+            # 每个详情只查找一次共享的活动信息，随任务传给解析阶段
+            _, actid = html_parser.parse_activity_ids(activity['url'])
+            meta = self.metadata.get(actid)
+            if self.parse_pool is not None:
+                parsed = job.client.submit_detail_content(content, encoding, activity_info=meta is None)
+                content = None
+        except Exception as e:
+            print(f"{Fore.RED}✗ Error fetching detail for {activity['name']}: {e}")
+            self._sink_q.put((job, self._basic_record(activity)))
+            return
+        self._parse_q.put((job, activity, actid, meta, content, encoding, parsed))
+
+    def _parse(self, item: Tuple[_AccountJob, Dict[str, Any], str, Mapping | None, bytes | None, str | None, Future | None]):
+        """
+        解析阶段：取回进程池的解析结果，或在没有进程池时直接解析，解析后响应字节随任务一起释放。
+        活动信息已在共享表中时只解析签到签退状态，记录引用共享的活动信息。
+        """
+        job, activity, actid, meta, content, encoding, parsed = item
+        try:
+            if parsed is not None:
+                details = parsed.result()
+            else:
+                details = job.client.parse_detail_content(content, encoding, activity_info=meta is None)
+        except Exception as e:
+            print(f"{Fore.RED}✗ Error parsing detail for {activity['name']}: {e}")
+            self._sink_q.put((job, self._basic_record(activity)))
+            return
+        if meta is None:
+            meta = self.metadata.add(actid, details)
+        self._sink_q.put((job, ActivityMetadataTable.enrollment(activity, details, meta)))
+
+    def _sink(self, item: Tuple[_AccountJob, Dict[str, Any] | _ListDone]):
+        """
+        写出阶段（单线程）：逐条写入记录并更新账号汇总，账号的全部活动写出后生成汇总。
+        """
+        job, record = item
+        if record is _LIST_READY:
+            job.listed = True
+            pending, job.pending = job.pending, []
+            for buffered in pending:
+                self._write(job, buffered)
+        elif isinstance(record, _ListDone):
+            job.total = record.total
+            # 列表获取失败时，之前暂存的记录不再写出
+            job.written += len(job.pending)
+            job.pending = []
+        elif not job.listed and job.total is None:
+            # 列表下载完成前已获取详情的活动（最多detail_limit条）先暂存
+            job.pending.append(record)
+        else:
+            self._write(job, record)
+        if job.total is None or job.written < job.total:
+            return
+        job.client.session.close()
+        job.client = None
+        if job.username in self.failures:
+            return
+        self.summaries[job.username] = job.aggregator.summary()
+        print(f"{Fore.GREEN}{Style.BRIGHT}✓ {job.username} {job.student_name or ''}: {self.summaries[job.username].activities} 个活动")
+
+    def _write(self, job: _AccountJob, record: Dict[str, Any]):
+        """
+        写出一条记录并更新账号汇总。已失败的账号只计数不写出，输出中不会出现失败账号的部分记录。
+        """
+        job.written += 1
+        if job.username in self.failures:
+            return
+        try:
+            self._out.write_record(record, job.username, job.student_name)
+            job.aggregator.add(record)
+        except Exception as e:
+            self._fail(job, f"写出失败: {e}")
+
+    @staticmethod
+    def _basic_record(activity: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        生成只包含基本信息的活动记录（未加载详情或加载失败时使用）。
+        """
+        return {**activity, **html_parser.parse_basic_activity_info(activity), 'is_loaded': False}
+
+
+def run_batch(accounts: Iterable[Tuple[str, str]], output_path: str,
+              workers: int = config.BATCH_WORKERS,
+              parse_processes: int = config.PARSE_PROCESSES,
+              detail_limit: int = config.DETAIL_FETCH_LIMIT,
+              transport=None) -> Tuple[Dict[str, ActivitySummary], Dict[str, str]]:
+    """
+    批量获取多个账号的活动，结果按完成顺序分块流式导出（每行一条活动记录）。
+
+    Args:
+        accounts: (学号, 密码) 可迭代对象
+        output_path: 输出文件路径，按扩展名选择CSV、JSON Lines或Parquet格式
+        workers: 每个网络阶段的线程数
+        parse_processes: 解析进程数，0表示不使用进程池
+        detail_limit: 每个账号预加载详情的活动数量限制
+        transport: 可选的传输适配器（录制/回放）
+
+    Returns:
+        Tuple[Dict[str, ActivitySummary], Dict[str, str]]: (学号到汇总的映射, 学号到失败原因的映射)
+    """
+    return BatchPipeline(output_path, workers, parse_processes, detail_limit, transport=transport).run(accounts)
@@ -0,0 +1,115 @@
+# cancellation.py
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, List
+
+
+class OperationCancelled(Exception):
+    """
+    操作被取消时抛出的异常。
+    """
+    pass
+
+
+class CancellationToken:
+    """
+    协作式取消令牌。
+    工作线程在检查点调用raise_if_cancelled()，UI线程调用cancel()请求取消。
+    进行中的请求可以通过on_cancel()注册中止回调（例如关闭响应连接）。
+    """
+
+    def __init__(self):
+        """
+        初始化取消令牌。
+        """
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        是否已请求取消。
+
+        Returns:
+            bool: 已取消返回True
+        """
+        return self._event.is_set()
+
+    def cancel(self):
+        """
+        请求取消，并执行所有已注册的中止回调。
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+            self._callbacks.clear()
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                # 中止回调失败不影响取消本身
+                pass
+
+    def raise_if_cancelled(self):
+        """
+        检查点：如果已请求取消则抛出OperationCancelled。
+
+        Raises:
+            OperationCancelled: 已请求取消时抛出
+        """
+        if self._event.is_set():
+            raise OperationCancelled("操作已取消。")
+
+    def wait(self, timeout: float) -> bool:
+        """
+        等待指定时长，期间被取消则提前返回。
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            bool: 等待期间是否被取消
+        """
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]):
+        """
+        在上下文期间注册中止回调，用于中止进行中的请求。
+        如果进入时已取消，回调会立即执行。
+
+        Args:
+            callback: 取消时执行的回调函数
+        """
+        with self._lock:
+            already_cancelled = self._event.is_set()
+            if not already_cancelled:
+                self._callbacks.append(callback)
+
+        if already_cancelled:
+            callback()
+        try:
+            yield self
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+
+def check_cancelled(cancel_token: CancellationToken | None):
+    """
+    对可选令牌执行检查点检查。
+
+    Args:
+        cancel_token: 取消令牌，为None时不做任何检查
+
+    Raises:
+        OperationCancelled: 已请求取消时抛出
+    """
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
@@ -0,0 +1,155 @@
+# concurrency.py
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+import requests
+
+import src.config as config
+from src.cancellation import CancellationToken, check_cancelled
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """
+    判断异常是否表示服务器过载：超时、连接失败或5xx响应。
+    客户端会把requests异常包装为普通Exception，这里沿异常链查找原始异常。
+
+    Args:
+        error: 请求抛出的异常
+
+    Returns:
+        bool: 表示服务器过载时返回True
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+            return True
+        if isinstance(error, requests.HTTPError):
+            response = error.response
+            return response is not None and response.status_code >= 500
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD（加性增、乘性减）自适应并发限制器，用于控制同时进行的详情请求数。
+    请求成功且延迟正常时，每经过约一个并发上限数量的成功请求，上限加1；
+    遇到超时、5xx或延迟突增（超过平滑延迟的AIMD_LATENCY_SPIKE倍，且至少高出AIMD_SPIKE_MIN_MS毫秒）
+    时上限按比例减小，同一批在途请求的连续失败只减小一次。服务器快时提高吞吐，拥堵时主动退让。
+    """
+
+    def __init__(self, initial: int = config.DETAIL_CONCURRENCY_INITIAL,
+                 min_limit: int = config.DETAIL_CONCURRENCY_MIN,
+                 max_limit: int = config.DETAIL_CONCURRENCY_MAX):
+        """
+        初始化限制器。
+
+        Args:
+            initial: 初始并发上限
+            min_limit: 并发上限的最小值
+            max_limit: 并发上限的最大值
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._latency = None  # 正常请求延迟的指数加权平均（秒）
+        self._last_decrease = 0.0
+        self._successes = 0
+        self._overloads = 0
+        self._decreases = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """
+        当前并发上限。
+
+        Returns:
+            int: 并发上限
+        """
+        return int(self._limit)
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        获取限制器的运行指标。
+
+        Returns:
+            Dict[str, float]: 并发上限、在途请求数、平滑延迟（毫秒）、成功数、过载数、减小次数
+        """
+        with self._condition:
+            return {
+                'limit': int(self._limit),
+                'in_flight': self._in_flight,
+                'latency_ms': round(self._latency * 1000, 1) if self._latency is not None else None,
+                'successes': self._successes,
+                'overloads': self._overloads,
+                'decreases': self._decreases,
+            }
+
+    def acquire(self, cancel_token: CancellationToken | None = None):
+        """
+        等待一个并发名额。
+
+        Args:
+            cancel_token: 可选的取消令牌，等待期间取消会抛出OperationCancelled
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                check_cancelled(cancel_token)
+                self._condition.wait(0.2)
+            self._in_flight += 1
+
+    def release(self, latency: float, overload: bool = False, failed: bool = False):
+        """
+        归还名额并根据请求结果调整并发上限。
+
+        Args:
+            latency: 请求耗时（秒）
+            overload: 请求是否因超时、5xx等服务器过载原因失败
+            failed: 请求是否因其他原因失败（不调整上限）
+        """
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            spike = (not overload and not failed and self._latency is not None
+                     and latency > self._latency * config.AIMD_LATENCY_SPIKE
+                     and (latency - self._latency) * 1000 > config.AIMD_SPIKE_MIN_MS)
+
+            if overload or spike:
+                self._overloads += 1
+                # 同一批在途请求只减小一次：距上次减小至少经过一个平滑延迟
+                if now - self._last_decrease >= (self._latency or latency):
+                    self._limit = max(self.min_limit, self._limit * config.AIMD_DECREASE_FACTOR)
+                    self._last_decrease = now
+                    self._decreases += 1
+            elif not failed:
+                self._successes += 1
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+            if not overload and not failed:
+                # 突增的延迟也计入平均值，持续变慢时基准随之升高
+                self._latency = latency if self._latency is None else self._latency * 0.8 + latency * 0.2
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, cancel_token: CancellationToken | None = None):
+        """
+        在并发名额内执行一次请求，自动计时并按异常类型反馈结果。
+
+        Args:
+            cancel_token: 可选的取消令牌
+        """
+        self.acquire(cancel_token)
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            overload = is_overload_error(e)
+            self.release(time.monotonic() - start, overload=overload, failed=not overload)
+            raise
+        self.release(time.monotonic() - start)
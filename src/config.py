@@ -1,5 +1,7 @@
 # config.py
 
+import os
+
 # 登录页面URL
 LOGIN_URL = "https://sso.cup.edu.cn/login"
 # 登录请求中的'service'参数
@@ -11,6 +13,9 @@ ACTIVITY_LIST_URL = "https://sct.cup.edu.cn/mucenter/index/index"
 # 活动详情API，需要POST请求
 ACTIVITY_DETAIL_API = BASE_URL + "/activitynew/mucenter/enter/detail"
 
+# 网站页面的编码：响应头和页面<meta>都没有声明字符集时按此解码，不做整页编码检测
+SITE_ENCODING = 'utf-8'
+
 # 模拟移动浏览器的User-Agent字符串
 USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 18_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.5 Mobile/15E148 Safari/604.1 Edg/142.0.0.0"
 
@@ -23,3 +28,104 @@ BASE_HEADERS = {
 
 # 单次请求获取活动详情的限制数量
 DETAIL_FETCH_LIMIT = 10
+# 预加载详情的选择策略：'value'（未加载过的活动优先，其次是活动时间临近且签到签退未完成的活动）或 'page'（按页面顺序）
+PREFETCH_POLICY = 'value'
+
+# 边下载边解析活动列表页面，先解析出的活动立即开始请求详情（需要并发获取详情）
+STREAM_ACTIVITY_LIST = True
+# 流式下载活动列表时每次读取的字节数
+LIST_STREAM_CHUNK_SIZE = 16384
+
+# 登录成功后是否直接在同一工作线程中继续获取活动列表和预加载详情
+AUTO_FETCH_AFTER_LOGIN = True
+
+# 网络请求超时时间（连接超时, 读取超时），单位秒；同时决定取消请求的最长响应时间
+REQUEST_TIMEOUT = (5, 30)
+
+# 工作线程到界面的更新刷新周期（毫秒），约30Hz
+UI_UPDATE_INTERVAL_MS = 33
+
+# 表格分批插入时每个时间片的预算（毫秒）
+TREE_RENDER_BUDGET_MS = 12
+
+# 本地活动历史数据库（SQLite）
+ENABLE_HISTORY_DB = True
+# 数据目录，保存历史数据库等本地文件
+DATA_DIR = os.path.join(os.path.expanduser('~'), '.cup_2nd_class_helper')
+HISTORY_DB_PATH = os.path.join(DATA_DIR, 'history.db')
+# 启动时从历史数据库每次读取并显示的记录数
+HISTORY_PAGE_SIZE = 200
+
+# 监视模式：只轮询活动时间在当前时间前后该窗口内的活动（小时）
+WATCH_WINDOW_HOURS = 6
+# 监视模式：活动时间附近的最短轮询间隔（秒）
+WATCH_MIN_INTERVAL = 60
+# 监视模式：最长轮询间隔（秒）
+WATCH_MAX_INTERVAL = 900
+# 监视模式：距离活动时间在该范围内（秒）按最短间隔轮询，更远时间隔按比例增大
+WATCH_NEAR_SECONDS = 3600
+# 监视模式：全局每分钟请求预算
+WATCH_REQUESTS_PER_MINUTE = 6
+# 状态变化的行保持高亮的时长（毫秒）
+WATCH_HIGHLIGHT_MS = 60000
+
+# 批量运行：同时处理的账号数（网络线程数）
+BATCH_WORKERS = 8
+# 批量运行：解析进程数，0表示在网络线程中直接解析
+PARSE_PROCESSES = 0
+# 批量运行：同时在途的解析任务上限，超出时网络线程等待
+PARSE_MAX_PENDING = 64
+# 批量运行：流水线各阶段之间的队列容量，下游处理不过来时上游阻塞等待
+BATCH_QUEUE_SIZE = 100
+# 分片批量任务：每个分片包含的账号数
+BATCH_SHARD_SIZE = 200
+# 分片批量任务：分片锁超过该时间（秒）未刷新视为持有者已崩溃，可被其他进程接管
+BATCH_LOCK_TIMEOUT = 600
+
+# 导出：每次写出的行数（Parquet中为一个行组）
+EXPORT_CHUNK_SIZE = 5000
+
+# 详情请求的自适应并发（AIMD）：初始、最小、最大并发数
+DETAIL_CONCURRENCY_INITIAL = 2
+DETAIL_CONCURRENCY_MIN = 1
+DETAIL_CONCURRENCY_MAX = 16
+# 遇到超时、5xx或延迟突增时并发上限乘以该系数
+AIMD_DECREASE_FACTOR = 0.5
+# 请求延迟超过平滑延迟的该倍数视为延迟突增
+AIMD_LATENCY_SPIKE = 2.5
+# 同时至少比平滑延迟高出该毫秒数才算突增，避免很快但有抖动的响应（如2 ms变成6 ms）被当作拥堵
+AIMD_SPIKE_MIN_MS = 50
+
+# 网络交互录像：读取化名用盐的环境变量，未设置时录制会在录像旁生成 .key 密钥文件（不要提交或分享）
+CASSETTE_SALT_ENV = 'CUP_CASSETTE_SALT'
+
+# 进程内所有会话共享的按主机限速（令牌桶），登录和详情API分别计算
+ENABLE_RATE_LIMIT = True
+# 统一认证登录：每秒请求数和突发容量
+LOGIN_RATE_PER_SECOND = 2.0
+LOGIN_BURST = 4
+# 活动详情API：每秒请求数和突发容量
+DETAIL_RATE_PER_SECOND = 20.0
+DETAIL_BURST = 20
+
+# 本地JSON API服务：监听地址和端口（默认只允许本机访问）
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+# 本地JSON API服务：执行上游请求的线程数
+SERVICE_WORKERS = 16
+# 本地JSON API服务：活动列表和报名详情的缓存有效期、活动信息的缓存有效期（秒）
+SERVICE_ACTIVITIES_TTL = 300
+SERVICE_DETAIL_TTL = 3600
+# 本地JSON API服务：会话超过该时间（秒）后重新登录
+SERVICE_SESSION_MAX_AGE = 1800
+# 本地JSON API服务：长连接空闲超时（秒）和监听队列长度
+SERVICE_KEEPALIVE_TIMEOUT = 30
+SERVICE_BACKLOG = 1024
+
+# 性能分析模式（--profile）：墙钟采样间隔（毫秒）和内存分配记录的调用栈深度
+PROFILE_SAMPLE_INTERVAL_MS = 5
+PROFILE_TRACEMALLOC_FRAMES = 16
+# 界面主线程阻塞检测（常开）：事件处理函数阻塞主循环超过该时长（毫秒）时记录，以及心跳间隔（毫秒）
+UI_WATCHDOG = True
+UI_BLOCK_THRESHOLD_MS = 200
+UI_WATCHDOG_INTERVAL_MS = 100
@@ -0,0 +1,229 @@
+# exporter.py
+
+import csv
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping
+
+import src.config as config
+
+try:
+    # 可选依赖：安装pyarrow后支持导出Parquet列式格式
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+# 导出列及其类型：string / timestamp / float / bool
+EXPORT_COLUMNS = (
+    ('student_id', 'string'),
+    ('student_name', 'string'),
+    ('name', 'string'),
+    ('url', 'string'),
+    ('acttime', 'timestamp'),
+    ('hours', 'float'),
+    ('points', 'float'),
+    ('signin', 'bool'),
+    ('signout', 'bool'),
+    ('classification', 'string'),
+    ('category', 'string'),
+    ('tags', 'string'),
+    ('is_loaded', 'bool'),
+    ('error', 'string'),
+)
+
+# 文件扩展名到导出格式的映射
+EXPORT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.parquet': 'parquet'}
+
+
+def export_row(record: Mapping[str, Any], student_id: str | None = None, student_name: str | None = None) -> Dict[str, Any]:
+    """
+    把活动记录转换为类型化的导出行。未加载详情的字段为None，而不是显示用的占位文本。
+
+    Args:
+        record: 活动记录（批量结果中可以自带student_id和student_name）
+        student_id: 学号，记录中没有时使用
+        student_name: 学生姓名，记录中没有时使用
+
+    Returns:
+        Dict[str, Any]: 按EXPORT_COLUMNS排列的导出行
+    """
+    loaded = bool(record.get('is_loaded')) and 'error' not in record
+    timestamp = record.get('acttime_timestamp') or 0
+    return {
+        'student_id': record.get('student_id', student_id),
+        'student_name': record.get('student_name', student_name),
+        'name': record.get('name'),
+        'url': record.get('url'),
+        'acttime': datetime.fromtimestamp(timestamp) if loaded and timestamp > 0 else None,
+        'hours': record.get('hours_value') if loaded else None,
+        'points': record.get('points_value') if loaded else None,
+        'signin': bool(record.get('signin_ok', record.get('signin') == '已签到')) if loaded else None,
+        'signout': bool(record.get('signout_ok', record.get('signout') == '已签退')) if loaded else None,
+        'classification': record.get('classification') or None,
+        'category': record.get('category') or None,
+        'tags': record.get('tags') if loaded else None,
+        'is_loaded': loaded,
+        'error': record.get('error'),
+    }
+
+
+def export_format(path: str, fmt: str | None = None) -> str:
+    """
+    确定导出格式：未指定时按文件扩展名判断。
+
+    Args:
+        path: 输出文件路径
+        fmt: 可选的导出格式（csv / jsonl / parquet）
+
+    Returns:
+        str: 导出格式
+
+    Raises:
+        ValueError: 格式或扩展名不受支持、或缺少可选依赖时抛出
+    """
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in EXPORT_FORMATS:
+            raise ValueError(f"无法根据扩展名确定导出格式: {path}（支持 {' / '.join(EXPORT_FORMATS)}）")
+        fmt = EXPORT_FORMATS[extension]
+    if fmt not in EXPORT_FORMATS.values():
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    if fmt == 'parquet' and not PARQUET_AVAILABLE:
+        raise ValueError("导出Parquet需要安装pyarrow。")
+    return fmt
+
+
+class ExportWriter:
+    """
+    分块写出导出行的写入器。行先在内存中累积一个块，满块后一次写出，
+    因此可以边产生记录边导出，而不需要先得到完整列表。
+    """
+
+    def __init__(self, path: str, fmt: str | None = None, chunk_size: int = config.EXPORT_CHUNK_SIZE):
+        """
+        初始化写入器并创建输出文件。
+
+        Args:
+            path: 输出文件路径
+            fmt: 可选的导出格式，默认按扩展名判断
+            chunk_size: 每块的行数（Parquet中对应一个行组）
+        """
+        self.path = path
+        self.fmt = export_format(path, fmt)
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self._chunk: List[Dict[str, Any]] = []
+        self._columns = [name for name, _ in EXPORT_COLUMNS]
+
+        if self.fmt == 'parquet':
+            self._schema = pa.schema([(name, self._arrow_type(kind)) for name, kind in EXPORT_COLUMNS])
+            self._parquet = pq.ParquetWriter(path, self._schema)
+        else:
+            # CSV带BOM，方便直接用Excel打开
+            self._file = open(path, 'w', newline='', encoding='utf-8-sig' if self.fmt == 'csv' else 'utf-8')
+            if self.fmt == 'csv':
+                self._csv = csv.writer(self._file)
+                self._csv.writerow(self._columns)
+
+    @staticmethod
+    def _arrow_type(kind: str):
+        return {
+            'string': pa.string(),
+            'timestamp': pa.timestamp('s'),
+            'float': pa.float64(),
+            'bool': pa.bool_(),
+        }[kind]
+
+    def write(self, row: Dict[str, Any]):
+        """
+        写入一行导出数据（export_row的结果）。
+
+        Args:
+            row: 导出行
+        """
+        self._chunk.append(row)
+        if len(self._chunk) >= self.chunk_size:
+            self.flush()
+
+    def write_record(self, record: Mapping[str, Any], student_id: str | None = None, student_name: str | None = None):
+        """
+        转换并写入一条活动记录。
+
+        Args:
+            record: 活动记录
+            student_id: 学号
+            student_name: 学生姓名
+        """
+        self.write(export_row(record, student_id, student_name))
+
+    def flush(self):
+        """
+        写出当前块。
+        """
+        if not self._chunk:
+            return
+        chunk, self._chunk = self._chunk, []
+        if self.fmt == 'parquet':
+            self._parquet.write_table(pa.Table.from_pylist(chunk, schema=self._schema))
+        elif self.fmt == 'csv':
+            self._csv.writerows([self._csv_value(row[name]) for name in self._columns] for row in chunk)
+        else:
+            self._file.write(''.join(json.dumps(row, ensure_ascii=False, default=self._json_value) + '\n' for row in chunk))
+        self.rows_written += len(chunk)
+
+    @staticmethod
+    def _csv_value(value):
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, datetime):
+            return value.isoformat(sep=' ')
+        return value
+
+    @staticmethod
+    def _json_value(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+    def close(self):
+        """
+        写出剩余的行并关闭文件。
+        """
+        self.flush()
+        if self.fmt == 'parquet':
+            self._parquet.close()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def export_records(records: Iterable[Mapping[str, Any]], path: str, fmt: str | None = None,
+                   student_id: str | None = None, student_name: str | None = None) -> int:
+    """
+    流式导出活动记录。
+
+    Args:
+        records: 活动记录可迭代对象（逐条读取）
+        path: 输出文件路径
+        fmt: 可选的导出格式，默认按扩展名判断
+        student_id: 记录中没有学号时使用的学号
+        student_name: 记录中没有姓名时使用的姓名
+
+    Returns:
+        int: 导出的行数
+    """
+    with ExportWriter(path, fmt) as writer:
+        for record in records:
+            writer.write_record(record, student_id, student_name)
+    return writer.rows_written
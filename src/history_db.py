@@ -0,0 +1,428 @@
+# history_db.py
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+import src.config as config
+import src.html_parser as html_parser
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    student_id   TEXT PRIMARY KEY,
+    name         TEXT,
+    last_seen_at INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS activities (
+    actid          TEXT PRIMARY KEY,
+    title          TEXT,
+    acttime        INTEGER NOT NULL DEFAULT 0,
+    time_text      TEXT,
+    duration_text  TEXT,
+    points_text    TEXT,
+    tags           TEXT,
+    classification TEXT,
+    category       TEXT,
+    hours          REAL,
+    points         REAL,
+    has_detail     INTEGER NOT NULL DEFAULT 0,
+    updated_at     INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS enrollments (
+    id         TEXT PRIMARY KEY,
+    student_id TEXT NOT NULL REFERENCES students(student_id),
+    actid      TEXT NOT NULL REFERENCES activities(actid),
+    url        TEXT NOT NULL,
+    acttime    INTEGER NOT NULL DEFAULT 0,
+    signin     INTEGER,
+    signout    INTEGER,
+    status     TEXT NOT NULL DEFAULT 'unknown',
+    is_loaded  INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS signin_history (
+    enrollment_id TEXT NOT NULL REFERENCES enrollments(id),
+    observed_at   INTEGER NOT NULL,
+    signin        INTEGER,
+    signout       INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_activities_acttime ON activities(acttime);
+CREATE INDEX IF NOT EXISTS idx_activities_category ON activities(category);
+CREATE INDEX IF NOT EXISTS idx_activities_classification ON activities(classification);
+CREATE INDEX IF NOT EXISTS idx_enrollments_status ON enrollments(status);
+CREATE INDEX IF NOT EXISTS idx_enrollments_student_time ON enrollments(student_id, acttime DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_signin_history_enrollment ON signin_history(enrollment_id, observed_at);
+
+-- 签到/签退状态发生变化时自动追加历史记录
+CREATE TRIGGER IF NOT EXISTS trg_enrollments_history_insert
+AFTER INSERT ON enrollments WHEN new.is_loaded = 1
+BEGIN
+    INSERT INTO signin_history(enrollment_id, observed_at, signin, signout)
+    VALUES (new.id, new.updated_at, new.signin, new.signout);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_enrollments_history_update
+AFTER UPDATE OF signin, signout ON enrollments
+WHEN new.is_loaded = 1 AND (old.signin IS NOT new.signin OR old.signout IS NOT new.signout)
+BEGIN
+    INSERT INTO signin_history(enrollment_id, observed_at, signin, signout)
+    VALUES (new.id, new.updated_at, new.signin, new.signout);
+END;
+"""
+
+_UPSERT_STUDENT = """
+INSERT INTO students(student_id, name, last_seen_at) VALUES (?, ?, ?)
+ON CONFLICT(student_id) DO UPDATE SET
+    name = COALESCE(excluded.name, students.name),
+    last_seen_at = excluded.last_seen_at
+"""
+
+# 未加载详情的记录只更新标题，不覆盖已保存的详情字段
+_UPSERT_ACTIVITY = """
+INSERT INTO activities(actid, title, acttime, time_text, duration_text, points_text, tags,
+                       classification, category, hours, points, has_detail, updated_at)
+VALUES (:actid, :title, :acttime, :time_text, :duration_text, :points_text, :tags,
+        :classification, :category, :hours, :points, :has_detail, :updated_at)
+ON CONFLICT(actid) DO UPDATE SET
+    title = COALESCE(excluded.title, activities.title),
+    acttime = CASE WHEN excluded.has_detail THEN excluded.acttime ELSE activities.acttime END,
+    time_text = CASE WHEN excluded.has_detail THEN excluded.time_text ELSE activities.time_text END,
+    duration_text = CASE WHEN excluded.has_detail THEN excluded.duration_text ELSE activities.duration_text END,
+    points_text = CASE WHEN excluded.has_detail THEN excluded.points_text ELSE activities.points_text END,
+    tags = CASE WHEN excluded.has_detail THEN excluded.tags ELSE activities.tags END,
+    classification = CASE WHEN excluded.has_detail THEN excluded.classification ELSE activities.classification END,
+    category = CASE WHEN excluded.has_detail THEN excluded.category ELSE activities.category END,
+    hours = CASE WHEN excluded.has_detail THEN excluded.hours ELSE activities.hours END,
+    points = CASE WHEN excluded.has_detail THEN excluded.points ELSE activities.points END,
+    has_detail = MAX(activities.has_detail, excluded.has_detail),
+    updated_at = excluded.updated_at
+"""
+
+_UPSERT_ENROLLMENT = """
+INSERT INTO enrollments(id, student_id, actid, url, acttime, signin, signout, status, is_loaded, updated_at)
+VALUES (:id, :student_id, :actid, :url, :acttime, :signin, :signout, :status, :is_loaded, :updated_at)
+ON CONFLICT(id) DO UPDATE SET
+    student_id = excluded.student_id,
+    actid = excluded.actid,
+    url = excluded.url,
+    acttime = CASE WHEN excluded.is_loaded THEN excluded.acttime ELSE enrollments.acttime END,
+    signin = CASE WHEN excluded.is_loaded THEN excluded.signin ELSE enrollments.signin END,
+    signout = CASE WHEN excluded.is_loaded THEN excluded.signout ELSE enrollments.signout END,
+    status = CASE WHEN excluded.is_loaded THEN excluded.status ELSE enrollments.status END,
+    is_loaded = MAX(enrollments.is_loaded, excluded.is_loaded),
+    updated_at = excluded.updated_at
+"""
+
+_SELECT_ENROLLMENTS = """
+SELECT e.id, e.url, e.acttime, e.signin, e.signout, e.status, e.is_loaded,
+       a.title, a.time_text, a.duration_text, a.points_text, a.tags,
+       a.classification, a.category, a.hours, a.points
+FROM enrollments e JOIN activities a ON a.actid = e.actid
+WHERE e.student_id = ?
+"""
+
+
+def enrollment_status(signin_ok: bool, signout_ok: bool) -> str:
+    """
+    根据签到签退情况计算报名记录状态。
+
+    Args:
+        signin_ok: 是否已签到
+        signout_ok: 是否已签退
+
+    Returns:
+        str: 'completed' 或 'incomplete'
+    """
+    return 'completed' if signin_ok and signout_ok else 'incomplete'
+
+
+class ActivityHistoryDB:
+    """
+    基于SQLite的本地活动历史存储。
+    保存学生、活动（按actid）和报名记录（按id），并记录签到签退状态的变化历史。
+    使用WAL模式，读取连接不会阻塞写入连接；查询使用基于(活动时间, id)的键集分页。
+    数据库文件在第一次写入时才创建，只读取时不会在磁盘上留下文件。
+    """
+
+    def __init__(self, path: str = None):
+        """
+        初始化历史存储。
+
+        Args:
+            path: 数据库文件路径，默认使用config.HISTORY_DB_PATH
+        """
+        self.path = path or config.HISTORY_DB_PATH
+        # 写入连接由锁保护，可在任意工作线程中使用，第一次写入时创建
+        self._write_lock = threading.Lock()
+        self._writer = None
+        # 读取连接按线程创建
+        self._local = threading.local()
+
+    def _ensure_writer(self) -> sqlite3.Connection:
+        """
+        获取写入连接，第一次调用时创建数据库文件和表结构（需持有写入锁）。
+
+        Returns:
+            sqlite3.Connection: 写入连接
+        """
+        if self._writer is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._writer = self._connect()
+            self._writer.executescript(_SCHEMA)
+        return self._writer
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        创建数据库连接并启用WAL模式。
+
+        Returns:
+            sqlite3.Connection: 数据库连接
+        """
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection | None:
+        """
+        获取当前线程的读取连接。
+
+        Returns:
+            sqlite3.Connection: 读取连接，数据库文件尚不存在时返回None
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if not os.path.exists(self.path):
+                return None
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def save_activities(self, student_id: str, student_name: str | None, records: Iterable[Mapping[str, Any]], batch_size: int = 500):
+        """
+        批量保存活动记录（获取器输出的字典格式）。
+        每批记录在一个事务中完成upsert。
+
+        Args:
+            student_id: 学号
+            student_name: 学生姓名
+            records: 活动记录
+            batch_size: 每个事务写入的记录数
+        """
+        now = int(time.time())
+        with self._write_lock:
+            writer = self._ensure_writer()
+            with writer:
+                writer.execute(_UPSERT_STUDENT, (student_id, student_name, now))
+
+            activity_rows, enrollment_rows = [], []
+            for record in records:
+                rows = self._record_to_rows(student_id, record, now)
+                if rows is None:
+                    continue
+                activity_rows.append(rows[0])
+                enrollment_rows.append(rows[1])
+                if len(enrollment_rows) >= batch_size:
+                    self._write_batch(activity_rows, enrollment_rows)
+                    activity_rows, enrollment_rows = [], []
+
+            if enrollment_rows:
+                self._write_batch(activity_rows, enrollment_rows)
+
+    def _write_batch(self, activity_rows: List[dict], enrollment_rows: List[dict]):
+        """
+        在一个事务中写入一批活动和报名记录。
+
+        Args:
+            activity_rows: 活动行
+            enrollment_rows: 报名记录行
+        """
+        with self._writer:
+            self._writer.executemany(_UPSERT_ACTIVITY, activity_rows)
+            self._writer.executemany(_UPSERT_ENROLLMENT, enrollment_rows)
+
+    @staticmethod
+    def _record_to_rows(student_id: str, record: Mapping[str, Any], now: int) -> Tuple[dict, dict] | None:
+        """
+        将获取器输出的活动记录拆分为活动行和报名记录行。
+
+        Args:
+            student_id: 学号
+            record: 活动记录
+            now: 当前时间戳
+
+        Returns:
+            Tuple[dict, dict]: (活动行, 报名记录行)，URL中缺少id或actid时返回None
+        """
+        enroll_id, actid = html_parser.parse_activity_ids(record.get('url', ''))
+        if not enroll_id or not actid:
+            return None
+
+        has_detail = bool(record.get('is_loaded')) and 'error' not in record
+        signin_ok = bool(record.get('signin_ok'))
+        signout_ok = bool(record.get('signout_ok'))
+        acttime = record.get('acttime_timestamp', 0) or 0
+
+        activity_row = {
+            'actid': actid,
+            'title': record.get('name'),
+            'acttime': acttime,
+            'time_text': record.get('time'),
+            'duration_text': record.get('duration'),
+            'points_text': record.get('points'),
+            'tags': record.get('tags'),
+            'classification': record.get('classification'),
+            'category': record.get('category'),
+            'hours': record.get('hours_value'),
+            'points': record.get('points_value'),
+            'has_detail': int(has_detail),
+            'updated_at': now
+        }
+        enrollment_row = {
+            'id': enroll_id,
+            'student_id': student_id,
+            'actid': actid,
+            'url': record['url'],
+            'acttime': acttime,
+            'signin': int(signin_ok) if has_detail else None,
+            'signout': int(signout_ok) if has_detail else None,
+            'status': enrollment_status(signin_ok, signout_ok) if has_detail else 'unknown',
+            'is_loaded': int(has_detail),
+            'updated_at': now
+        }
+        return activity_row, enrollment_row
+
+    def get_last_student(self) -> Dict[str, Any] | None:
+        """
+        获取最近一次保存数据的学生。
+
+        Returns:
+            Dict[str, Any]: 包含'student_id'、'name'和'last_seen_at'的字典，没有数据时返回None
+        """
+        reader = self._reader()
+        if reader is None:
+            return None
+        row = reader.execute(
+            "SELECT student_id, name, last_seen_at FROM students ORDER BY last_seen_at DESC LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        return {'student_id': row[0], 'name': row[1], 'last_seen_at': row[2]}
+
+    def page_enrollments(self, student_id: str, after: Tuple[int, str] | None = None, limit: int = 500,
+                         status: str | None = None, category: str | None = None) -> Tuple[List[Dict[str, Any]], Tuple[int, str] | None]:
+        """
+        按活动时间降序分页读取学生的报名记录。
+        使用键集分页：传入上一页返回的游标，而不是OFFSET。
+
+        Args:
+            student_id: 学号
+            after: 上一页返回的游标 (活动时间, 报名记录id)，第一页为None
+            limit: 每页记录数
+            status: 可选的状态过滤 ('completed' / 'incomplete' / 'unknown')
+            category: 可选的活动类别过滤
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Tuple[int, str] | None]: (记录列表, 下一页游标)，没有更多数据时游标为None
+        """
+        sql = _SELECT_ENROLLMENTS
+        params: list = [student_id]
+        if after is not None:
+            sql += " AND (e.acttime, e.id) < (?, ?)"
+            params.extend(after)
+        if status is not None:
+            sql += " AND e.status = ?"
+            params.append(status)
+        if category is not None:
+            sql += " AND a.category = ?"
+            params.append(category)
+        sql += " ORDER BY e.acttime DESC, e.id DESC LIMIT ?"
+        params.append(limit)
+
+        reader = self._reader()
+        if reader is None:
+            return [], None
+        rows = reader.execute(sql, params).fetchall()
+        records = [self._row_to_record(row) for row in rows]
+        next_cursor = (rows[-1][2], rows[-1][0]) if len(rows) == limit else None
+        return records, next_cursor
+
+    def iter_enrollments(self, student_id: str, page_size: int = 500, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        逐页迭代学生的全部报名记录，内存中最多只保留一页。
+
+        Args:
+            student_id: 学号
+            page_size: 每页记录数
+            **filters: 传递给page_enrollments的过滤条件
+
+        Yields:
+            Dict[str, Any]: 活动记录
+        """
+        cursor = None
+        while True:
+            records, cursor = self.page_enrollments(student_id, cursor, page_size, **filters)
+            yield from records
+            if cursor is None:
+                return
+
+    @staticmethod
+    def _row_to_record(row: tuple) -> Dict[str, Any]:
+        """
+        将查询结果行转换为与获取器输出一致的活动记录。
+
+        Args:
+            row: 查询结果行
+
+        Returns:
+            Dict[str, Any]: 活动记录
+        """
+        (enroll_id, url, acttime, signin, signout, status, is_loaded,
+         title, time_text, duration_text, points_text, tags,
+         classification, category, hours, points) = row
+
+        if not is_loaded:
+            record = html_parser.parse_basic_activity_info({'name': title or ''})
+            record.update({'url': url, 'is_loaded': False})
+            return record
+
+        return {
+            'name': title or '',
+            'url': url,
+            'time': time_text,
+            'acttime_timestamp': acttime,
+            'duration': duration_text,
+            'points': points_text,
+            'tags': tags,
+            'signin': '已签到' if signin else '未签到',
+            'signout': '已签退' if signout else '未签退',
+            'classification': classification or '',
+            'category': category or '',
+            'hours_value': hours,
+            'points_value': points,
+            'signin_ok': bool(signin),
+            'signout_ok': bool(signout),
+            'is_loaded': True
+        }
+
+    def close(self):
+        """
+        关闭写入连接和当前线程的读取连接。
+        """
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
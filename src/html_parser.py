@@ -1,36 +1,161 @@
 # html_parser.py
 
 from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+import codecs
+import html
+import json
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+import src.config as config
 
-def parse_execution(html_content: str) -> str | None:
+# 字节顺序标记及对应的编码
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+# 页面开头<meta>中声明的字符集
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+# 与浏览器一致，GB2312/GBK页面按其超集GB18030解码
+_ENCODING_ALIASES = {'gb2312': 'gb18030', 'gbk': 'gb18030'}
+
+def _normalize_encoding(name: str | None) -> str | None:
+    """
+    规范化编码名称，无法识别时返回None。
+    """
+    if not name:
+        return None
+    try:
+        name = codecs.lookup(name.strip()).name
+    except LookupError:
+        return None
+    return _ENCODING_ALIASES.get(name, name)
+
+def sniff_encoding(content: bytes, declared: str | None = None) -> str:
+    """
+    确定HTML响应的编码，只检查字节顺序标记和页面开头1024字节内的<meta charset>，不扫描整个页面。
+    优先级：字节顺序标记 > 响应头声明的字符集 > <meta>声明 > 配置中的SITE_ENCODING。
+
+    Args:
+        content: 响应字节（可以只是开头部分）
+        declared: 响应头Content-Type中声明的字符集
+
+    Returns:
+        str: 编码名称
+    """
+    for bom, name in _BOMS:
+        if content.startswith(bom):
+            return name
+    encoding = _normalize_encoding(declared)
+    if encoding:
+        return encoding
+    match = _META_CHARSET.search(content, 0, 1024)
+    if match:
+        encoding = _normalize_encoding(match.group(1).decode('ascii'))
+        if encoding:
+            return encoding
+    return config.SITE_ENCODING
+
+def decode_html(content: str | bytes, encoding: str | None = None) -> str:
+    """
+    把HTML响应字节解码为文本，只解码一次，不做整页编码检测。
+
+    Args:
+        content: 响应字节（已是文本时原样返回）
+        encoding: 响应头Content-Type中声明的字符集
+
+    Returns:
+        str: 页面文本
+    """
+    if isinstance(content, str):
+        return content
+    return content.decode(sniff_encoding(content, encoding), errors='replace')
+
+# 单个标签中的属性：名称及双引号、单引号或不加引号的值
+_TAG_ATTRIBUTE = re.compile(r'''([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+
+def _tag_attributes(tag: str) -> Dict[str, str]:
+    """
+    解析单个开始标签（不含尖括号和标签名）中的属性，属性名转为小写，值中的字符实体会被还原。
+    """
+    attributes = {}
+    for match in _TAG_ATTRIBUTE.finditer(tag):
+        name = match.group(1).lower()
+        if name not in attributes:
+            value = next((group for group in match.groups()[1:] if group is not None), '')
+            attributes[name] = html.unescape(value)
+    return attributes
+
+def extract_execution(html_content: str | bytes, encoding: str | None = None) -> str | None:
+    """
+    快速提取登录页面中的'execution'令牌，不构建解析树。
+    查找"execution"出现的位置，只解析所在的<input>标签，找到name为execution且带value的输入框后立即返回；
+    原始字节直接在字节中查找，只解码该标签。注释中的输入框会被跳过。
+
+    Args:
+        html_content: 登录页面的HTML内容（文本或原始字节）
+        encoding: 原始字节时响应头声明的字符集
+
+    Returns:
+        str: execution令牌值，没有找到时返回None（由调用方回退到完整解析）
+    """
+    is_bytes = isinstance(html_content, bytes)
+    needle, open_mark, close_mark, comment_start, comment_end = (
+        (b'execution', b'<', b'>', b'<!--', b'-->') if is_bytes else ('execution', '<', '>', '<!--', '-->')
+    )
+    position = html_content.find(needle)
+    while position != -1:
+        start = html_content.rfind(open_mark, 0, position)
+        end = html_content.find(close_mark, position)
+        if start == -1 or end == -1:
+            return None
+        tag = html_content[start + 1:end]
+        if is_bytes:
+            tag = tag.decode(sniff_encoding(html_content[:1024], encoding), errors='replace')
+        inside_comment = html_content.rfind(comment_start, 0, start) > html_content.rfind(comment_end, 0, start)
+        if not inside_comment and tag[:5].lower() == 'input' and tag[5:6].isspace():
+            attributes = _tag_attributes(tag[6:])
+            if attributes.get('name') == 'execution' and 'value' in attributes:
+                return attributes['value']
+        position = html_content.find(needle, end)
+    return None
+
+def parse_execution(html_content: str | bytes, encoding: str | None = None) -> str | None:
     """
     解析登录页面HTML，提取'execution'令牌。
+    先用extract_execution只扫描到令牌所在的标签为止，找不到时再构建完整的解析树查找。
 
     Args:
-        html_content: 登录页面的HTML内容
+        html_content: 登录页面的HTML内容（文本或原始字节）
+        encoding: 原始字节时响应头声明的字符集
 
     Returns:
         str: execution令牌值，如果未找到则返回None
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    execution = extract_execution(html_content, encoding)
+    if execution is not None:
+        return execution
+    soup = BeautifulSoup(decode_html(html_content, encoding), 'html.parser')
     execution_input = soup.find('input', {'name': 'execution'})
     if execution_input and 'value' in execution_input.attrs:
         return execution_input['value']
     return None
 
-def parse_student_name(html_content: str) -> str | None:
+def parse_student_name(html_content: str | bytes, encoding: str | None = None) -> str | None:
     """
     从HTML内容中解析学生姓名。
 
     Args:
-        html_content: 包含学生信息的HTML内容
+        html_content: 包含学生信息的HTML内容（文本或原始字节）
+        encoding: 原始字节时响应头声明的字符集
 
     Returns:
         str: 学生姓名，如果未找到则返回None
     """
+    html_content = decode_html(html_content, encoding)
     soup = BeautifulSoup(html_content, 'html.parser')
     name_div = soup.select_one('div.name')
 
@@ -49,19 +174,35 @@ def parse_student_name(html_content: str) -> str | None:
 
     return None
 
-def parse_activity_list(html_content: str) -> list[dict]:
+def is_activity_list_page(html_content: str) -> bool:
+    """
+    粗略判断HTML内容是否为"我的页面"（活动列表页面）。
+    仅做字符串查找，不构建解析树，用于判断登录跳转的响应能否直接复用。
+
+    Args:
+        html_content: 待判断的HTML内容
+
+    Returns:
+        bool: 是否为活动列表页面
+    """
+    if not html_content:
+        return False
+    return 'class="name"' in html_content or 'green_events' in html_content
+
+def parse_activity_list(html_content: str | bytes, encoding: str | None = None) -> list[dict]:
     """
     解析"我的页面"HTML，提取已报名活动列表。
 
     Args:
-        html_content: 我的页面的HTML内容
+        html_content: 我的页面的HTML内容（文本或原始字节）
+        encoding: 原始字节时响应头声明的字符集
 
     Returns:
         list[dict]: 活动列表，每个字典包含：
             - 'name': 活动名称
             - 'url': 活动详情页面的相对 URL (包含id和actid)
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = BeautifulSoup(decode_html(html_content, encoding), 'html.parser')
     activities = []
 
     # Select links under "我的报名" that are for activities
@@ -76,6 +217,137 @@ def parse_activity_list(html_content: str) -> list[dict]:
 
     return activities
 
+def parse_list_page(html_content: str | bytes, encoding: str | None = None) -> Tuple[str | None, list[dict]]:
+    """
+    一次性解析"我的页面"中的学生姓名和已报名活动列表。
+
+    Args:
+        html_content: 我的页面的HTML内容（文本或原始字节）
+        encoding: 原始字节时响应头声明的字符集
+
+    Returns:
+        Tuple[str | None, list[dict]]: (学生姓名, 活动列表)
+    """
+    html_content = decode_html(html_content, encoding)
+    return parse_student_name(html_content), parse_activity_list(html_content)
+
+class ActivityListStreamParser(HTMLParser):
+    """
+    "我的页面"的增量解析器：页面内容分块送入，每个活动链接结束时立即产出该活动，
+    不必等待整个页面下载完成。提取规则与parse_activity_list、parse_student_name相同。
+    """
+
+    def __init__(self):
+        """
+        初始化增量解析器。
+        """
+        super().__init__(convert_charrefs=True)
+        self.student_name = None
+        self._ready: List[dict] = []
+        self._li_depth = 0
+        self._events_depth = None  # li.green_events所在的li嵌套层数
+        self._link = None  # 当前活动链接的href
+        self._course_name = None
+        self._div_depth = 0
+        self._capture = None  # 正在收集文本的div：'name' 或 'course'
+        self._capture_depth = 0
+        self._text: List[str] = []
+
+    def push(self, text: str) -> List[dict]:
+        """
+        送入一块页面内容。
+
+        Args:
+            text: 页面内容片段
+
+        Returns:
+            List[dict]: 这一块内容中完成的活动（name和url）
+        """
+        self.feed(text)
+        ready, self._ready = self._ready, []
+        return ready
+
+    def finish(self) -> List[dict]:
+        """
+        结束解析，处理剩余的缓冲内容。
+
+        Returns:
+            List[dict]: 剩余完成的活动
+        """
+        self.close()
+        ready, self._ready = self._ready, []
+        return ready
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        if tag == 'li':
+            self._li_depth += 1
+            if self._events_depth is None and 'green_events' in classes:
+                self._events_depth = self._li_depth
+        elif tag == 'a':
+            href = attrs.get('href') or ''
+            if self._events_depth is not None and '/activitynew/mucenter/enter/detail' in href:
+                self._link = href
+                self._course_name = None
+        elif tag == 'div':
+            self._div_depth += 1
+            if self._capture is not None:
+                return
+            if self._link is not None and self._course_name is None and 'course_name' in classes:
+                self._capture = 'course'
+            elif self.student_name is None and 'name' in classes:
+                self._capture = 'name'
+            else:
+                return
+            self._capture_depth = self._div_depth
+            self._text = []
+
+    def handle_endtag(self, tag):
+        if tag == 'div':
+            if self._capture is not None and self._div_depth == self._capture_depth:
+                text = ''.join(self._text).strip()
+                if self._capture == 'course':
+                    self._course_name = text
+                elif text:
+                    self.student_name = text
+                self._capture = None
+            self._div_depth = max(self._div_depth - 1, 0)
+        elif tag == 'a' and self._link is not None:
+            if self._course_name is not None:
+                self._ready.append({'name': self._course_name, 'url': self._link})
+            self._link = None
+        elif tag == 'li':
+            if self._events_depth == self._li_depth:
+                self._events_depth = None
+            self._li_depth = max(self._li_depth - 1, 0)
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._text.append(data)
+
+def parse_activity_ids(detail_url: str) -> Tuple[str, str]:
+    """
+    从活动详情URL中提取报名记录ID和活动ID。
+
+    Args:
+        detail_url: 活动详情页面的URL
+
+    Returns:
+        Tuple[str, str]: (id, actid)，缺失时为空字符串
+    """
+    query_params = parse_qs(urlparse(detail_url).query)
+    return query_params.get('id', [''])[0], query_params.get('actid', [''])[0]
+
+def _to_float(value) -> float | None:
+    """
+    将数值字段转换为浮点数，无法转换时返回None。
+    """
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
 def parse_activity_detail(json_data: Dict[str, Any]) -> dict:
     """
     解析活动详情JSON数据，提取关键信息。
@@ -89,10 +361,31 @@ def parse_activity_detail(json_data: Dict[str, Any]) -> dict:
     - 'tags': 标签
     - 'signin': 签到状态 (不带时间)
     - 'signout': 签退状态 (不带时间)
+
+    以及用于存储、排序和统计的类型化字段：
+    - 'classification': 活动分类 (classificationtitle)
+    - 'category': 活动类别 (categorytitle)
+    - 'hours_value': 持续时间（小时，数值，未知为None）
+    - 'points_value': 积分（数值，未知为None）
+    - 'signin_ok': 是否已签到 (bool)
+    - 'signout_ok': 是否已签退 (bool)
+    """
+    return {
+        **parse_activity_metadata(json_data.get('Activity', {})),
+        **parse_enrollment_status(json_data.get('enterMember', {}))
+    }
+
+def parse_activity_metadata(activity: Dict[str, Any]) -> dict:
     """
-    activity = json_data.get('Activity', {})
-    member = json_data.get('enterMember', {})
+    解析详情数据中的活动信息部分（'Activity'）。
+    这部分对报名同一活动的所有学生都相同，批量运行时可以按actid共享。
+
+    Args:
+        activity: 详情数据中的'Activity'字段
 
+    Returns:
+        dict: 活动时间、持续时间、积分、标签、分类等字段
+    """
     def format_timestamp(ts):
         """
         格式化时间戳为 'YYYY-MM-DD HH:MM' 格式。
@@ -122,6 +415,28 @@ def parse_activity_detail(json_data: Dict[str, Any]) -> dict:
         tags.append('需报告')
     tags_str = ' | '.join([t.strip() for t in tags if t])
 
+    return {
+        'time': time_str,
+        'acttime_timestamp': acttime_timestamp,
+        'duration': duration_str,
+        'points': points_str,
+        'tags': tags_str,
+        'classification': (activity.get('classificationtitle') or '').strip(),
+        'category': (activity.get('categorytitle') or '').strip(),
+        'hours_value': _to_float(activity.get('expectedtime')),
+        'points_value': _to_float(activity.get('isopennum', '0'))
+    }
+
+def parse_enrollment_status(member: Dict[str, Any]) -> dict:
+    """
+    解析详情数据中的报名信息部分（'enterMember'），即每个学生自己的签到签退状态。
+
+    Args:
+        member: 详情数据中的'enterMember'字段
+
+    Returns:
+        dict: signin、signout、signin_ok、signout_ok字段
+    """
     signin_status = '未签到'
     signout_status = '未签退'
 
@@ -131,15 +446,68 @@ def parse_activity_detail(json_data: Dict[str, Any]) -> dict:
         signout_status = '已签退'
 
     return {
-        'time': time_str,
-        'acttime_timestamp': acttime_timestamp,
-        'duration': duration_str,
-        'points': points_str,
-        'tags': tags_str,
         'signin': signin_status,
-        'signout': signout_status
+        'signout': signout_status,
+        'signin_ok': member.get('signin') == '1',
+        'signout_ok': member.get('signout') == '1'
     }
 
+def _load_detail_data(raw_content: str | bytes, encoding: str | None = None) -> Dict[str, Any]:
+    """
+    解析详情API的原始JSON响应并检查状态。
+    字节直接交给json.loads（自行识别UTF-8/16/32），只有声明了其他字符集时才先解码。
+
+    Args:
+        raw_content: 详情API响应体（文本或字节）
+        encoding: 原始字节时响应头声明的字符集
+
+    Returns:
+        Dict[str, Any]: 响应中的'data'字段
+
+    Raises:
+        Exception: API返回错误状态时抛出
+    """
+    encoding = _normalize_encoding(encoding)
+    if isinstance(raw_content, bytes) and encoding and not encoding.startswith('utf'):
+        raw_content = raw_content.decode(encoding, errors='replace')
+    json_response = json.loads(raw_content)
+    # 状态码'1'表示成功
+    if json_response.get('status') != '1':
+        raise Exception(f"API返回错误状态: {json_response.get('message', '未知错误')}")
+    return json_response.get('data', {})
+
+def parse_detail_response(raw_content: str | bytes, encoding: str | None = None) -> dict:
+    """
+    解析活动详情API的原始JSON响应，检查状态后提取关键信息。
+
+    Args:
+        raw_content: 详情API响应体（文本或字节）
+        encoding: 原始字节时响应头声明的字符集
+
+    Returns:
+        dict: parse_activity_detail的解析结果
+
+    Raises:
+        Exception: API返回错误状态时抛出
+    """
+    return parse_activity_detail(_load_detail_data(raw_content, encoding))
+
+def parse_enrollment_response(raw_content: str | bytes, encoding: str | None = None) -> dict:
+    """
+    只解析活动详情API响应中的签到签退状态，活动信息已共享时使用。
+
+    Args:
+        raw_content: 详情API响应体（文本或字节）
+        encoding: 原始字节时响应头声明的字符集
+
+    Returns:
+        dict: parse_enrollment_status的解析结果
+
+    Raises:
+        Exception: API返回错误状态时抛出
+    """
+    return parse_enrollment_status(_load_detail_data(raw_content, encoding).get('enterMember', {}))
+
 # 增加一个基本信息解析函数，用于未获取详情的活动
 def parse_basic_activity_info(activity_data: dict) -> dict:
     """
@@ -0,0 +1,487 @@
+# http_cassette.py
+
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import src.config as config
+import src.html_parser as html_parser
+
+# 录制时替换为占位符的表单字段和URL参数（密码、登录令牌）
+SCRUB_FIELDS = {'password', 'execution'}
+# 录制时替换为化名的字段（账号、票据）：同一个值总是得到同一个化名，回放时仍能区分不同账号的请求
+PSEUDONYM_FIELDS = {'username', 'ticket'}
+PSEUDONYM_PREFIX = 'anon-'
+# 录制时丢弃的响应头：Cookie等会话凭据，以及录制的响应体已解压、不再适用的传输编码头
+DROP_HEADERS = {'cookie', 'set-cookie', 'authorization', 'content-encoding', 'content-length', 'transfer-encoding'}
+SCRUBBED = '***'
+
+
+def pseudonym(value: str, salt: str = '') -> str:
+    """
+    计算值的化名（加盐的HMAC摘要）。已经是化名的值原样返回，
+    因此录像中跳转地址里的票据化名在回放时再次处理后仍然一致。
+
+    Args:
+        value: 原始值
+        salt: 录像的盐
+
+    Returns:
+        str: 化名
+    """
+    if value.startswith(PSEUDONYM_PREFIX):
+        return value
+    digest = hmac.new(salt.encode('utf-8'), value.encode('utf-8'), hashlib.sha256).hexdigest()
+    return PSEUDONYM_PREFIX + digest[:16]
+
+
+def load_salt(path: str, create: bool = False) -> str | None:
+    """
+    读取录像的盐。盐不写入录像文件：优先使用环境变量config.CASSETTE_SALT_ENV，
+    其次是录像旁边的密钥文件（录像路径加 .key，不要提交或随录像分享）。
+
+    Args:
+        path: 录像文件路径
+        create: 没有盐时是否生成随机盐并写入密钥文件（录制时）
+
+    Returns:
+        str: 盐，没有时返回None
+    """
+    salt = os.environ.get(config.CASSETTE_SALT_ENV)
+    if salt:
+        return salt
+    key_path = path + '.key'
+    if os.path.exists(key_path) and not create:
+        with open(key_path, encoding='utf-8') as f:
+            return f.read().strip()
+    if not create:
+        return None
+    salt = os.urandom(16).hex()
+    directory = os.path.dirname(key_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+        f.write(salt)
+    return salt
+
+
+def _scrub_pairs(pairs: List[Tuple[str, str]], pseudonymize: Callable[[str, str], str] | None) -> List[Tuple[str, str]]:
+    def scrub(key: str, value: str) -> str:
+        if key in SCRUB_FIELDS:
+            return SCRUBBED
+        if key in PSEUDONYM_FIELDS:
+            return pseudonymize(key, value) if pseudonymize else SCRUBBED
+        return value
+    return sorted((key, scrub(key, value)) for key, value in pairs)
+
+
+def _form_pairs(body: Any) -> List[Tuple[str, str]]:
+    if not body:
+        return []
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='replace')
+    return parse_qsl(body, keep_blank_values=True)
+
+
+def scrub_url(url: str, pseudonymize: Callable[[str, str], str] | None = None) -> str:
+    """
+    去除URL中的敏感参数并规范参数顺序。
+
+    Args:
+        url: 原始URL
+        pseudonymize: 计算化名的函数，接收(字段名, 值)；为None时化名字段也替换为占位符
+
+    Returns:
+        str: 处理后的URL
+    """
+    parts = urlsplit(url)
+    query = urlencode(_scrub_pairs(parse_qsl(parts.query, keep_blank_values=True), pseudonymize))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+
+def scrub_body(body: Any, pseudonymize: Callable[[str, str], str] | None = None) -> str:
+    """
+    去除表单请求体中的敏感字段并规范字段顺序。
+
+    Args:
+        body: 请求体（字符串或字节）
+        pseudonymize: 计算化名的函数，接收(字段名, 值)；为None时化名字段也替换为占位符
+
+    Returns:
+        str: 处理后的请求体
+    """
+    pairs = _form_pairs(body)
+    return urlencode(_scrub_pairs(pairs, pseudonymize)) if pairs else ''
+
+
+class Cassette:
+    """
+    HTTP交互录像：按请求（方法、URL、表单体，均已去除敏感信息）和所属账号保存响应，
+    以gzip压缩的JSON Lines文件存储在磁盘上。录制时新的交互分批追加到文件末尾。
+    账号和票据以加盐的化名保存，盐不写入录像（见load_salt），持有录像的人无法通过穷举学号还原化名。
+    回放时有盐则每个账号匹配自己的交互；没有盐时按登录顺序把账号依次对应到录制时的账号。
+    """
+
+    # 录制时累积到该数量的交互后追加写入一次文件
+    FLUSH_EVERY = 100
+
+    def __init__(self, path: str, fresh: bool = False, salt: str | None = None):
+        """
+        初始化录像，文件存在时加载已有内容。
+
+        Args:
+            path: 录像文件路径（建议以 .jsonl.gz 结尾）
+            fresh: 为True时删除已有文件，重新录制
+            salt: 计算化名使用的盐，录制时必须提供，回放时可以为None
+        """
+        self.path = path
+        self.salt = salt
+        self._lock = threading.Lock()
+        self._queues: Dict[Tuple[str, str, str, str], deque] = {}
+        self._pending: List[Dict[str, Any]] = []
+        # 录制时出现的账号化名（按出现顺序），以及没有盐时回放账号到录制账号的对应关系
+        self._scopes: List[str] = []
+        self._assigned: Dict[str, str] = {}
+        self._assign_lock = threading.Lock()
+        if fresh and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def pseudonym(self, field: str, value: str) -> str:
+        """
+        计算字段值的化名。没有盐时（回放）账号按登录顺序依次对应到录制时尚未对应的账号，
+        票据等其他字段在回放时已经是录像中的化名。
+
+        Args:
+            field: 字段名
+            value: 原始值
+
+        Returns:
+            str: 化名
+        """
+        if value.startswith(PSEUDONYM_PREFIX):
+            return value
+        if self.salt is not None:
+            return pseudonym(value, self.salt)
+        if field != 'username':
+            return SCRUBBED
+        with self._assign_lock:
+            scope = self._assigned.get(value)
+            if scope is None:
+                used = set(self._assigned.values())
+                scope = next((scope for scope in self._scopes if scope not in used), SCRUBBED)
+                self._assigned[value] = scope
+            return scope
+
+    def scrub_url(self, url: str) -> str:
+        """
+        去除URL中的敏感参数，账号和票据替换为化名。
+        """
+        return scrub_url(url, self.pseudonym)
+
+    def request_key(self, method: str, url: str, body: Any, scope: str = '') -> Tuple[str, str, str, str]:
+        """
+        计算请求的匹配键。
+
+        Args:
+            method: 请求方法
+            url: 请求URL
+            body: 请求体
+            scope: 请求所属账号的化名（登录之前为空）
+
+        Returns:
+            Tuple[str, str, str, str]: (方法, 去敏URL, 去敏请求体, 账号化名)
+        """
+        return method.upper(), self.scrub_url(url), scrub_body(body, self.pseudonym), scope
+
+    def request_scope(self, body: Any) -> str | None:
+        """
+        从登录请求体中取得账号的化名。
+
+        Returns:
+            str: 账号化名，请求体中没有账号时返回None
+        """
+        for key, value in _form_pairs(body):
+            if key == 'username':
+                return self.pseudonym(key, value)
+        return None
+
+    def _index(self, interaction: Dict[str, Any]):
+        scope = interaction.get('scope', '')
+        if scope and scope not in self._scopes:
+            self._scopes.append(scope)
+        key = (interaction['method'], interaction['url'], interaction['body'], scope)
+        self._queues.setdefault(key, deque()).append(interaction)
+
+    def record(self, interaction: Dict[str, Any]):
+        """
+        录制一次交互，累积一定数量后追加写入文件。
+
+        Args:
+            interaction: 交互记录
+        """
+        with self._lock:
+            self._pending.append(interaction)
+            if len(self._pending) < self.FLUSH_EVERY:
+                return
+        self.flush()
+
+    def match(self, method: str, url: str, body: Any, scope: str = '') -> Dict[str, Any] | None:
+        """
+        查找与请求匹配的交互。同一账号的同一请求录制了多次时按录制顺序依次返回，用完后重复最后一次。
+
+        Returns:
+            Dict[str, Any]: 交互记录，没有匹配时返回None
+        """
+        with self._lock:
+            queue = self._queues.get(self.request_key(method, url, body, scope))
+            if not queue:
+                return None
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def flush(self):
+        """
+        把尚未写入的交互追加到录像文件（作为一个新的gzip成员，读取时与之前的内容连续）。
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(item, ensure_ascii=False, separators=(',', ':')) + '\n' for item in pending))
+
+
+class _SessionScopedAdapter:
+    """
+    录制和回放适配器的公共部分：每个会话使用各自的适配器视图（for_session），
+    视图从登录请求中记下账号化名，此后该会话的请求都按这个账号录制和匹配。
+    连接池和录像归原适配器所有，关闭视图（会话关闭时）不会关闭共享的连接池。
+    """
+
+    cassette: Cassette
+    scope = ''
+    is_view = False
+    # 录制时该会话出现过的账号和学生姓名 -> 化名，用于替换响应体中的个人信息
+    identities: Dict[str, str]
+
+    def for_session(self):
+        """
+        为一个会话创建适配器视图，与原适配器共享录像（录制时还共享连接池）。
+
+        Returns:
+            适配器视图
+        """
+        # 不使用copy.copy：HTTPAdapter的__getstate__/__setstate__会丢弃录像并新建连接池
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view.scope = ''
+        view.is_view = True
+        view.identities = {}
+        return view
+
+    def _scope_for(self, request) -> str:
+        scope = self.cassette.request_scope(request.body)
+        if scope is not None:
+            self.scope = scope
+            for key, value in _form_pairs(request.body):
+                if key == 'username':
+                    self.identities[value] = scope
+        return self.scope
+
+
+def _identity_variants(value: str, alias: str, encodings: List[str]):
+    """
+    生成个人信息在响应体中可能出现的字节形式及对应的化名：原文、JSON转义和URL编码，按响应的编码和UTF-8编码。
+    """
+    forms = {(value, alias), (json.dumps(value)[1:-1], alias), (quote(value), alias)}
+    for encoding in encodings:
+        for raw, replacement in forms:
+            try:
+                yield raw.encode(encoding), replacement.encode(encoding)
+            except (UnicodeEncodeError, LookupError):
+                continue
+
+
+class RecordingAdapter(_SessionScopedAdapter, HTTPAdapter):
+    """
+    录制模式的传输适配器：正常发送请求，同时把去除凭据和Cookie后的交互写入录像。
+    响应体中该会话的学号和学生姓名替换为化名后再保存。
+    """
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        """
+        初始化录制适配器。
+
+        Args:
+            cassette: 录像
+            **kwargs: 传递给HTTPAdapter的参数
+        """
+        super().__init__(**kwargs)
+        self.cassette = cassette
+        self.identities = {}
+
+    def send(self, request, **kwargs):
+        start = time.monotonic()
+        response = super().send(request, **kwargs)
+        content = response.content  # 读取完整响应体，延迟包含传输时间
+        elapsed = time.monotonic() - start
+
+        headers = {key: value for key, value in response.headers.items() if key.lower() not in DROP_HEADERS}
+        if 'Location' in headers:
+            headers['Location'] = self.cassette.scrub_url(headers['Location'])
+        method, url, body, scope = self.cassette.request_key(request.method, request.url, request.body, self._scope_for(request))
+        content = self._scrub_content(content, response.headers.get('Content-Type', ''))
+        self.cassette.record({
+            'method': method,
+            'url': url,
+            'body': body,
+            'scope': scope,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': headers,
+            'content': base64.b64encode(content).decode('ascii'),
+            'elapsed': round(elapsed, 4),
+        })
+        return response
+
+    def _scrub_content(self, content: bytes, content_type: str) -> bytes:
+        """
+        把响应体中该会话的学号和学生姓名替换为化名。学生姓名从页面中的姓名栏识别。
+
+        Args:
+            content: 响应体
+            content_type: 响应头Content-Type
+
+        Returns:
+            bytes: 处理后的响应体
+        """
+        declared = get_encoding_from_headers({'content-type': content_type}) if 'charset' in content_type.lower() else None
+        encoding = html_parser.sniff_encoding(content, declared)
+        if b'class="name"' in content:
+            try:
+                name = html_parser.parse_student_name(content, encoding)
+            except Exception:
+                name = None
+            if name and name not in self.identities:
+                self.identities[name] = self.cassette.pseudonym('name', name)
+        encodings = list(dict.fromkeys([encoding, 'utf-8']))
+        # 先替换较长的值，避免姓名或学号是另一个值的一部分时只替换了一半
+        for value, alias in sorted(self.identities.items(), key=lambda item: -len(item[0])):
+            for raw, replacement in _identity_variants(value, alias, encodings):
+                content = content.replace(raw, replacement)
+        return content
+
+    def close(self):
+        # 视图与其他会话共享连接池，只有原适配器关闭连接池并写出尚未保存的交互
+        if self.is_view:
+            return
+        super().close()
+        self.cassette.flush()
+
+
+class ReplayAdapter(_SessionScopedAdapter, BaseAdapter):
+    """
+    回放模式的传输适配器：不访问网络，直接返回录像中匹配的响应。
+    可以按录制时的延迟回放，也可以零延迟回放。
+    """
+
+    def __init__(self, cassette: Cassette, replay_latency: bool = False, speed: float = 1.0):
+        """
+        初始化回放适配器。
+
+        Args:
+            cassette: 录像
+            replay_latency: 是否按录制时的延迟回放
+            speed: 回放延迟的倍速（2.0表示延迟减半）
+        """
+        super().__init__()
+        self.cassette = cassette
+        self.replay_latency = replay_latency
+        self.speed = speed
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        interaction = self.cassette.match(request.method, request.url, request.body, self._scope_for(request))
+        if interaction is None:
+            raise requests.ConnectionError(
+                f"录像中没有匹配的请求: {request.method} {self.cassette.scrub_url(request.url)}", request=request)
+        if self.replay_latency:
+            time.sleep(interaction['elapsed'] / self.speed)
+
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.reason = interaction['reason']
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = base64.b64decode(interaction['content'])
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def mount_cassette(session: requests.Session, path: str, mode: str = 'replay', replay_latency: bool = False) -> BaseAdapter:
+    """
+    在会话上挂载录制或回放适配器，例如 mount_cassette(client.session, 'traffic.jsonl.gz', 'record')。
+    录制的内容分批写入文件，会话关闭（session.close()）时写出剩余部分。
+    适配器只挂载在这一个会话上，多个会话共享录像时使用make_adapter。
+
+    Args:
+        session: requests会话（ApiClient.session）
+        path: 录像文件路径
+        mode: 'record' 或 'replay'
+        replay_latency: 回放时是否按录制时的延迟
+
+    Returns:
+        BaseAdapter: 挂载的适配器
+    """
+    adapter = make_adapter(path, mode, replay_latency)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return adapter
+
+
+def make_adapter(path: str, mode: str = 'replay', replay_latency: bool = False,
+                 pool_maxsize: int = config.DETAIL_CONCURRENCY_MAX) -> BaseAdapter:
+    """
+    创建录制或回放适配器，多个会话可以共享同一份录像，挂载时每个会话使用 adapter.for_session() 得到的视图。
+    所有会话结束后由调用方关闭返回的适配器，关闭连接池并写出剩余的录制内容。
+
+    Args:
+        path: 录像文件路径
+        mode: 'record' 或 'replay'
+        replay_latency: 回放时是否按录制时的延迟
+        pool_maxsize: 录制时每个主机的连接池大小（所有会话共享同一个连接池），应不小于并发请求数
+
+    Returns:
+        BaseAdapter: 适配器
+    """
+    if mode == 'record':
+        return RecordingAdapter(Cassette(path, fresh=True, salt=load_salt(path, create=True)), pool_maxsize=pool_maxsize)
+    if mode == 'replay':
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"录像文件不存在: {path}")
+        return ReplayAdapter(Cassette(path, salt=load_salt(path)), replay_latency)
+    raise ValueError(f"未知的录像模式: {mode}")
@@ -1,12 +1,19 @@
 # network_client.py
 
+import codecs
+import json
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
 from colorama import Fore
 from colorama import Style
 import requests
+from requests.adapters import HTTPAdapter
 import src.config as config
 import src.html_parser as html_parser
-from typing import Tuple, Dict, Any
-from urllib.parse import urlparse, parse_qs
+from src.cancellation import CancellationToken, OperationCancelled, check_cancelled
+from src.rate_limit import wait_for_budget
+from typing import Tuple, Dict, Any, Iterator
+from urllib.parse import urlparse
 
 class ApiClient:
     """
@@ -14,38 +21,173 @@ class ApiClient:
     负责登录、获取活动列表和活动详情等功能。
     """
 
-    def __init__(self):
+    def __init__(self, parse_pool=None, transport=None):
         """
         初始化ApiClient实例。
         设置会话、请求头，并初始化登录状态。
+
+        Args:
+            parse_pool: 可选的ParsePool实例，设置后响应解析在进程池中进行（批量运行使用）
+            transport: 可选的传输适配器（例如http_cassette中的录制/回放适配器），挂载到会话上
         """
         self.session = requests.Session()
         self.session.headers.update(config.BASE_HEADERS)
+        if transport is None:
+            # 详情请求最多有DETAIL_CONCURRENCY_MAX个并发，默认连接池（每个主机10个连接）
+            # 容纳不下的连接用完即被丢弃，自适应限制器测到的会是反复建立连接的开销
+            transport = HTTPAdapter(pool_maxsize=config.DETAIL_CONCURRENCY_MAX)
+        elif hasattr(transport, 'for_session'):
+            # 录制/回放适配器为每个会话创建视图，回放时每个账号只匹配自己的交互
+            transport = transport.for_session()
+        self.session.mount('https://', transport)
+        self.session.mount('http://', transport)
         self.logged_in = False
         self.student_name = None  # 保存学生姓名
+        self.username = None  # 保存登录成功的学号
+        # 登录跳转链最终落在"我的页面"时缓存其HTML，供get_activity_list直接复用
+        self._prefetched_list_html = None
+        self.parse_pool = parse_pool
+        # 限速排队使用的账号标识
+        self._account_key = None
 
-    def login(self, username: str, password: str) -> Tuple[bool, str]:
+    @staticmethod
+    def _declared_encoding(resp: requests.Response) -> str | None:
+        """
+        获取响应头Content-Type中声明的字符集。
+        没有声明时返回None，由解析函数按页面<meta>或SITE_ENCODING解码，
+        不使用requests对text/*的ISO-8859-1默认值，也不触发resp.text的整页编码检测。
+
+        Args:
+            resp: 响应对象
+
+        Returns:
+            str: 声明的字符集，没有声明时返回None
+        """
+        if 'charset' not in resp.headers.get('Content-Type', '').lower():
+            return None
+        return requests.utils.get_encoding_from_headers(resp.headers)
+
+    def _parse(self, parser, resp: requests.Response):
+        """
+        解析响应内容：解析函数直接接收原始字节和声明的字符集，只解码一次。
+        配置了解析进程池时把原始字节交给进程池，否则在当前线程中解析。
+
+        Args:
+            parser: html_parser中的模块级解析函数
+            resp: 已读取完响应体的响应对象
+
+        Returns:
+            Any: 解析函数的返回值
+        """
+        encoding = self._declared_encoding(resp)
+        if self.parse_pool is not None:
+            return self.parse_pool.parse(parser, resp.content, encoding)
+        return parser(resp.content, encoding)
+
+    def _request(self, method: str, url: str, cancel_token: CancellationToken | None = None,
+                 budget: str | None = None, stream: bool = False, **kwargs) -> requests.Response:
+        """
+        发送请求并在取消检查点之间读取响应体。
+        请求前后都会检查取消令牌；读取响应体期间取消会关闭连接以中止传输。
+
+        Args:
+            method: HTTP方法
+            url: 请求URL
+            cancel_token: 可选的取消令牌
+            budget: 可选的限速预算类型（'login' 或 'detail'），请求前从进程内共享的令牌桶取得令牌
+            stream: 为True时收到响应头后立即返回，调用方通过_iter_body分块读取响应体
+            **kwargs: 传递给requests的其他参数
+
+        Returns:
+            requests.Response: 响应对象（stream为False时已读取完响应体）
+
+        Raises:
+            OperationCancelled: 请求被取消时抛出
+        """
+        check_cancelled(cancel_token)
+        if budget is not None:
+            # 按账号公平排队，登录前使用正在登录的学号
+            wait_for_budget(url, budget, self._account_key or id(self), cancel_token)
+        kwargs.setdefault('timeout', config.REQUEST_TIMEOUT)
+        if cancel_token is None and not stream:
+            return self.session.request(method, url, **kwargs)
+
+        resp = self.session.request(method, url, stream=True, **kwargs)
+        if stream:
+            if cancel_token is not None and cancel_token.cancelled:
+                resp.close()
+                raise OperationCancelled("请求已取消。")
+            return resp
+        with self._cancellable_read(resp, cancel_token):
+            resp.content  # 读取响应体，取消时连接被关闭而中断
+        return resp
+
+    @staticmethod
+    @contextmanager
+    def _cancellable_read(resp: requests.Response, cancel_token: CancellationToken | None):
+        """
+        读取响应体期间取消时关闭连接，并把由此中断读取产生的异常转换为OperationCancelled。
+
+        Args:
+            resp: 以stream=True发送的请求的响应
+            cancel_token: 可选的取消令牌
+        """
+        try:
+            with cancel_token.on_cancel(resp.close) if cancel_token is not None else nullcontext():
+                yield
+            # 关闭连接可能让读取提前正常结束而不抛异常，此时内容已不完整
+            check_cancelled(cancel_token)
+        except OperationCancelled:
+            raise
+        except Exception:
+            if cancel_token is not None and cancel_token.cancelled:
+                raise OperationCancelled("请求已取消。")
+            raise
+
+    def _iter_body(self, resp: requests.Response, cancel_token: CancellationToken | None, chunk_size: int) -> Iterator[bytes]:
+        """
+        分块读取以stream=True发送的请求的响应体，每块之间检查取消令牌，读取结束后关闭响应。
+
+        Args:
+            resp: _request(stream=True)返回的响应
+            cancel_token: 可选的取消令牌
+            chunk_size: 每块的字节数
+
+        Yields:
+            bytes: 响应体的一块
+        """
+        with resp, self._cancellable_read(resp, cancel_token):
+            for chunk in resp.iter_content(chunk_size):
+                check_cancelled(cancel_token)
+                yield chunk
+
+    def login(self, username: str, password: str, cancel_token: CancellationToken | None = None) -> Tuple[bool, str]:
         """
         用户登录函数。
 
         Args:
             username: 用户名（学号）
             password: 密码
+            cancel_token: 可选的取消令牌
 
         Returns:
             Tuple[bool, str]: (登录是否成功, 消息)
         """
         print(f"{Fore.YELLOW}{Style.BRIGHT}正在登录: {username}")
+        self._account_key = username
         try:
             # 获取登录页面以获取execution令牌
-            login_page_resp = self.session.get(
+            login_page_resp = self._request(
+                'GET',
                 config.LOGIN_URL,
+                cancel_token,
+                budget='login',
                 params={'service': config.SERVICE_URL}
             )
             login_page_resp.raise_for_status()
 
             # 从HTML中解析execution令牌
-            execution = html_parser.parse_execution(login_page_resp.text)
+            execution = self._parse(html_parser.parse_execution, login_page_resp)
             if not execution:
                 return False, "未找到登录令牌(execution)。"
 
@@ -59,8 +201,11 @@ class ApiClient:
                 '_eventId': 'submit'
             }
 
-            login_resp = self.session.post(
+            login_resp = self._request(
+                'POST',
                 config.LOGIN_URL,
+                cancel_token,
+                budget='login',
                 params={'service': config.SERVICE_URL},
                 data=payload,
                 allow_redirects=False
@@ -68,8 +213,13 @@ class ApiClient:
 
             if login_resp.status_code == 302 and 'Location' in login_resp.headers:
                 ticket_url = login_resp.headers['Location']
-                self.session.get(ticket_url)
+                ticket_resp = self._request('GET', ticket_url, cancel_token)
                 self.logged_in = True
+                self.username = username
+                self._prefetched_list_html = None
+                if ticket_resp.ok:
+                    # 跳转链已落在"我的页面"时保留响应内容以省去一次请求
+                    self._prefetched_list_html = self._activity_list_html(ticket_resp)
                 return True, "Login successful"
             else:
                 return False, "Login failed. Check credentials."
@@ -77,9 +227,31 @@ class ApiClient:
         except requests.RequestException as e:
             return False, f"Network error during login: {e}"
 
-    def get_activity_list(self) -> str:
+    def _activity_list_html(self, resp: requests.Response) -> str | None:
+        """
+        判断响应是否为活动列表页面（"我的页面"），是则返回解码后的页面内容。
+
+        Args:
+            resp: 登录票据跳转后的最终响应
+
+        Returns:
+            str: 响应能直接作为活动列表页面使用时返回页面HTML，否则返回None
+        """
+        list_path = urlparse(config.ACTIVITY_LIST_URL).path.rstrip('/')
+        final_path = urlparse(resp.url).path.rstrip('/')
+        if final_path != list_path:
+            return None
+        html_content = html_parser.decode_html(resp.content, self._declared_encoding(resp))
+        return html_content if html_parser.is_activity_list_page(html_content) else None
+
+    def get_activity_list(self, use_prefetched: bool = True, cancel_token: CancellationToken | None = None) -> str:
         """
         获取活动列表页面HTML。
+        如果登录时的跳转响应已经是活动列表页面，则直接复用该响应内容。
+
+        Args:
+            use_prefetched: 是否复用登录跳转时缓存的页面内容
+            cancel_token: 可选的取消令牌
 
         Returns:
             str: 活动列表页面HTML内容
@@ -91,11 +263,18 @@ class ApiClient:
             raise Exception("用户未登录。")
 
         try:
-            # 访问活动列表页面
-            resp = self.session.get(config.ACTIVITY_LIST_URL)
-            resp.raise_for_status()
+            html_content = self._prefetched_list_html if use_prefetched else None
+            # 缓存只使用一次，之后的刷新仍然请求最新页面
+            self._prefetched_list_html = None
+
+            if html_content is not None:
+                print(f"{Fore.YELLOW}{Style.BRIGHT}复用登录跳转响应作为活动列表页面")
+            else:
+                # 访问活动列表页面
+                resp = self._request('GET', config.ACTIVITY_LIST_URL, cancel_token)
+                resp.raise_for_status()
+                html_content = html_parser.decode_html(resp.content, self._declared_encoding(resp))
 
-            html_content = resp.text
             name = html_parser.parse_student_name(html_content)
             if name:
                 self.student_name = name
@@ -105,6 +284,110 @@ class ApiClient:
         except requests.RequestException as e:
             raise Exception(f"获取活动列表失败: {e}")
 
+    def get_activities(self, cancel_token: CancellationToken | None = None) -> list[dict]:
+        """
+        获取并解析已报名的活动列表，同时更新学生姓名。
+
+        Args:
+            cancel_token: 可选的取消令牌
+
+        Returns:
+            list[dict]: 活动列表，每项包含name和url
+
+        Raises:
+            Exception: 当用户未登录或请求失败时抛出
+        """
+        if self.parse_pool is None or self._prefetched_list_html is not None:
+            return html_parser.parse_activity_list(self.get_activity_list(cancel_token=cancel_token))
+
+        if not self.logged_in:
+            raise Exception("用户未登录。")
+        try:
+            resp = self._request('GET', config.ACTIVITY_LIST_URL, cancel_token)
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            raise Exception(f"获取活动列表失败: {e}")
+
+        name, activities = self._parse(html_parser.parse_list_page, resp)
+        if name:
+            self.student_name = name
+            print(f"{Fore.YELLOW}{Style.BRIGHT}登录学生: {self.student_name}")
+        return activities
+
+    def iter_activities(self, cancel_token: CancellationToken | None = None) -> Iterator[dict]:
+        """
+        流式获取已报名的活动列表：边下载边解析，每解析出一个活动立即产出，
+        调用方可以在页面其余部分仍在下载时开始请求详情。学生姓名在解析到时更新。
+
+        Args:
+            cancel_token: 可选的取消令牌，每读取一块内容检查一次
+
+        Yields:
+            dict: 活动，包含name和url
+
+        Raises:
+            Exception: 当用户未登录或请求失败时抛出
+            OperationCancelled: 下载被取消时抛出
+        """
+        if not self.logged_in:
+            raise Exception("用户未登录。")
+
+        parser = html_parser.ActivityListStreamParser()
+        html_content, self._prefetched_list_html = self._prefetched_list_html, None
+        if html_content is not None:
+            print(f"{Fore.YELLOW}{Style.BRIGHT}复用登录跳转响应作为活动列表页面")
+            yield from self._push_list_chunk(parser, html_content)
+        else:
+            try:
+                resp = self._request('GET', config.ACTIVITY_LIST_URL, cancel_token, stream=True)
+                if not resp.ok:
+                    resp.close()
+                resp.raise_for_status()
+            except requests.RequestException as e:
+                raise Exception(f"获取活动列表失败: {e}")
+
+            declared = self._declared_encoding(resp)
+            decoder = None
+            try:
+                for chunk in self._iter_body(resp, cancel_token, config.LIST_STREAM_CHUNK_SIZE):
+                    if decoder is None:
+                        # 编码由响应头或第一块内容中的<meta>确定
+                        decoder = codecs.getincrementaldecoder(html_parser.sniff_encoding(chunk, declared))(errors='replace')
+                    yield from self._push_list_chunk(parser, decoder.decode(chunk))
+            except requests.RequestException as e:
+                raise Exception(f"获取活动列表失败: {e}")
+            if decoder is not None:
+                yield from self._push_list_chunk(parser, decoder.decode(b'', final=True))
+
+        yield from parser.finish()
+        self._update_student_name(parser)
+
+    def _push_list_chunk(self, parser: html_parser.ActivityListStreamParser, text: str) -> list[dict]:
+        """
+        把一块活动列表页面内容送入增量解析器。
+
+        Args:
+            parser: 增量解析器
+            text: 页面内容片段
+
+        Returns:
+            list[dict]: 这一块内容中完成的活动
+        """
+        activities = parser.push(text)
+        self._update_student_name(parser)
+        return activities
+
+    def _update_student_name(self, parser: html_parser.ActivityListStreamParser):
+        """
+        增量解析器解析出学生姓名后更新一次。
+
+        Args:
+            parser: 增量解析器
+        """
+        if parser.student_name and parser.student_name != self.student_name:
+            self.student_name = parser.student_name
+            print(f"{Fore.YELLOW}{Style.BRIGHT}登录学生: {self.student_name}")
+
     def get_student_name(self) -> str | None:
         """
         获取学生姓名。
@@ -114,15 +397,26 @@ class ApiClient:
         """
         return self.student_name
 
-    def get_activity_detail(self, detail_url: str) -> Dict[str, Any]:
+    def get_username(self) -> str | None:
         """
-        获取单个活动的详细信息。
+        获取登录成功的学号。
+
+        Returns:
+            str: 学号，如果未登录则返回None
+        """
+        return self.username
+
+    def _post_detail(self, detail_url: str, cancel_token: CancellationToken | None = None, budget: bool = True) -> requests.Response:
+        """
+        请求活动详情API。
 
         Args:
             detail_url: 活动详情页面的URL
+            cancel_token: 可选的取消令牌
+            budget: 是否在请求前取得限速令牌
 
         Returns:
-            Dict[str, Any]: 包含活动详情的字典
+            requests.Response: 详情API的响应
 
         Raises:
             Exception: 当用户未登录或请求失败时抛出
@@ -132,36 +426,134 @@ class ApiClient:
 
         try:
             # 从detail_url中提取id和actid参数
-            parsed_url = urlparse(detail_url)
-            query_params = parse_qs(parsed_url.query)
-
             # API需要'id'（即enterMember ID）和'actid'
+            enroll_id, actid = html_parser.parse_activity_ids(detail_url)
             payload = {
-                'id': query_params.get('id', [''])[0],
-                'actid': query_params.get('actid', [''])[0]
+                'id': enroll_id,
+                'actid': actid
             }
 
             if not payload['id'] or not payload['actid']:
                 raise ValueError(f"无法从URL中提取'id'和'actid': {detail_url}")
 
             # 访问详情API
-            resp = self.session.post(
+            resp = self._request(
+                'POST',
                 config.ACTIVITY_DETAIL_API,
+                cancel_token,
+                budget='detail' if budget else None,
                 data=payload,
                 headers={'Content-Type': 'application/x-www-form-urlencoded'}
             )
             resp.raise_for_status()
-
-            json_response = resp.json()
-
-            # 状态码'1'表示成功
-            if json_response.get('status') == '1':
-                return json_response.get('data', {}) # 返回'data'部分供解析器使用
-            else:
-                raise Exception(f"API返回错误状态: {json_response.get('message', '未知错误')}")
+            return resp
 
         except requests.RequestException as e:
             # 这里捕获'Failed to fetch activity detail via API: 404 Client Error: Not Found'错误
             raise Exception(f"通过API获取活动详情失败: {e}")
-        except Exception as e:
-            raise e
+
+    def get_activity_detail(self, detail_url: str, cancel_token: CancellationToken | None = None) -> Dict[str, Any]:
+        """
+        获取单个活动的详细信息。
+
+        Args:
+            detail_url: 活动详情页面的URL
+            cancel_token: 可选的取消令牌
+
+        Returns:
+            Dict[str, Any]: 包含活动详情的字典
+
+        Raises:
+            Exception: 当用户未登录或请求失败时抛出
+        """
+        resp = self._post_detail(detail_url, cancel_token)
+        json_response = json.loads(resp.content)
+
+        # 状态码'1'表示成功
+        if json_response.get('status') == '1':
+            return json_response.get('data', {}) # 返回'data'部分供解析器使用
+        else:
+            raise Exception(f"API返回错误状态: {json_response.get('message', '未知错误')}")
+
+    def wait_for_detail_budget(self, cancel_token: CancellationToken | None = None):
+        """
+        从详情API的共享预算中取得一个令牌。
+        在自适应限制器的并发名额之外调用，排队等待限速的时间不会被当作服务器延迟；
+        之后以budget=False调用get_activity_detail_content。
+
+        Args:
+            cancel_token: 可选的取消令牌
+        """
+        wait_for_budget(config.ACTIVITY_DETAIL_API, 'detail', self._account_key or id(self), cancel_token)
+
+    def get_activity_detail_content(self, detail_url: str, cancel_token: CancellationToken | None = None,
+                                    budget: bool = True) -> Tuple[bytes, str | None]:
+        """
+        获取单个活动详情API的原始响应内容，不做解析。
+        用于批量流水线中把网络请求和解析拆分到不同阶段。
+
+        Args:
+            detail_url: 活动详情页面的URL
+            cancel_token: 可选的取消令牌
+            budget: 是否在请求前取得限速令牌，已通过wait_for_detail_budget取得时为False
+
+        Returns:
+            Tuple[bytes, str | None]: (响应字节, 响应头声明的字符集)
+
+        Raises:
+            Exception: 当用户未登录或请求失败时抛出
+        """
+        resp = self._post_detail(detail_url, cancel_token, budget)
+        return resp.content, self._declared_encoding(resp)
+
+    def get_parsed_activity_detail(self, detail_url: str, cancel_token: CancellationToken | None = None) -> Dict[str, Any]:
+        """
+        获取并解析单个活动的详细信息。
+
+        Args:
+            detail_url: 活动详情页面的URL
+            cancel_token: 可选的取消令牌
+
+        Returns:
+            Dict[str, Any]: parse_activity_detail的解析结果
+
+        Raises:
+            Exception: 当用户未登录、请求失败或API返回错误状态时抛出
+        """
+        resp = self._post_detail(detail_url, cancel_token)
+        return self.parse_detail_content(resp.content, self._declared_encoding(resp))
+
+    def parse_detail_content(self, content: bytes, encoding: str | None = None, activity_info: bool = True) -> Dict[str, Any]:
+        """
+        解析详情API的原始响应内容，配置了解析进程池时在进程池中解析。
+
+        Args:
+            content: 响应字节
+            encoding: 响应头声明的字符集
+            activity_info: 为False时只解析签到签退状态（活动信息已在共享表中时使用）
+
+        Returns:
+            Dict[str, Any]: parse_activity_detail（或parse_enrollment_status）的解析结果
+
+        Raises:
+            Exception: API返回错误状态时抛出
+        """
+        parser = html_parser.parse_detail_response if activity_info else html_parser.parse_enrollment_response
+        if self.parse_pool is not None:
+            return self.parse_pool.parse(parser, content, encoding)
+        return parser(content, encoding)
+
+    def submit_detail_content(self, content: bytes, encoding: str | None = None, activity_info: bool = True) -> Future:
+        """
+        把详情API的原始响应内容提交到解析进程池，不等待解析结果（需要配置解析进程池）。
+
+        Args:
+            content: 响应字节
+            encoding: 响应头声明的字符集
+            activity_info: 为False时只解析签到签退状态
+
+        Returns:
+            Future: 结果同parse_detail_content
+        """
+        parser = html_parser.parse_detail_response if activity_info else html_parser.parse_enrollment_response
+        return self.parse_pool.submit(parser, content, encoding)
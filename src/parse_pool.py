@@ -0,0 +1,91 @@
+# parse_pool.py
+
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable
+
+
+def decode_and_parse(parser: Callable[[bytes, str | None], Any], raw_content: bytes, encoding: str | None = None) -> Any:
+    """
+    在工作进程中解析原始响应。
+    parser必须是模块级函数（例如html_parser中的函数），以便按名称传给子进程；
+    解析函数直接接收原始字节和响应头声明的编码，自行完成（唯一一次）解码。
+
+    Args:
+        parser: 解析函数，接收(原始字节, 编码)
+        raw_content: 原始响应字节
+        encoding: 响应头声明的字符集，没有声明时为None
+
+    Returns:
+        Any: 解析函数的返回值（必须可序列化）
+    """
+    return parser(raw_content, encoding)
+
+
+class ParsePool:
+    """
+    批量运行使用的解析进程池。
+    HTML/JSON解析是CPU密集的纯函数，在多线程中受GIL限制；
+    网络线程把原始响应字节提交到进程池后立即返回（submit），由其他线程取回解析后的小型字典。
+    同时在途的解析任务数量有上限，队列满时提交方阻塞等待，形成背压。
+    """
+
+    def __init__(self, processes: int, max_pending: int = 64):
+        """
+        初始化解析进程池。
+
+        Args:
+            processes: 解析进程数
+            max_pending: 同时在途（排队或执行中）的解析任务上限
+        """
+        self._executor = ProcessPoolExecutor(max_workers=processes)
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, parser: Callable[[bytes, str | None], Any], raw_content: bytes, encoding: str | None = None) -> Future:
+        """
+        把原始响应提交到进程池解析，不等待结果，可在任意线程中调用。
+        在途任务达到上限时阻塞，直到有任务完成。
+
+        Args:
+            parser: 模块级解析函数
+            raw_content: 原始响应字节
+            encoding: 响应头声明的字符集
+
+        Returns:
+            Future: 解析结果，result()会原样重新抛出解析函数的异常
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(decode_and_parse, parser, raw_content, encoding)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def parse(self, parser: Callable[[bytes, str | None], Any], raw_content: bytes, encoding: str | None = None) -> Any:
+        """
+        在进程池中解析原始响应并等待结果。
+        只用于下一个请求依赖解析结果的场合（登录页、活动列表）。
+
+        Args:
+            parser: 模块级解析函数
+            raw_content: 原始响应字节
+            encoding: 响应头声明的字符集
+
+        Returns:
+            Any: 解析结果，解析函数抛出的异常会原样重新抛出
+        """
+        return self.submit(parser, raw_content, encoding).result()
+
+    def close(self):
+        """
+        关闭进程池并等待工作进程退出。
+        """
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
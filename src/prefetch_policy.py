@@ -0,0 +1,189 @@
+# prefetch_policy.py
+
+import time
+from typing import Any, Dict, List, Mapping, NamedTuple, Tuple
+
+import src.config as config
+
+
+class PrefetchCandidate(NamedTuple):
+    """
+    可以预加载详情的活动：列表中的位置、活动（name和url）和上次结果中的缓存记录（没有时为None）。
+    """
+    position: int
+    activity: Dict[str, Any]
+    cached: Mapping[str, Any] | None
+
+
+class PrefetchSelection:
+    """
+    边获取列表边选择预加载的活动：能够确定一定会被选中的候选活动立即开始请求，
+    列表结束后再由策略从其余候选中补足名额。最终选中的活动与一次性调用select相同。
+    """
+
+    def __init__(self, policy, limit: int):
+        """
+        初始化流式选择。
+
+        Args:
+            policy: 预加载策略
+            limit: 预加载名额
+        """
+        self.policy = policy
+        self.limit = max(limit, 0)
+        self.candidates: List[PrefetchCandidate] = []
+        self.selected: List[PrefetchCandidate] = []
+        self._waiting: List[PrefetchCandidate] = []
+
+    def offer(self, candidate: PrefetchCandidate) -> bool:
+        """
+        按页面顺序提交一个候选活动。
+
+        Args:
+            candidate: 候选活动
+
+        Returns:
+            bool: 该活动一定会被选中时返回True，可以立即请求详情
+        """
+        self.candidates.append(candidate)
+        if len(self.selected) < self.limit and self.policy.leads(candidate):
+            self.selected.append(candidate)
+            return True
+        self._waiting.append(candidate)
+        return False
+
+    def finish(self) -> List[PrefetchCandidate]:
+        """
+        列表结束后从其余候选中选出剩余名额的活动。
+
+        Returns:
+            List[PrefetchCandidate]: 新选中的活动，按请求的先后顺序排列
+        """
+        chosen = self.policy.select(self._waiting, self.limit - len(self.selected))
+        self.selected.extend(chosen)
+        return chosen
+
+    def unselected(self) -> List[PrefetchCandidate]:
+        """
+        获取未被选中的候选活动（在finish之后调用）。
+
+        Returns:
+            List[PrefetchCandidate]: 未选中的活动，按页面顺序排列
+        """
+        selected_positions = {candidate.position for candidate in self.selected}
+        return [candidate for candidate in self.candidates if candidate.position not in selected_positions]
+
+
+class PagePrefetchPolicy:
+    """
+    按页面顺序预加载前N个活动（原有行为）。
+    """
+
+    def leads(self, candidate: PrefetchCandidate) -> bool:
+        """
+        判断候选活动是否排在所有其他类别的活动之前（同类之间按页面顺序）。
+        流式选择时，名额未用完之前出现的此类活动可以立即开始请求。
+
+        Args:
+            candidate: 候选活动
+
+        Returns:
+            bool: 按页面顺序即可确定优先级时返回True
+        """
+        return True
+
+    def stream(self, limit: int) -> PrefetchSelection:
+        """
+        开始一次流式选择。
+
+        Args:
+            limit: 预加载名额
+
+        Returns:
+            PrefetchSelection: 流式选择
+        """
+        return PrefetchSelection(self, limit)
+
+    def select(self, candidates: List[PrefetchCandidate], limit: int) -> List[PrefetchCandidate]:
+        """
+        选出需要预加载详情的活动。
+
+        Args:
+            candidates: 候选活动（按页面顺序）
+            limit: 预加载名额
+
+        Returns:
+            List[PrefetchCandidate]: 选中的活动，按请求的先后顺序排列
+        """
+        return candidates[:max(limit, 0)]
+
+
+class ValuePrefetchPolicy(PagePrefetchPolicy):
+    """
+    按价值预加载：只使用不需要额外请求的信息给候选活动排序。
+    1. 从未加载过详情的活动（新报名或上次获取失败）最优先，按页面位置排序
+    2. 其次是签到或签退未完成的活动，活动时间（来自上次结果）离现在越近越优先，
+       正在进行或即将开始的活动状态最可能变化，很久以前的活动排在最后
+    """
+
+    def __init__(self, now: float | None = None):
+        """
+        初始化策略。
+
+        Args:
+            now: 可选的当前时间戳（秒），默认使用调用时的时间
+        """
+        self.now = now
+
+    @staticmethod
+    def _is_loaded(cached: Mapping[str, Any] | None) -> bool:
+        return cached is not None and bool(cached.get('is_loaded')) and 'error' not in cached
+
+    def leads(self, candidate: PrefetchCandidate) -> bool:
+        return not self._is_loaded(candidate.cached)
+
+    def rank(self, candidate: PrefetchCandidate, now: float) -> Tuple:
+        """
+        计算候选活动的排序键，值越小越优先。
+
+        Args:
+            candidate: 候选活动
+            now: 当前时间戳（秒）
+
+        Returns:
+            Tuple: 排序键
+        """
+        if not self._is_loaded(candidate.cached):
+            return 0, 0, candidate.position
+        timestamp = candidate.cached.get('acttime_timestamp') or 0
+        distance = abs(timestamp - now) if timestamp else float('inf')
+        return 1, distance, candidate.position
+
+    def select(self, candidates: List[PrefetchCandidate], limit: int) -> List[PrefetchCandidate]:
+        now = self.now if self.now is not None else time.time()
+        ranked = sorted(candidates, key=lambda candidate: self.rank(candidate, now))
+        return ranked[:max(limit, 0)]
+
+
+# 可选的预加载策略
+PREFETCH_POLICIES = {
+    'page': PagePrefetchPolicy,
+    'value': ValuePrefetchPolicy,
+}
+
+
+def make_policy(name: str | None = None):
+    """
+    按名称创建预加载策略。
+
+    Args:
+        name: 策略名称（'page' 或 'value'），默认使用配置中的PREFETCH_POLICY
+
+    Returns:
+        预加载策略实例，提供 select(candidates, limit) 和 stream(limit) 方法
+    """
+    name = name or config.PREFETCH_POLICY
+    try:
+        return PREFETCH_POLICIES[name]()
+    except KeyError:
+        raise ValueError(f"未知的预加载策略: {name}") from None
@@ -0,0 +1,388 @@
+# profiling.py
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from colorama import Fore, Style
+
+import src.config as config
+
+# 参与耗时归属的阶段（模块名）
+PROFILE_STAGES = ('network_client', 'html_parser', 'activity_fetcher', 'ui_manager')
+# 不在上述阶段中的时间归入该项
+OTHER_STAGE = '其他'
+# Python 3.12起cProfile基于sys.monitoring，同一进程只能启用一个分析器，但它会覆盖所有线程
+PER_THREAD_CPROFILE = sys.version_info < (3, 12)
+
+
+def _stage_of(filename: str, cache: Dict[str, str | None]) -> str | None:
+    """
+    判断源文件属于哪个阶段。
+
+    Args:
+        filename: 源文件路径
+        cache: 文件名到阶段的缓存
+
+    Returns:
+        str: 阶段名，不属于任何阶段时返回None
+    """
+    stage = cache.get(filename, '')
+    if stage == '':
+        module = os.path.splitext(os.path.basename(filename))[0]
+        stage = cache[filename] = module if module in PROFILE_STAGES else None
+    return stage
+
+
+def _thread_cpu_time(ident: int) -> float | None:
+    """
+    读取指定线程已使用的CPU时间（秒），平台不支持时返回None。
+    """
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+
+class StackSampler(threading.Thread):
+    """
+    墙钟采样器：定期读取所有线程的调用栈，生成火焰图折叠栈格式的统计，
+    并把每个线程在两次采样之间的墙钟时间和CPU时间归属到调用栈中最内层的阶段模块。
+    """
+
+    def __init__(self, interval: float):
+        """
+        初始化采样器。
+
+        Args:
+            interval: 采样间隔（秒）
+        """
+        super().__init__(name='profile-sampler', daemon=True)
+        self.interval = interval
+        self.samples = 0
+        self.folded: Counter = Counter()
+        self.stage_wall: Counter = Counter()
+        self.stage_cpu: Counter = Counter()
+        self.cpu_supported = True
+        self._stopped = threading.Event()
+        self._stage_cache: Dict[str, str | None] = {}
+        self._cpu_last: Dict[int, float] = {}
+
+    def stop(self):
+        """
+        停止采样并等待采样线程结束。
+        """
+        self._stopped.set()
+        self.join()
+
+    def run(self):
+        own_ident = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own_ident:
+                    self._sample(ident, names.get(ident, str(ident)), frame, elapsed)
+            self.samples += 1
+
+    def _sample(self, ident: int, thread_name: str, frame, elapsed: float):
+        """
+        记录一个线程的调用栈。
+        """
+        labels: List[str] = []
+        stage = None
+        while frame is not None:
+            code = frame.f_code
+            if stage is None:
+                stage = _stage_of(code.co_filename, self._stage_cache)
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            labels.append(f"{module}.{getattr(code, 'co_qualname', code.co_name)}".replace(';', ':'))
+            frame = frame.f_back
+        labels.append(thread_name.replace(';', ':'))
+        self.folded[';'.join(reversed(labels))] += 1
+
+        stage = stage or OTHER_STAGE
+        self.stage_wall[stage] += elapsed
+        cpu = _thread_cpu_time(ident)
+        if cpu is None:
+            self.cpu_supported = False
+            return
+        previous = self._cpu_last.get(ident)
+        self._cpu_last[ident] = cpu
+        if previous is not None:
+            self.stage_cpu[stage] += cpu - previous
+
+
+class Profiler:
+    """
+    性能分析模式：在登录和获取流程运行期间同时进行
+    - CPU分析：cProfile统计函数耗时（Python 3.12之前每个线程一个分析器、按线程CPU时间计时；
+      之后使用一个覆盖所有线程的分析器、按墙钟计时，各阶段的CPU时间始终来自采样器）
+    - 内存分析：tracemalloc记录分配位置和峰值
+    - 墙钟采样：StackSampler定期采样所有线程，按阶段归属耗时并生成火焰图数据
+    结束时写出三个文件：<前缀>.txt（报告）、<前缀>.folded（折叠栈，可用flamegraph.pl或speedscope查看）、
+    <前缀>.pstats（cProfile原始数据，可用snakeviz等工具查看）。
+    """
+
+    def __init__(self, output_prefix: str, sample_interval_ms: float = config.PROFILE_SAMPLE_INTERVAL_MS):
+        """
+        初始化性能分析器。
+
+        Args:
+            output_prefix: 输出文件路径前缀
+            sample_interval_ms: 墙钟采样间隔（毫秒）
+        """
+        self.output_prefix = output_prefix
+        self.sampler = StackSampler(sample_interval_ms / 1000)
+        self._profiles: List[cProfile.Profile] = []
+        self._profiles_lock = threading.Lock()
+        self._started = None
+
+    def _new_profile(self) -> cProfile.Profile | None:
+        """
+        创建并启动cProfile。
+
+        Returns:
+            cProfile.Profile: 启动的分析器，已有其他分析工具在运行时返回None
+        """
+        profile = cProfile.Profile(time.thread_time_ns, 1e-9) if PER_THREAD_CPROFILE else cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            print(f"{Fore.YELLOW}无法启动cProfile: {e}")
+            return None
+        with self._profiles_lock:
+            self._profiles.append(profile)
+        return profile
+
+    def _thread_hook(self, frame, event, arg):
+        # 新线程第一次触发分析回调时换成该线程自己的cProfile
+        sys.setprofile(None)
+        self._new_profile()
+
+    def start(self):
+        """
+        开始分析。
+        """
+        tracemalloc.start(config.PROFILE_TRACEMALLOC_FRAMES)
+        self._started = time.perf_counter()
+        self.sampler.start()
+        if PER_THREAD_CPROFILE:
+            threading.setprofile(self._thread_hook)
+        self._new_profile()
+        print(f"{Fore.CYAN}{Style.BRIGHT}性能分析已开启，结束时写入 {self.output_prefix}.txt")
+
+    def stop(self) -> str:
+        """
+        结束分析并写出报告。
+
+        Returns:
+            str: 报告文件路径
+        """
+        if PER_THREAD_CPROFILE:
+            threading.setprofile(None)
+        with self._profiles_lock:
+            profiles = list(self._profiles)
+        for profile in profiles:
+            profile.disable()
+        wall = time.perf_counter() - self._started
+        self.sampler.stop()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        directory = os.path.dirname(self.output_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stats = pstats.Stats(*profiles)
+        stats.dump_stats(self.output_prefix + '.pstats')
+        with open(self.output_prefix + '.folded', 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.sampler.folded.items()):
+                f.write(f"{stack} {count}\n")
+        report_path = self.output_prefix + '.txt'
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(self._report(wall, stats, snapshot, current, peak))
+        print(f"{Fore.GREEN}{Style.BRIGHT}✓ 性能分析报告已写入 {report_path}（火焰图数据: {self.output_prefix}.folded）")
+        return report_path
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _report(self, wall: float, stats: pstats.Stats, snapshot: tracemalloc.Snapshot, current: int, peak: int) -> str:
+        """
+        生成文本报告。
+        """
+        sampler = self.sampler
+        lines = [
+            "性能分析报告",
+            f"墙钟时间 {wall:.2f} s，采样 {sampler.samples} 次（间隔 {sampler.interval * 1000:.0f} ms）",
+            "",
+            "各阶段耗时（线程累计，归属到调用栈中最内层的阶段模块；墙钟时间包含等待网络，空闲线程计入其他）",
+            f"{'阶段':<18}{'墙钟(s)':>10}{'CPU(s)':>10}{'内存分配(KB)':>14}",
+        ]
+        allocations = self._stage_allocations(snapshot)
+        for stage in PROFILE_STAGES + (OTHER_STAGE,):
+            cpu = f"{sampler.stage_cpu[stage]:.3f}" if sampler.cpu_supported else '-'
+            lines.append(f"{stage:<18}{sampler.stage_wall[stage]:>10.3f}{cpu:>10}{allocations[stage] / 1024:>14.1f}")
+        if not sampler.cpu_supported:
+            lines.append("（当前平台无法读取线程CPU时间，CPU列见下方cProfile统计）")
+
+        lines += ["", f"内存：结束时 {current / 1024 / 1024:.1f} MB，峰值 {peak / 1024 / 1024:.1f} MB", "分配最多的位置（前15）"]
+        for stat in snapshot.statistics('lineno')[:15]:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size / 1024:>10.1f} KB {stat.count:>8} 次  {frame.filename}:{frame.lineno}")
+
+        timing = '自身CPU时间' if PER_THREAD_CPROFILE else '自身耗时（墙钟）'
+        lines += ["", f"热点函数（cProfile，按{timing}，前30）"]
+        if stats.stats:
+            buffer = io.StringIO()
+            stats.stream = buffer
+            stats.sort_stats('tottime').print_stats(30)
+            lines.append(buffer.getvalue())
+        else:
+            lines.append("（cProfile未能启动，没有函数统计）")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _stage_allocations(snapshot: tracemalloc.Snapshot) -> Counter:
+        """
+        把仍在占用的内存按分配时调用栈中最内层的阶段模块归类。
+        """
+        allocations: Counter = Counter()
+        cache: Dict[str, str | None] = {}
+        for stat in snapshot.statistics('traceback'):
+            stage = next((_stage_of(frame.filename, cache) for frame in reversed(stat.traceback)
+                          if _stage_of(frame.filename, cache)), None)
+            allocations[stage or OTHER_STAGE] += stat.size
+        return allocations
+
+
+# 等待用户操作的对话框，主线程停在其中不算阻塞
+_DIALOG_MODULES = ('messagebox', 'filedialog', 'commondialog', 'simpledialog', 'dialog')
+
+
+class MainLoopWatchdog:
+    """
+    界面主线程阻塞检测（常开、开销很小）：主线程定期通过after()更新心跳，
+    后台线程发现心跳停止超过阈值时，采样主线程当前的调用栈，记录阻塞主循环的事件处理函数及其所在位置，
+    恢复响应后再记录阻塞的总时长。
+    """
+
+    def __init__(self, root, threshold_ms: int = config.UI_BLOCK_THRESHOLD_MS,
+                 interval_ms: int = config.UI_WATCHDOG_INTERVAL_MS):
+        """
+        初始化检测器。
+
+        Args:
+            root: Tk根窗口
+            threshold_ms: 主线程阻塞超过该时长（毫秒）时记录
+            interval_ms: 心跳间隔（毫秒）
+        """
+        self.root = root
+        self.threshold = threshold_ms / 1000
+        self.interval_ms = interval_ms
+        self.stalls = 0
+        self._main_ident = None
+        self._last_beat = time.monotonic()
+        self._stall = None  # (阻塞开始时间, 事件处理函数)
+        self._after_id = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        开始检测，需要在Tk主线程中调用。
+        """
+        self._main_ident = threading.get_ident()
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name='ui-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止检测。
+        """
+        self._stopped.set()
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    def _watch(self):
+        interval = self.interval_ms / 1000
+        while not self._stopped.wait(interval):
+            last_beat = self._last_beat
+            blocked = time.monotonic() - last_beat - interval
+            if blocked >= self.threshold:
+                if self._stall is None or self._stall[0] != last_beat:
+                    self._report_stall(last_beat, blocked)
+            elif self._stall is not None:
+                started, handler = self._stall
+                self._stall = None
+                self.stalls += 1
+                duration = (last_beat - started - interval) * 1000
+                print(f"{Fore.YELLOW}界面主线程已恢复响应：{handler} 阻塞主循环约 {duration:.0f} ms")
+
+    def _report_stall(self, last_beat: float, blocked: float):
+        """
+        采样主线程调用栈并记录阻塞位置。
+        """
+        frame = sys._current_frames().get(self._main_ident)
+        if frame is None:
+            return
+        stack = self._app_stack(frame)
+        if stack is None:
+            # 主线程停在对话框中等待用户操作
+            self._stall = (last_beat, '对话框')
+            return
+        handler = stack[0] if stack else '未知'
+        self._stall = (last_beat, handler)
+        print(f"{Fore.YELLOW}{Style.BRIGHT}⚠ 界面主线程阻塞超过 {blocked * 1000:.0f} ms，事件处理函数: {handler}")
+        for location in stack[1:][-6:]:
+            print(f"{Fore.YELLOW}    {location}")
+
+    @staticmethod
+    def _app_stack(frame) -> List[str] | None:
+        """
+        提取主线程调用栈中Tk回调之后的部分（由外到内）。
+
+        Returns:
+            List[str]: 事件处理函数及其调用的位置，主线程停在对话框中时返回None
+        """
+        frames: List[Tuple[str, str, int, str]] = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append((code.co_filename, getattr(code, 'co_qualname', code.co_name), frame.f_lineno,
+                           os.path.splitext(os.path.basename(code.co_filename))[0]))
+            frame = frame.f_back
+        frames.reverse()
+
+        # Tk回调经由tkinter的CallWrapper调用，最后一个tkinter帧之后是事件处理函数
+        tk_dir = os.sep + 'tkinter' + os.sep
+        start = 0
+        for index, (filename, _, _, module) in enumerate(frames):
+            if tk_dir in filename:
+                if module in _DIALOG_MODULES:
+                    return None
+                start = index + 1
+        return [f"{qualname} ({module}.py:{lineno})" for _, qualname, lineno, module in frames[start:]]
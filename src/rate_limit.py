@@ -0,0 +1,144 @@
+# rate_limit.py
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Hashable, Tuple
+from urllib.parse import urlparse
+
+import src.config as config
+from src.cancellation import CancellationToken, OperationCancelled
+
+
+class FairTokenBucket:
+    """
+    带公平排队的令牌桶限速器。
+    令牌按固定速率补充，最多累积burst个；等待中的请求按账号分组轮流取得令牌，
+    每个账号每轮只能取得一个，活动很多的账号不会让其他账号长时间等待。
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        初始化令牌桶。
+
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 令牌桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        # 账号 -> 等待中的请求；_turns为有请求等待的账号的轮转顺序
+        self._waiters: Dict[Hashable, deque] = {}
+        self._turns: deque = deque()
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float):
+        """
+        按经过的时间补充令牌。
+
+        Args:
+            now: 当前时间（time.monotonic()）
+        """
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, key: Hashable, cancel_token: CancellationToken | None = None):
+        """
+        为指定账号取得一个令牌，必要时排队等待。
+
+        Args:
+            key: 账号标识（用于公平轮转）
+            cancel_token: 可选的取消令牌，等待期间取消会抛出OperationCancelled
+        """
+        ticket = object()
+        granted = False
+        with self._condition:
+            queue = self._waiters.get(key)
+            if queue is None:
+                queue = self._waiters[key] = deque()
+                self._turns.append(key)
+            queue.append(ticket)
+
+            try:
+                while True:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        raise OperationCancelled("请求已取消。")
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._turns[0] == key and queue[0] is ticket and self._tokens >= 1:
+                        self._tokens -= 1
+                        granted = True
+                        return
+                    wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.2
+                    self._condition.wait(min(max(wait, 0.001), 0.2))
+            finally:
+                # 取得令牌后轮到下一个账号；取消等待的请求没有取得令牌，不占用账号的这一轮
+                queue.remove(ticket)
+                if granted:
+                    self._turns.popleft()
+                    if queue:
+                        self._turns.append(key)
+                elif not queue:
+                    self._turns.remove(key)
+                if not queue:
+                    del self._waiters[key]
+                self._condition.notify_all()
+
+
+# 进程内共享的限速器：(主机, 预算类型) -> 令牌桶
+_buckets: Dict[Tuple[str, str], FairTokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _budget(kind: str) -> Tuple[float, int]:
+    """
+    获取预算类型对应的速率和突发容量。
+
+    Args:
+        kind: 'login' 或 'detail'
+
+    Returns:
+        Tuple[float, int]: (每秒请求数, 突发容量)
+    """
+    if kind == 'login':
+        return config.LOGIN_RATE_PER_SECOND, config.LOGIN_BURST
+    if kind == 'detail':
+        return config.DETAIL_RATE_PER_SECOND, config.DETAIL_BURST
+    raise ValueError(f"未知的请求预算类型: {kind}")
+
+
+def get_bucket(url: str, kind: str) -> FairTokenBucket:
+    """
+    获取URL所在主机在指定预算类型下的共享令牌桶，同一进程内的所有ApiClient共用。
+
+    Args:
+        url: 请求URL
+        kind: 'login' 或 'detail'
+
+    Returns:
+        FairTokenBucket: 共享的令牌桶
+    """
+    bucket_key = (urlparse(url).netloc, kind)
+    with _buckets_lock:
+        bucket = _buckets.get(bucket_key)
+        if bucket is None:
+            rate, burst = _budget(kind)
+            bucket = _buckets[bucket_key] = FairTokenBucket(rate, burst)
+        return bucket
+
+
+def wait_for_budget(url: str, kind: str, account: Hashable, cancel_token: CancellationToken | None = None):
+    """
+    发送请求前从共享预算中取得一个令牌。未启用限速时直接返回。
+
+    Args:
+        url: 请求URL
+        kind: 'login' 或 'detail'
+        account: 账号标识
+        cancel_token: 可选的取消令牌
+    """
+    if not config.ENABLE_RATE_LIMIT:
+        return
+    get_bucket(url, kind).acquire(account, cancel_token)
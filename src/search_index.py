@@ -0,0 +1,129 @@
+# search_index.py
+
+import unicodedata
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    # 可选依赖：安装pypinyin后支持按拼音或拼音首字母筛选
+    from pypinyin import lazy_pinyin, Style as PinyinStyle
+except ImportError:
+    lazy_pinyin = None
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化文本：统一全角半角、转为小写并去除空白。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        str: 规范化后的文本
+    """
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return ''.join(text.split())
+
+
+def _pinyin_forms(text: str) -> str:
+    """
+    生成文本的拼音全拼和首字母形式，未安装pypinyin时返回空字符串。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        str: 以空格分隔的全拼和首字母
+    """
+    if lazy_pinyin is None or not text:
+        return ''
+    full = ''.join(lazy_pinyin(text))
+    initials = ''.join(lazy_pinyin(text, style=PinyinStyle.FIRST_LETTER))
+    return f"{full} {initials}"
+
+
+class ActivitySearchIndex:
+    """
+    活动表格的筛选索引。
+    为每一行预先计算规范化的"名称 + 标签 + 签到签退状态"文本（安装pypinyin时附加拼音），
+    连续输入时在上一次的结果集上继续筛选，而不是重新扫描全部行。
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, tuple, str]] = ()):
+        """
+        初始化筛选索引。
+
+        Args:
+            rows: build_tree_rows生成的 (行ID, 行数据, 标签) 列表
+        """
+        self._order: List[str] = []
+        self._text: Dict[str, str] = {}
+        for iid, row_values, _ in rows:
+            self._order.append(iid)
+            # 行数据顺序: 名称, 时间, 持续时间, 积分, 签到, 签退, 标签
+            name, signin, signout, tags = row_values[0], row_values[4], row_values[5], row_values[6]
+            text = ' '.join((name, tags, signin, signout))
+            self._text[iid] = normalize_text(text) + ' ' + _pinyin_forms(f"{name} {tags}").casefold()
+        self._last_terms: List[str] = []
+        self._last_result: List[str] = self._order
+
+    @property
+    def order(self) -> List[str]:
+        """
+        全部行ID（按表格顺序）。
+
+        Returns:
+            List[str]: 行ID列表
+        """
+        return self._order
+
+    def reorder(self, order: List[str]):
+        """
+        按新的表格顺序（例如点击列标题排序后）重排索引，筛选结果随之保持新顺序。
+
+        Args:
+            order: 新的行ID顺序，必须包含与原来相同的行
+        """
+        self._order = list(order)
+        self._last_terms = []
+        self._last_result = self._order
+
+    def search(self, query: str) -> List[str]:
+        """
+        按关键字筛选行，空格分隔的多个关键字需全部匹配。
+        新查询是上一次查询的细化（每个关键字都以原关键字开头或包含原关键字）时，
+        只在上一次的结果集中继续筛选。
+
+        Args:
+            query: 筛选关键字
+
+        Returns:
+            List[str]: 匹配的行ID（保持表格顺序）
+        """
+        terms = [normalize_text(term) for term in (query or '').split()]
+        terms = [term for term in terms if term]
+        if not terms:
+            result = self._order
+        else:
+            candidates = self._order
+            if self._is_refinement(terms):
+                candidates = self._last_result
+            text = self._text
+            result = [iid for iid in candidates if all(term in text[iid] for term in terms)]
+
+        self._last_terms = terms
+        self._last_result = result
+        return result
+
+    def _is_refinement(self, terms: List[str]) -> bool:
+        """
+        判断新关键字是否只会缩小上一次的结果集。
+
+        Args:
+            terms: 新的关键字列表
+
+        Returns:
+            bool: 可以在上一次结果集上继续筛选时返回True
+        """
+        if not self._last_terms or len(terms) < len(self._last_terms):
+            return False
+        return all(old in new for old, new in zip(self._last_terms, terms))
@@ -1,14 +1,124 @@
 # ui_manager.py
 
+import threading
+import time
 import tkinter as tk
+from collections import deque
 from tkinter import ttk, messagebox
-from typing import List, Dict, Any
+from functools import partial
+from typing import List, Dict, Any, Callable, Mapping, NamedTuple, Sequence, Tuple
+
+import src.config as config
+from src.activity_store import activity_key
+from src.search_index import ActivitySearchIndex
+
+
+def build_tree_rows(activity_data: Sequence[Mapping[str, Any]]) -> List[Tuple[str, tuple, str]]:
+    """
+    预先计算表格的行ID、行数据和颜色标签。
+    不访问任何Tk对象，可以在工作线程中调用。
+
+    Args:
+        activity_data: 活动数据列表
+
+    Returns:
+        List[Tuple[str, tuple, str]]: (行ID, 行数据, 标签) 列表，行ID为活动唯一键
+    """
+    rows = []
+    for item in activity_data:
+        # 1. 确定状态和标签
+        tag = "Unknown" # 默认/未加载的活动
+
+        # 仅对已加载详情的活动应用颜色
+        if item.get('is_loaded', False):
+            # 判断是否签到签退都已完成
+            signin_ok = item.get('signin') == '已签到'
+            signout_ok = item.get('signout') == '已签退'
+
+            if signin_ok and signout_ok:
+                tag = "Completed" # 绿色 (已完成)
+            else:
+                tag = "Incomplete" # 粉色 (未完成)
+
+        # 2. 准备行数据
+        row_values = (
+            item['name'],
+            item['time'],
+            item['duration'],
+            item['points'],
+            item['signin'],
+            item['signout'],
+            item['tags']
+        )
+        rows.append((activity_key(item), row_values, tag))
+    return rows
+
+
+# 表格列顺序，与build_tree_rows生成的行数据一致
+TREE_COLUMNS = ('name', 'time', 'duration', 'points', 'signin', 'signout', 'tags')
+
+
+def record_sort_key(item: Mapping[str, Any]) -> tuple:
+    """
+    计算活动记录各列的类型化排序键，顺序与TREE_COLUMNS一致。
+    直接使用数值字段（时间戳、小时数、积分、签到签退状态），而不是解析显示文本；
+    未加载详情的字段为None，排序时始终排在最后。
+
+    Args:
+        item: 活动记录
+
+    Returns:
+        tuple: 各列的排序键
+    """
+    name_key = (item.get('name') or '').casefold()
+    if not item.get('is_loaded', False) or 'error' in item:
+        return (name_key, None, None, None, None, None, None)
+
+    timestamp = item.get('acttime_timestamp') or None
+    signin_ok = item.get('signin_ok', item.get('signin') == '已签到')
+    signout_ok = item.get('signout_ok', item.get('signout') == '已签退')
+    return (
+        name_key,
+        timestamp,
+        item.get('hours_value'),
+        item.get('points_value'),
+        int(bool(signin_ok)),
+        int(bool(signout_ok)),
+        (item.get('tags') or '').casefold()
+    )
+
+
+class TreeRenderData(NamedTuple):
+    """
+    预先计算好的表格渲染数据：行数据、筛选索引和排序键。
+    """
+    rows: List[Tuple[str, tuple, str]]
+    search_index: ActivitySearchIndex
+    sort_keys: Dict[str, tuple]
+
+
+def prepare_tree_render(activity_data: Sequence[Mapping[str, Any]]) -> TreeRenderData:
+    """
+    一次性计算表格渲染需要的全部数据。不访问任何Tk对象，可以在工作线程中调用。
+
+    Args:
+        activity_data: 活动数据列表
+
+    Returns:
+        TreeRenderData: 表格渲染数据
+    """
+    rows = build_tree_rows(activity_data)
+    sort_keys = {activity_key(item): record_sort_key(item) for item in activity_data}
+    return TreeRenderData(rows, ActivitySearchIndex(rows), sort_keys)
 
 class UIManager:
     """
     UI管理器类，负责管理和更新应用程序的用户界面组件。
     """
 
+    # 增量更新时允许直接插入的新行数量上限，超过后改为完整的分批渲染
+    DIFF_INSERT_LIMIT = 200
+
     def __init__(self, root, tree):
         """
         初始化UI管理器。
@@ -19,6 +129,24 @@ class UIManager:
         """
         self.root = root
         self.tree = tree
+        # 分批渲染状态：代次用于取消过期的渲染任务
+        self._render_generation = 0
+        self._rendered_version = None
+        self._rendering = False
+        # 已渲染的行：行ID -> (行数据, 标签)，用于增量更新
+        self._rendered_rows: Dict[str, Tuple[tuple, str]] = {}
+        # 筛选状态：被筛选隐藏（detach）的行ID
+        self.search_index = ActivitySearchIndex()
+        self._filter_query = ''
+        self._hidden = set()
+        # 监视模式下需要高亮的行ID
+        self._highlighted = set()
+        # 排序状态：当前排序列、是否降序，以及每行的类型化排序键
+        self._sort_keys: Dict[str, tuple] = {}
+        self._sort_column = None
+        self._sort_descending = False
+        self._setup_sorting()
+        self._final_status = None
         self._setup_tree_tags()
 
     def _setup_tree_tags(self):
@@ -30,10 +158,77 @@ class UIManager:
         self.tree.tag_configure("Completed", background="light green", foreground="black") # 已完成活动
         self.tree.tag_configure("Incomplete", background="#FFC0CB", foreground="black") # 未完成活动（浅粉色）
         self.tree.tag_configure("Unknown", foreground="gray") # 默认/未加载详情
+        self.tree.tag_configure("Changed", background="#FFD966", foreground="black") # 监视模式下状态刚发生变化
+
+    def _setup_sorting(self):
+        """
+        为每个列标题绑定点击排序命令，并记录原始标题文本。
+        """
+        self._heading_text = {}
+        for column in self.tree['columns']:
+            self._heading_text[column] = self.tree.heading(column, 'text')
+            self.tree.heading(column, command=partial(self.sort_by, column))
+
+    def sort_by(self, column: str):
+        """
+        按指定列排序；再次点击同一列时切换升序和降序。
+
+        Args:
+            column: 列名
+        """
+        if self._sort_column == column:
+            self._sort_descending = not self._sort_descending
+        else:
+            self._sort_column = column
+            self._sort_descending = False
+
+        for name, text in self._heading_text.items():
+            arrow = ''
+            if name == column:
+                arrow = ' ▼' if self._sort_descending else ' ▲'
+            self.tree.heading(name, text=text + arrow)
+
+        self._apply_sort()
+
+    def _apply_sort(self):
+        """
+        按当前排序列重新排列已有的行。
+        只调整现有行的顺序，不重新插入；被筛选隐藏的行也一并排序。
+        """
+        if self._sort_column is None or self._rendering:
+            return
+
+        position = TREE_COLUMNS.index(self._sort_column)
+        keys = self._sort_keys
+        known, unknown = [], []
+        for iid in self.search_index.order:
+            key = keys.get(iid)
+            value = key[position] if key is not None else None
+            (unknown if value is None else known).append((value, iid))
+
+        known.sort(key=lambda pair: pair[0], reverse=self._sort_descending)
+        order = [iid for _, iid in known] + [iid for _, iid in unknown]
+
+        self.search_index.reorder(order)
+        visible = self.search_index.search(self._filter_query) if self._hidden else order
+        # 一次调用按新顺序重排全部可见行
+        self.tree.set_children('', *visible)
 
     def update_status(self, message):
         """
         更新状态栏消息。
+        表格正在分批渲染时，该消息会在渲染完成后保留显示。
+
+        Args:
+            message: 要显示的状态消息
+        """
+        if self._rendering:
+            self._final_status = message
+        self._set_status(message)
+
+    def _set_status(self, message):
+        """
+        直接设置状态栏文本。
 
         Args:
             message: 要显示的状态消息
@@ -49,6 +244,8 @@ class UIManager:
             self.root.fetch_button.config(state="disabled")
         if hasattr(self.root, 'login_button'):
             self.root.login_button.config(state="disabled")
+        if hasattr(self.root, 'cancel_button'):
+            self.root.cancel_button.config(state="normal")
 
     def enable_buttons(self, enable_fetch=True, enable_login=False):
         """
@@ -62,53 +259,254 @@ class UIManager:
             self.root.fetch_button.config(state="normal")
         if enable_login and hasattr(self.root, 'login_button'):
             self.root.login_button.config(state="normal")
+        if hasattr(self.root, 'cancel_button'):
+            self.root.cancel_button.config(state="disabled")
 
-    def update_tree(self, activity_data_cache: List[Dict[str, Any]]):
+    def update_tree(self, activity_data_cache: Sequence[Mapping[str, Any]], prepared: TreeRenderData = None, version: int = None):
         """
         更新Treeview表格，根据完成状态应用颜色标签。
+        行数据按时间片分批插入，避免大量数据时界面冻结；
+        新的更新会使尚未完成的旧渲染失效。
 
         Args:
             activity_data_cache: 活动数据列表
+            prepared: 可选的预先计算好的渲染数据（由prepare_tree_render生成，可在工作线程中计算）
+            version: 可选的数据快照版本号，与已渲染的版本相同时跳过渲染
         """
+        if version is not None and version == self._rendered_version:
+            return
+
+        if prepared is None:
+            prepared = prepare_tree_render(activity_data_cache)
+        rows = prepared.rows
+        self.search_index = prepared.search_index
+        self._sort_keys = prepared.sort_keys
+
+        if self._rendered_rows and not self._rendering:
+            new_count = sum(1 for iid, _, _ in rows if iid not in self._rendered_rows)
+            if new_count <= self.DIFF_INSERT_LIMIT:
+                # 表格中已有数据时只更新变化的行
+                changed = self._apply_row_diff(rows)
+                self._rendered_version = version
+                self._set_status(f"共找到 {len(rows)} 条报名记录，{changed} 条有更新。")
+                self._apply_sort()
+                self._apply_filter()
+                return
+
+        # 清空表格会开启新的渲染代次，旧的分批插入任务检测到代次变化后自动停止
         self.clear_tree()
+        self._rendered_version = version
+        self._final_status = None
+        self._rendering = True
+        self.root.after_idle(self._insert_chunk, self._render_generation, rows, 0)
 
-        for item in activity_data_cache:
-            # 1. 确定状态和标签
-            tag = "Unknown" # 默认/未加载的活动
-
-            # 仅对已加载详情的活动应用颜色
-            if item.get('is_loaded', False):
-                # 判断是否签到签退都已完成
-                signin_ok = item.get('signin') == '已签到'
-                signout_ok = item.get('signout') == '已签退'
-
-                if signin_ok and signout_ok:
-                    tag = "Completed" # 绿色 (已完成)
-                else:
-                    tag = "Incomplete" # 粉色 (未完成)
-
-            # 2. 准备行数据
-            row_values = (
-                item['name'],
-                item['time'],
-                item['duration'],
-                item['points'],
-                item['signin'],
-                item['signout'],
-                item['tags']
-            )
-
-            # 3. 插入行，并应用标签
-            self.tree.insert('', 'end', values=row_values, tags=(tag,))
-
-        self.update_status(f"共找到 {len(activity_data_cache)} 条报名记录。")
+    def _insert_chunk(self, generation: int, rows: List[Tuple[str, tuple, str]], start: int):
+        """
+        在一个时间片内插入尽可能多的行，剩余的行在下一个空闲回调中继续插入。
+
+        Args:
+            generation: 发起本次渲染时的代次
+            rows: 行数据列表
+            start: 本次开始插入的行序号
+        """
+        if generation != self._render_generation:
+            return  # 已有更新的渲染，放弃旧任务
+
+        deadline = time.perf_counter() + config.TREE_RENDER_BUDGET_MS / 1000
+        index = start
+        total = len(rows)
+        while index < total:
+            # 每次检查时间前插入一小批，减少计时开销
+            for iid, row_values, tag in rows[index:index + 50]:
+                self.tree.insert('', 'end', iid=iid, values=row_values, tags=self._row_tags(iid, tag))
+                self._rendered_rows[iid] = (row_values, tag)
+            index = min(index + 50, total)
+            if time.perf_counter() >= deadline:
+                break
+
+        if index < total:
+            self._set_status(f"正在显示 {index}/{total} 条报名记录...")
+            self.root.after_idle(self._insert_chunk, generation, rows, index)
+            return
+
+        self._rendering = False
+        self._set_status(self._final_status or f"共找到 {total} 条报名记录。")
+        self._apply_sort()
+        self._apply_filter()
+
+    def _apply_row_diff(self, rows: List[Tuple[str, tuple, str]]) -> int:
+        """
+        将表格增量更新为给定的行：删除消失的行，修改变化的行，插入新行，并按需调整顺序。
+
+        Args:
+            rows: 行数据列表
+
+        Returns:
+            int: 新增、修改和删除的行数
+        """
+        new_ids = {iid for iid, _, _ in rows}
+        removed = [iid for iid in self._rendered_rows if iid not in new_ids]
+        if removed:
+            self.tree.delete(*removed)
+
+        changed = len(removed)
+        rendered = {}
+        for iid, row_values, tag in rows:
+            old = self._rendered_rows.get(iid)
+            if old is None:
+                self.tree.insert('', 'end', iid=iid, values=row_values, tags=self._row_tags(iid, tag))
+                changed += 1
+            elif old != (row_values, tag):
+                self.tree.item(iid, values=row_values, tags=self._row_tags(iid, tag))
+                changed += 1
+            rendered[iid] = (row_values, tag)
+        self._rendered_rows = rendered
+
+        order = [iid for iid, _, _ in rows]
+        if self._hidden or list(self.tree.get_children()) != order:
+            # 一次调用重排全部行，同时重新挂载被筛选隐藏的行，之后由_apply_filter重新筛选
+            self.tree.set_children('', *order)
+            self._hidden = set()
+        return changed
+
+    def set_filter(self, query: str):
+        """
+        设置表格筛选关键字，只显示名称、标签或签到签退状态匹配的行。
+
+        Args:
+            query: 筛选关键字，为空时显示全部行
+        """
+        self._filter_query = query or ''
+        self._apply_filter()
+        if not self._rendering:
+            total = len(self.search_index.order)
+            if self._filter_query.strip():
+                self._set_status(f"筛选出 {total - len(self._hidden)}/{total} 条报名记录。")
+            else:
+                self._set_status(f"共找到 {total} 条报名记录。")
+
+    def _apply_filter(self):
+        """
+        按当前筛选关键字隐藏或重新显示行。
+        被隐藏的行只是从表格中摘下（detach），之后可以原样挂回，不重建表格。
+        """
+        if self._rendering:
+            return  # 分批渲染结束后会再次筛选
+
+        matches = self.search_index.search(self._filter_query)
+        order = self.search_index.order
+        if len(matches) == len(order) and not self._hidden:
+            return
+
+        # set_children一次调用完成摘下不匹配的行并按表格顺序挂回匹配的行
+        self.tree.set_children('', *matches)
+        match_set = set(matches)
+        self._hidden = {iid for iid in order if iid not in match_set}
+
+    def visible_keys(self) -> List[str]:
+        """
+        获取当前视图中显示的行ID（已按当前排序，不含被筛选隐藏的行）。
+
+        Returns:
+            List[str]: 行ID（活动唯一键）列表
+        """
+        return list(self.tree.get_children(''))
+
+    def _row_tags(self, iid: str, tag: str) -> tuple:
+        """
+        计算行的标签，高亮的行额外附加"Changed"标签。
+
+        Args:
+            iid: 行ID
+            tag: 状态标签
+
+        Returns:
+            tuple: 行标签
+        """
+        return (tag, "Changed") if iid in self._highlighted else (tag,)
+
+    def highlight_row(self, iid: str, duration_ms: int):
+        """
+        高亮显示状态刚发生变化的行，一段时间后自动取消。
+
+        Args:
+            iid: 行ID
+            duration_ms: 高亮时长（毫秒）
+        """
+        self._highlighted.add(iid)
+        self._refresh_row_tags(iid)
+        self.root.after(duration_ms, self._clear_highlight, iid)
+
+    def _clear_highlight(self, iid: str):
+        """
+        取消行的高亮。
+
+        Args:
+            iid: 行ID
+        """
+        self._highlighted.discard(iid)
+        self._refresh_row_tags(iid)
+
+    def _refresh_row_tags(self, iid: str):
+        """
+        按当前高亮状态重新设置已渲染行的标签。
+
+        Args:
+            iid: 行ID
+        """
+        rendered = self._rendered_rows.get(iid)
+        if rendered is not None:
+            self.tree.item(iid, tags=self._row_tags(iid, rendered[1]))
+
+    def update_summary(self, summary):
+        """
+        更新积分学时汇总面板。
+
+        Args:
+            summary: ActivitySummary汇总结果
+        """
+        if not hasattr(self.root, 'summary_var'):
+            return
+        if summary.activities == 0:
+            self.root.summary_var.set("")
+            return
+
+        lines = [
+            f"已完成 {summary.completed}/{summary.activities - summary.unloaded} 项（另有 {summary.unloaded} 项未加载详情），"
+            f"积分 {summary.points:g}，学时 {summary.hours:g}；"
+            f"未签到 {summary.missing_signin} 项，未签退 {summary.missing_signout} 项"
+        ]
+        if summary.by_classification:
+            groups = [
+                f"{name}: {totals.completed}/{totals.activities}项 {totals.points:g}分 {totals.hours:g}小时"
+                for name, totals in summary.by_classification.items()
+            ]
+            lines.append(" | ".join(groups))
+        self.root.summary_var.set("\n".join(lines))
+
+    def set_stale(self, message: str | None):
+        """
+        设置或清除"数据可能已过期"提示。
+
+        Args:
+            message: 提示文本，为None时清除提示
+        """
+        if hasattr(self.root, 'stale_var'):
+            self.root.stale_var.set(message or "")
 
     def clear_tree(self):
         """
-        清空Treeview中的所有项
+        清空Treeview中的所有项，并停止进行中的分批渲染
         """
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self._render_generation += 1
+        self._rendered_version = None
+        self._rendering = False
+        self._rendered_rows = {}
+        children = list(self.tree.get_children()) + list(self._hidden)
+        self._hidden = set()
+        if children:
+            # 一次调用删除全部行，避免逐行删除的开销
+            self.tree.delete(*children)
 
     def show_error(self, title, message):
         """
@@ -143,3 +541,115 @@ class UIManager:
         else:
             if hasattr(self.root, 'login_button'):
                 self.root.login_button.config(state="normal")
+
+
+class UIUpdateQueue:
+    """
+    工作线程到Tk线程的更新通道。
+    工作线程只向队列投递更新，由Tk线程中的一个周期性回调统一取出并应用：
+    状态消息只保留最新一条，表格刷新每个周期最多执行一次。
+    """
+
+    def __init__(self, root, ui_manager: UIManager, interval_ms: int = 33):
+        """
+        初始化更新队列。
+
+        Args:
+            root: 主窗口实例
+            ui_manager: UI管理器实例
+            interval_ms: 刷新周期（毫秒），默认约30Hz
+        """
+        self.root = root
+        self.ui_manager = ui_manager
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._status = None
+        self._tree_data = None
+        # 投递序号，用于判断状态消息与表格刷新的先后
+        self._seq = 0
+        self._status_seq = 0
+        self._tree_seq = 0
+        self._after_id = None
+
+    def start(self):
+        """
+        启动周期性刷新回调。
+        """
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        """
+        停止周期性刷新回调。
+        """
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def post_status(self, message: str):
+        """
+        投递状态栏消息，同一周期内只显示最新一条。
+
+        Args:
+            message: 状态消息
+        """
+        with self._lock:
+            self._seq += 1
+            self._status = message
+            self._status_seq = self._seq
+
+    def post_tree(self, activity_data: Sequence[Mapping[str, Any]], prepared: TreeRenderData = None, version: int = None):
+        """
+        投递表格刷新，同一周期内只按最新数据刷新一次。
+
+        Args:
+            activity_data: 活动数据列表
+            prepared: 可选的预先计算好的渲染数据
+            version: 可选的数据快照版本号
+        """
+        with self._lock:
+            self._seq += 1
+            self._tree_data = (activity_data, prepared, version)
+            self._tree_seq = self._seq
+
+    def post_call(self, func: Callable, *args):
+        """
+        投递需要在Tk线程中按顺序执行的调用。
+
+        Args:
+            func: 要执行的函数
+            *args: 函数参数
+        """
+        with self._lock:
+            self._calls.append((func, args))
+
+    def _drain(self):
+        """
+        周期性回调：依次执行排队的调用，再合并应用表格刷新和状态消息。
+        """
+        self._after_id = None
+        try:
+            with self._lock:
+                calls, self._calls = self._calls, deque()
+
+            for func, args in calls:
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f"UI更新执行失败: {e}")
+
+            # 排队的调用可能会继续投递状态和表格刷新，因此在调用之后再取出
+            with self._lock:
+                tree_data, self._tree_data = self._tree_data, None
+                status, self._status = self._status, None
+                # 表格刷新会设置自己的状态消息，更早投递的状态消息已过期
+                if tree_data is not None and self._status_seq < self._tree_seq:
+                    status = None
+
+            if tree_data is not None:
+                self.ui_manager.update_tree(*tree_data)
+            if status is not None:
+                self.ui_manager.update_status(status)
+        finally:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
@@ -0,0 +1,205 @@
+# watch_mode.py
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Mapping
+
+from colorama import Fore
+
+import src.config as config
+from src.cancellation import CancellationToken, OperationCancelled
+
+
+class RequestBudget:
+    """
+    滑动窗口请求预算：任意60秒内最多发出指定数量的请求。
+    """
+
+    def __init__(self, per_minute: int):
+        """
+        初始化请求预算。
+
+        Args:
+            per_minute: 每分钟允许的请求数
+        """
+        self.per_minute = per_minute
+        self._sent = deque()
+
+    def wait_time(self, now: float) -> float:
+        """
+        计算距离下一个可用请求名额的等待时间。
+
+        Args:
+            now: 当前时间（time.monotonic()）
+
+        Returns:
+            float: 需要等待的秒数，0表示可以立即发送
+        """
+        while self._sent and now - self._sent[0] >= 60:
+            self._sent.popleft()
+        if len(self._sent) < self.per_minute:
+            return 0.0
+        return 60 - (now - self._sent[0])
+
+    def consume(self, now: float):
+        """
+        记录一次请求。
+
+        Args:
+            now: 当前时间（time.monotonic()）
+        """
+        self._sent.append(now)
+
+
+class ActivityWatcher:
+    """
+    监视模式：在活动当天低成本地轮询签到签退状态。
+    只轮询已加载详情、签到签退未完成、且活动时间在当前时间前后窗口内的活动；
+    越接近活动时间轮询越频繁，状态未变化时逐步退避，并受全局每分钟请求预算限制。
+    """
+
+    def __init__(self, fetcher, get_records: Callable[[], Iterable[Mapping[str, Any]]],
+                 on_change: Callable[[str, Mapping[str, Any], Dict[str, Any]], None],
+                 on_update: Callable[[str], None] = None):
+        """
+        初始化监视器。
+
+        Args:
+            fetcher: ActivityFetcher实例
+            get_records: 返回当前活动记录的函数（每轮调用一次，读取最新快照）
+            on_change: 签到或签退状态变化时的回调，参数为(活动URL, 原记录, 新详情)
+            on_update: 可选的进度消息回调
+        """
+        self.fetcher = fetcher
+        self.get_records = get_records
+        self.on_change = on_change
+        self.on_update = on_update
+        self.window_seconds = config.WATCH_WINDOW_HOURS * 3600
+        self.budget = RequestBudget(config.WATCH_REQUESTS_PER_MINUTE)
+        # 活动URL -> 下次轮询时间 / 连续未变化次数
+        self._next_poll: Dict[str, float] = {}
+        self._misses: Dict[str, int] = {}
+        self.cancel_token = None
+        self.thread = None
+
+    def start(self):
+        """
+        启动监视线程。
+        """
+        if self.is_alive():
+            return
+        self.cancel_token = CancellationToken()
+        self.thread = threading.Thread(target=self._run, args=(self.cancel_token,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        停止监视，进行中的请求在下一个检查点中止。
+        """
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+
+    def is_alive(self) -> bool:
+        """
+        检查监视线程是否存活。
+
+        Returns:
+            bool: 线程是否正在运行
+        """
+        return self.thread.is_alive() if self.thread else False
+
+    def is_candidate(self, record: Mapping[str, Any], now: float) -> bool:
+        """
+        判断活动是否需要监视：已加载详情、签到签退未完成、活动时间在监视窗口内。
+
+        Args:
+            record: 活动记录
+            now: 当前时间戳（秒）
+
+        Returns:
+            bool: 需要监视返回True
+        """
+        if not record.get('is_loaded') or 'error' in record or self.fetcher.is_settled(record):
+            return False
+        acttime = record.get('acttime_timestamp') or 0
+        return acttime > 0 and abs(acttime - now) <= self.window_seconds
+
+    def poll_interval(self, record: Mapping[str, Any], now: float) -> float:
+        """
+        计算活动的轮询间隔：活动时间附近使用最短间隔，离活动时间越远间隔越长，
+        连续未发生变化时按倍数退避，最长不超过WATCH_MAX_INTERVAL。
+
+        Args:
+            record: 活动记录
+            now: 当前时间戳（秒）
+
+        Returns:
+            float: 轮询间隔（秒）
+        """
+        distance = abs((record.get('acttime_timestamp') or 0) - now)
+        interval = config.WATCH_MIN_INTERVAL * max(1.0, distance / config.WATCH_NEAR_SECONDS)
+        interval *= 1.5 ** self._misses.get(record['url'], 0)
+        return min(interval, config.WATCH_MAX_INTERVAL)
+
+    def _run(self, cancel_token: CancellationToken):
+        """
+        监视线程函数：每轮选出到期的候选活动，在请求预算内依次轮询。
+
+        Args:
+            cancel_token: 本次监视的取消令牌
+        """
+        watched = None
+        try:
+            while not cancel_token.cancelled:
+                now = time.time()
+                candidates = [record for record in self.get_records() if self.is_candidate(record, now)]
+                # 只在监视的活动数变化时更新状态栏，不覆盖其他操作的状态消息
+                if self.on_update and len(candidates) != watched:
+                    watched = len(candidates)
+                    self.on_update(f"监视中：{watched} 个活动等待签到/签退确认")
+
+                due = [record for record in candidates if self._next_poll.get(record['url'], 0) <= now]
+                # 最接近活动时间的优先
+                due.sort(key=lambda record: abs(record['acttime_timestamp'] - now))
+                for record in due:
+                    wait = self.budget.wait_time(time.monotonic())
+                    if wait > 0:
+                        break  # 本分钟预算已用完，剩余活动留到下一轮
+                    self.budget.consume(time.monotonic())
+                    try:
+                        self._poll(record, cancel_token)
+                    except OperationCancelled:
+                        raise
+                    except Exception as e:
+                        print(f"{Fore.RED}✗ 监视活动失败: {e}")
+                        self._next_poll[record['url']] = time.time() + config.WATCH_MAX_INTERVAL
+
+                # 下一轮在最早到期的活动或预算恢复时开始，至少间隔1秒
+                now = time.time()
+                next_due = min((self._next_poll.get(record['url'], now) for record in candidates), default=now + config.WATCH_MIN_INTERVAL)
+                sleep_for = max(1.0, min(next_due - now, config.WATCH_MIN_INTERVAL), self.budget.wait_time(time.monotonic()))
+                cancel_token.wait(sleep_for)
+        except OperationCancelled:
+            pass
+
+    def _poll(self, record: Mapping[str, Any], cancel_token: CancellationToken):
+        """
+        轮询单个活动的详情并检查签到签退状态是否变化。
+
+        Args:
+            record: 活动记录
+            cancel_token: 取消令牌
+        """
+        url = record['url']
+        detail = self.fetcher.fetch_single_activity_detail(url, cancel_token=cancel_token)
+        if 'error' in detail:
+            print(f"{Fore.RED}✗ 监视活动失败: {record.get('name', url)}")
+        elif (detail['signin'], detail['signout']) != (record.get('signin'), record.get('signout')):
+            self._misses.pop(url, None)
+            print(f"{Fore.GREEN}✓ 签到状态变化: {record.get('name', url)} {detail['signin']} / {detail['signout']}")
+            self.on_change(url, record, detail)
+        else:
+            self._misses[url] = self._misses.get(url, 0) + 1
+
+        self._next_poll[url] = time.time() + self.poll_interval(record, time.time())
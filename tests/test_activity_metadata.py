@@ -0,0 +1,42 @@
+# test_activity_metadata.py
+
+import threading
+
+from src.activity_metadata import ActivityMetadataTable
+
+
+def test_add_keeps_first_copy_and_drops_enrollment_fields():
+    table = ActivityMetadataTable()
+    first = table.add('1', {'time': 'a', 'signin': '已签到', 'name': 'x'})
+    second = table.add('1', {'time': 'b'})
+    assert second is first
+    assert dict(first) == {'time': 'a'}
+    assert table.added_at('1') is not None
+    assert table.added_at('2') is None
+
+
+def test_enrollment_reads_through_to_shared_info():
+    table = ActivityMetadataTable()
+    meta = table.add('1', {'time': 'a'})
+    details = {'signin': '未签到', 'signout': '未签退', 'signin_ok': False, 'signout_ok': False, 'time': 'ignored'}
+    record = ActivityMetadataTable.enrollment({'name': 'n', 'url': 'u'}, details, meta)
+    assert record['time'] == 'a'
+    assert record['name'] == 'n'
+    assert record['signin'] == '未签到'
+
+
+def test_hits_count_each_lookup_once_across_threads():
+    table = ActivityMetadataTable()
+    table.add('1', {'time': 'a'})
+    assert table.get('missing') is None
+
+    def lookup():
+        for _ in range(1000):
+            table.get('1')
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert table.hits == 8000
@@ -0,0 +1,63 @@
+# test_aggregates.py
+
+import random
+
+from src.aggregates import EMPTY_SUMMARY, ActivityAggregator, GroupTotals, summarize_records, summarize_students
+
+
+def _record(rng):
+    if rng.random() < 0.2:
+        return {'name': 'n', 'is_loaded': False}
+    record = {
+        'is_loaded': True,
+        'signin_ok': rng.random() < 0.8,
+        'signout_ok': rng.random() < 0.7,
+        'points_value': rng.choice([0.5, 1.0, 2.0]),
+        'hours_value': rng.choice([0.5, 1.5, 3.0]),
+        'classification': rng.choice(['思想成长', '实践实习', '']),
+        'category': rng.choice(['讲座', '志愿']),
+    }
+    if rng.random() < 0.1:
+        record['error'] = '超时'
+    return record
+
+
+def test_incremental_updates_match_full_recompute():
+    rng = random.Random(1)
+    aggregator = ActivityAggregator()
+    records = {}
+    for step in range(2000):
+        key = rng.randrange(50)
+        new = None if rng.random() < 0.2 else _record(rng)
+        aggregator.replace(records.get(key), new)
+        if new is None:
+            records.pop(key, None)
+        else:
+            records[key] = new
+        if step % 100 == 0:
+            assert aggregator.summary() == summarize_records(records.values())
+    assert aggregator.summary() == summarize_records(records.values())
+
+    for record in list(records.values()):
+        aggregator.remove(record)
+    assert aggregator.summary() == EMPTY_SUMMARY
+
+
+def test_only_completed_activities_count_towards_totals():
+    summary = summarize_records([
+        {'is_loaded': True, 'signin': '已签到', 'signout': '已签退', 'points_value': 2.0, 'hours_value': 1.0, 'category': '讲座'},
+        {'is_loaded': True, 'signin_ok': True, 'signout_ok': False, 'points_value': 5.0, 'category': '讲座'},
+        {'is_loaded': True, 'error': '超时', 'points_value': 9.0},
+    ])
+    assert (summary.activities, summary.unloaded, summary.completed) == (3, 1, 1)
+    assert (summary.points, summary.hours) == (2.0, 1.0)
+    assert (summary.missing_signin, summary.missing_signout) == (0, 1)
+    assert dict(summary.by_category) == {'讲座': GroupTotals(2, 1, 2.0, 1.0)}
+    assert dict(summary.by_classification) == {'未分类': GroupTotals(2, 1, 2.0, 1.0)}
+
+
+def test_summarize_students_groups_by_student():
+    done = {'is_loaded': True, 'signin_ok': True, 'signout_ok': True, 'points_value': 1.0}
+    summaries = summarize_students([('a', done), ('b', {'is_loaded': False}), ('a', done)])
+    assert summaries['a'].completed == 2 and summaries['a'].points == 2.0
+    assert summaries['b'].unloaded == 1
@@ -0,0 +1,101 @@
+# test_api_service.py
+
+import asyncio
+import threading
+import time
+from http import HTTPStatus
+
+import pytest
+
+from src.api_service import ActivityService, CacheEntry, ServiceError, ServiceHandler
+
+
+@pytest.fixture
+def service():
+    service = ActivityService({'s1': 'pw'}, workers=4)
+    yield service
+    service.close()
+
+
+class _Upstream:
+    """
+    可控的阻塞上游查询：调用后等待放行，记录调用次数。
+    """
+
+    def __init__(self, value='ok'):
+        self.calls = 0
+        self.value = value
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        assert self.release.wait(5)
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+def test_concurrent_requests_share_one_upstream_call(service):
+    upstream = _Upstream()
+    cache = {}
+
+    async def main():
+        requests = [asyncio.ensure_future(service._cached(cache, 'k', 60, upstream)) for _ in range(20)]
+        await asyncio.sleep(0.05)
+        upstream.release.set()
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(main())
+    assert upstream.calls == 1
+    assert all(result['data'] == 'ok' and not result['cached'] for result in results)
+    assert service.stats['upstream'] == 1 and service.stats['coalesced'] == 19
+    assert service._inflight == {}
+
+
+def test_upstream_result_is_cached_after_client_gives_up(service):
+    upstream = _Upstream()
+    cache = {}
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(service._cached(cache, 'k', 60, upstream), 0.05)
+        upstream.release.set()
+        while service._inflight:
+            await asyncio.sleep(0.01)
+        return await service._cached(cache, 'k', 60, upstream)
+
+    result = asyncio.run(main())
+    assert upstream.calls == 1
+    assert result['cached'] and result['data'] == 'ok'
+    assert service.stats['cache_hits'] == 1
+
+
+def test_expired_entry_is_served_stale_when_upstream_fails(service):
+    upstream = _Upstream(RuntimeError('上游超时'))
+    upstream.release.set()
+    cache = {'k': CacheEntry('old', fetched_at=time.time() - 120)}
+
+    result = asyncio.run(service._cached(cache, 'k', 60, upstream))
+    assert result['data'] == 'old' and not result['fresh'] and result['error'] == '上游超时'
+    assert service.stats['stale'] == 1
+
+    with pytest.raises(ServiceError) as error:
+        asyncio.run(service._cached({}, 'k', 60, upstream))
+    assert error.value.status == HTTPStatus.BAD_GATEWAY
+
+
+def test_refresh_bypasses_fresh_cache(service):
+    upstream = _Upstream('new')
+    upstream.release.set()
+    cache = {'k': CacheEntry('old')}
+    assert asyncio.run(service._cached(cache, 'k', 60, upstream))['data'] == 'old'
+    assert asyncio.run(service._cached(cache, 'k', 60, upstream, refresh=True))['data'] == 'new'
+    assert upstream.calls == 1
+
+
+def test_dispatch_reports_unknown_routes_and_accounts(service):
+    handler = ServiceHandler(service)
+    assert asyncio.run(handler.dispatch('GET', '/nope'))[0] == HTTPStatus.NOT_FOUND
+    assert asyncio.run(handler.dispatch('POST', '/health'))[0] == HTTPStatus.METHOD_NOT_ALLOWED
+    status, payload = asyncio.run(handler.dispatch('GET', '/accounts/unknown/activities'))
+    assert status == HTTPStatus.NOT_FOUND and 'unknown' in payload['error']
@@ -0,0 +1,65 @@
+# test_concurrency.py
+
+import random
+
+import requests
+
+from src.concurrency import AdaptiveLimiter, is_overload_error
+
+
+def _run(limiter, latencies):
+    for latency in latencies:
+        limiter.acquire()
+        limiter.release(latency)
+
+
+def test_fast_jittery_responses_do_not_shrink_limit():
+    limiter = AdaptiveLimiter(initial=8, min_limit=1, max_limit=16)
+    rng = random.Random(0)
+    # 1~10 ms的抖动远超平滑延迟的2.5倍，但绝对差值很小，不应视为拥堵
+    _run(limiter, [rng.choice([0.001, 0.002, 0.010]) for _ in range(200)])
+    metrics = limiter.metrics()
+    assert metrics['decreases'] == 0
+    assert limiter.limit > 8
+
+
+def test_real_latency_spike_shrinks_limit():
+    limiter = AdaptiveLimiter(initial=8, min_limit=1, max_limit=16)
+    _run(limiter, [0.020] * 20)
+    before = limiter.limit
+    _run(limiter, [0.500])
+    assert limiter.limit == before // 2
+    assert limiter.metrics()['decreases'] == 1
+
+
+def test_overload_shrinks_limit_once_per_batch():
+    limiter = AdaptiveLimiter(initial=8, min_limit=1, max_limit=16)
+    _run(limiter, [60.0])  # 平滑延迟很长，同一批的后续过载不再减小
+    for _ in range(4):
+        limiter.acquire()
+    for _ in range(4):
+        limiter.release(0.1, overload=True)
+    assert limiter.limit == 4
+    assert limiter.metrics()['overloads'] == 4
+
+
+def test_other_failures_leave_limit_unchanged():
+    limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=16)
+    limiter.acquire()
+    limiter.release(5.0, failed=True)
+    assert limiter.limit == 4
+    assert limiter.metrics()['latency_ms'] is None
+
+
+def test_is_overload_error_follows_wrapped_cause():
+    response = requests.Response()
+    response.status_code = 503
+    try:
+        try:
+            raise requests.HTTPError(response=response)
+        except requests.HTTPError as e:
+            raise Exception("获取活动详情失败") from e
+    except Exception as wrapped:
+        assert is_overload_error(wrapped)
+    response.status_code = 404
+    assert not is_overload_error(requests.HTTPError(response=response))
@@ -0,0 +1,81 @@
+# test_history_db.py
+
+import os
+
+import pytest
+
+from src.history_db import ActivityHistoryDB
+
+
+def _record(enroll_id, actid, acttime, loaded=True, signed=True, category='讲座'):
+    record = {
+        'name': f'活动{actid}',
+        'url': f'/activitynew/mucenter/enter/detail?id={enroll_id}&actid={actid}',
+        'acttime_timestamp': acttime,
+        'is_loaded': loaded,
+        'category': category,
+    }
+    if loaded:
+        record.update({'signin_ok': signed, 'signout_ok': signed})
+    return record
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = ActivityHistoryDB(str(tmp_path / 'history.db'))
+    yield db
+    db.close()
+
+
+def _ids(records):
+    return [record['url'].split('id=')[1].split('&')[0] for record in records]
+
+
+def test_reading_before_first_write_creates_no_file(tmp_path):
+    db = ActivityHistoryDB(str(tmp_path / 'history.db'))
+    assert db.page_enrollments('s1') == ([], None)
+    assert db.get_last_student() is None
+    assert not os.path.exists(db.path)
+
+
+def test_keyset_pages_cover_every_row_once_with_ties(db):
+    # 多条记录共用同一活动时间，游标需要用id打破平局
+    records = [_record(f'{i:03d}', str(i), 1000 + i // 4) for i in range(23)]
+    db.save_activities('s1', '张三', records, batch_size=5)
+    db.save_activities('s2', '李四', [_record('900', '1', 5000)])
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = db.page_enrollments('s1', cursor, limit=5)
+        pages.append(page)
+        if cursor is None:
+            break
+
+    ids = [i for page in pages for i in _ids(page)]
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    assert ids == sorted((f'{i:03d}' for i in range(23)), key=lambda i: (1000 + int(i) // 4, i), reverse=True)
+    assert ids == _ids(db.iter_enrollments('s1', page_size=4))
+
+
+def test_rows_added_ahead_of_cursor_do_not_shift_later_pages(db):
+    db.save_activities('s1', None, [_record(f'{i:02d}', str(i), 100 + i) for i in range(10)])
+    first, cursor = db.page_enrollments('s1', limit=4)
+    db.save_activities('s1', None, [_record('99', '99', 999)])
+    second, _ = db.page_enrollments('s1', cursor, limit=4)
+    assert _ids(first) == ['09', '08', '07', '06']
+    assert _ids(second) == ['05', '04', '03', '02']
+
+
+def test_filters_and_placeholder_records(db):
+    db.save_activities('s1', '张三', [
+        _record('1', '1', 10, signed=True),
+        _record('2', '2', 20, signed=False, category='志愿'),
+        _record('3', '3', 30, loaded=False),
+        {'name': '缺少id', 'url': '/detail'},
+    ])
+    assert _ids(db.iter_enrollments('s1', status='completed')) == ['1']
+    assert _ids(db.iter_enrollments('s1', status='incomplete')) == ['2']
+    assert _ids(db.iter_enrollments('s1', category='志愿')) == ['2']
+    unknown = list(db.iter_enrollments('s1', status='unknown'))
+    assert _ids(unknown) == ['3'] and unknown[0]['is_loaded'] is False
+    assert db.get_last_student()['student_id'] == 's1'
@@ -0,0 +1,37 @@
+# test_html_parser.py
+
+import pytest
+
+import src.html_parser as html_parser
+
+PAGE = '''<html><body>
+<div class="user"><div class="name"> 李四 </div></div>
+<ul>
+<li class="green_events"><a href="/activitynew/mucenter/enter/detail?id=1&amp;actid=11">
+  <div class="course_name">志愿服务 &amp; 宣讲</div></a></li>
+<li class="green_events"><a href="/activitynew/mucenter/enter/detail?id=2&actid=12">
+  <div class="course_name"><span>读书会</span></div><div class="course_name">忽略</div></a></li>
+<li class="green_events"><a href="/activitynew/mucenter/enter/detail?id=3&actid=13">没有名称</a></li>
+<li><a href="/activitynew/mucenter/enter/detail?id=4&actid=14"><div class="course_name">未报名</div></a></li>
+</ul></body></html>'''
+
+
+def _stream(text, size):
+    parser = html_parser.ActivityListStreamParser()
+    activities = []
+    for start in range(0, len(text), size):
+        activities.extend(parser.push(text[start:start + size]))
+    activities.extend(parser.finish())
+    return parser.student_name, activities
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 64, len(PAGE)])
+def test_stream_parser_matches_full_parse_at_any_chunk_boundary(size):
+    assert _stream(PAGE, size) == html_parser.parse_list_page(PAGE)
+
+
+def test_stream_parser_yields_activities_before_page_ends():
+    parser = html_parser.ActivityListStreamParser()
+    head = PAGE[:PAGE.index('<li class="green_events"><a href="/activitynew/mucenter/enter/detail?id=2')]
+    assert [a['name'] for a in parser.push(head)] == ['志愿服务 & 宣讲']
+    assert parser.student_name == '李四'
@@ -0,0 +1,125 @@
+# test_http_cassette.py
+
+import base64
+import gzip
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+
+import src.config as config
+from src.http_cassette import make_adapter, pseudonym, scrub_body, scrub_url
+
+USERNAMES = ['2020010001', '2020010002']
+
+
+def _name(username):
+    return '学生' + username
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    模拟登录和详情接口：页面和JSON中都带有学号和姓名。
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        username = parse_qs(body)['username'][0]
+        if self.path == '/login':
+            html = f'<html><div class="name">{_name(username)}</div><span>{username}</span></html>'
+            self._send(html.encode('utf-8'), 'text/html; charset=utf-8')
+        else:
+            data = {'status': '1', 'data': {'enterMember': {'userid': username, 'realname': _name(username)}}}
+            self._send(json.dumps(data).encode('utf-8'), 'application/json')
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{srv.server_address[1]}'
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_salt_env(monkeypatch):
+    monkeypatch.delenv(config.CASSETTE_SALT_ENV, raising=False)
+
+
+def _session(adapter):
+    session = requests.Session()
+    session.mount('http://', adapter.for_session())
+    return session
+
+
+def _record(server, path):
+    adapter = make_adapter(path, 'record')
+    for username in USERNAMES:
+        session = _session(adapter)
+        session.post(server + '/login', data={'username': username, 'password': 'secret-pw'})
+        session.post(server + '/detail', data={'username': username, 'id': '1'})
+        session.close()
+    adapter.close()
+
+
+def test_scrub_replaces_credentials_and_sorts_fields():
+    assert scrub_body('password=x&b=2&a=1') == 'a=1&b=2&password=%2A%2A%2A'
+    assert scrub_url('http://h/p?ticket=ST-1&x=1') == 'http://h/p?ticket=%2A%2A%2A&x=1'
+
+
+def test_recording_leaks_no_account_data(server, tmp_path):
+    path = str(tmp_path / 'traffic.jsonl.gz')
+    _record(server, path)
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    salt = open(path + '.key', encoding='utf-8').read()
+    text = ''.join(json.dumps(line, ensure_ascii=False) for line in lines)
+    bodies = b''.join(base64.b64decode(line['content']) for line in lines)
+
+    assert salt not in text
+    assert 'secret-pw' not in text
+    for username in USERNAMES:
+        escaped_name = json.dumps(_name(username))[1:-1]
+        assert username not in text
+        assert username.encode() not in bodies
+        assert _name(username).encode('utf-8') not in bodies
+        assert escaped_name.encode() not in bodies
+
+
+def test_replay_matches_each_account(server, tmp_path):
+    path = str(tmp_path / 'traffic.jsonl.gz')
+    _record(server, path)
+    salt = open(path + '.key', encoding='utf-8').read()
+
+    # 有密钥文件时每个账号只匹配自己的交互，与登录顺序无关
+    adapter = make_adapter(path, 'replay')
+    for username in reversed(USERNAMES):
+        session = _session(adapter)
+        page = session.post(server + '/login', data={'username': username, 'password': 'other'}).text
+        assert pseudonym(username, salt) in page
+
+    # 没有密钥文件时按登录顺序对应到录制时的账号
+    os.remove(path + '.key')
+    adapter = make_adapter(path, 'replay')
+    for username in USERNAMES:
+        session = _session(adapter)
+        page = session.post(server + '/login', data={'username': 'x' + username, 'password': 'x'}).text
+        detail = session.post(server + '/detail', data={'username': 'x' + username, 'id': '1'}).json()
+        assert pseudonym(username, salt) in page
+        assert detail['data']['enterMember']['userid'] == pseudonym(username, salt)
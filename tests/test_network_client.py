@@ -0,0 +1,91 @@
+# test_network_client.py
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import src.config as config
+import src.html_parser as html_parser
+from src.cancellation import CancellationToken, OperationCancelled
+from src.network_client import ApiClient
+
+LIST_HTML = ('<html><div class="name">张三</div><ul>' + ''.join(
+    f'<li class="green_events"><a href="/activitynew/mucenter/enter/detail?id={i}&actid={100 + i}"><div class="course_name">活动{i}</div></a></li>'
+    for i in range(200)) + '</ul></html>').encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    分块慢速返回活动列表页面；/broken 返回500。
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/broken':
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(LIST_HTML)))
+        self.end_headers()
+        try:
+            for start in range(0, len(LIST_HTML), 1024):
+                self.wfile.write(LIST_HTML[start:start + 1024])
+                self.wfile.flush()
+                time.sleep(self.server.delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    srv.delay = 0
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{srv.server_address[1]}'
+    monkeypatch.setattr(config, 'ACTIVITY_LIST_URL', base + '/list')
+    monkeypatch.setattr(config, 'LIST_STREAM_CHUNK_SIZE', 1024)
+    yield srv, base
+    srv.shutdown()
+    srv.server_close()
+
+
+def _client():
+    client = ApiClient()
+    client.logged_in = True
+    return client
+
+
+def test_streamed_list_matches_full_parse(server):
+    client = _client()
+    activities = list(client.iter_activities(cancel_token=CancellationToken()))
+    assert len(activities) == 200
+    assert activities == html_parser.parse_activity_list(LIST_HTML)
+    assert client.student_name == '张三'
+
+
+def test_cancel_aborts_streamed_list(server):
+    srv, _ = server
+    srv.delay = 0.05
+    token = CancellationToken()
+    received = []
+    with pytest.raises(OperationCancelled):
+        for activity in _client().iter_activities(cancel_token=token):
+            received.append(activity)
+            if len(received) == 5:
+                token.cancel()
+    assert len(received) < 200
+
+
+def test_http_error_is_reported(server, monkeypatch):
+    _, base = server
+    monkeypatch.setattr(config, 'ACTIVITY_LIST_URL', base + '/broken')
+    with pytest.raises(Exception, match="获取活动列表失败"):
+        list(_client().iter_activities())
@@ -0,0 +1,89 @@
+# test_rate_limit.py
+
+import threading
+import time
+
+import pytest
+
+import src.config as config
+import src.rate_limit as rate_limit
+from src.cancellation import CancellationToken, OperationCancelled
+from src.rate_limit import FairTokenBucket
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def _start(bucket, key, count, order):
+    def worker():
+        bucket.acquire(key)
+        order.append(key)
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_accounts_take_turns_for_tokens():
+    bucket = FairTokenBucket(rate=20, burst=1)
+    bucket.acquire('drain')
+    order = []
+    threads = _start(bucket, 'busy', 10, order)
+    _wait_until(lambda: len(bucket._waiters.get('busy', ())) == 10)
+    threads += _start(bucket, 'quiet', 2, order)
+    _wait_until(lambda: len(bucket._waiters.get('quiet', ())) == 2)
+    for thread in threads:
+        thread.join(5)
+
+    assert len(order) == 12
+    # 后到的账号不必等忙碌账号排完：两个账号轮流取得令牌
+    first = order.index('quiet')
+    assert first <= 2
+    assert order[first:first + 4] == ['quiet', 'busy', 'quiet', 'busy']
+
+
+def test_tokens_refill_at_configured_rate():
+    bucket = FairTokenBucket(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire('a')
+    # 突发2个，其余5个按每秒50个补充
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+def test_cancelled_waiter_does_not_block_others():
+    bucket = FairTokenBucket(rate=5, burst=1)
+    bucket.acquire('drain')
+    token = CancellationToken()
+    errors = []
+
+    def cancelled_worker():
+        try:
+            bucket.acquire('cancelled', token)
+        except OperationCancelled as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=cancelled_worker)
+    thread.start()
+    _wait_until(lambda: 'cancelled' in bucket._waiters)
+    token.cancel()
+    thread.join(5)
+    assert len(errors) == 1
+    assert 'cancelled' not in bucket._waiters and list(bucket._turns) == []
+    bucket.acquire('other')
+
+
+def test_buckets_are_shared_per_host_and_budget(monkeypatch):
+    monkeypatch.setattr(rate_limit, '_buckets', {})
+    login = rate_limit.get_bucket('https://example.com/login', 'login')
+    assert rate_limit.get_bucket('https://example.com/other', 'login') is login
+    assert rate_limit.get_bucket('https://example.com/detail', 'detail') is not login
+    assert rate_limit.get_bucket('https://other.example.com/login', 'login') is not login
+    with pytest.raises(ValueError):
+        rate_limit.get_bucket('https://example.com/', 'unknown')
+    monkeypatch.setattr(config, 'ENABLE_RATE_LIMIT', False)
+    rate_limit.wait_for_budget('https://example.com/', 'unknown', 'a')